@@ -0,0 +1,18 @@
+import csv
+from connection import connection
+
+# rows of geniepy/src/geniepy/scripts/entity_rank.py: entity id, pmid, score
+with open("data/paper_ranks", "r") as file:
+    reader = csv.reader(file)
+    with connection.cursor() as cur:
+        cur.execute("DELETE FROM paper_ranks;")
+        connection.commit()
+        count = 0
+
+        for row in reader:
+            count += 1
+            if count % 10000 == 0:
+                print(count)
+                connection.commit()
+            cur.execute("INSERT INTO paper_ranks VALUES (%s, %s, %s);", (row[0], row[1], row[2]))
+        connection.commit()
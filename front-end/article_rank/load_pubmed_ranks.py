@@ -1,12 +1,18 @@
 import csv
 import pdb
+import sys
 from connection import connection
 
+# --update loads the changed rows of geniepy/scripts/article_rerank.py, keeping
+# the other rows of the table
+update = "--update" in sys.argv[1:]
+
 with open("data/rankings", "r") as file:
     reader = csv.reader(file)
     with connection.cursor() as cur:
-        cur.execute("DELETE FROM pubmed_ranks;")
-        connection.commit()
+        if not update:
+            cur.execute("DELETE FROM pubmed_ranks;")
+            connection.commit()
         count = 0
 
         for row in reader:
@@ -14,4 +20,13 @@ with open("data/rankings", "r") as file:
             if count % 10000 == 0:
                 print(count)
                 connection.commit()
-            cur.execute("INSERT INTO pubmed_ranks VALUES (%s, %s, %s);", (row[0], row[1], row[2]))
+            if update:
+                cur.execute(
+                    "INSERT INTO pubmed_ranks VALUES (%s, %s, %s) ON CONFLICT (id) "
+                    "DO UPDATE SET pubmed_rank = EXCLUDED.pubmed_rank, "
+                    "citations = EXCLUDED.citations;",
+                    (row[0], row[1], row[2]),
+                )
+            else:
+                cur.execute("INSERT INTO pubmed_ranks VALUES (%s, %s, %s);", (row[0], row[1], row[2]))
+        connection.commit()
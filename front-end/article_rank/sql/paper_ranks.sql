@@ -0,0 +1,10 @@
+\c genie;
+
+DROP TABLE paper_ranks;
+
+CREATE TABLE paper_ranks(
+  entity_id character varying NOT NULL,
+  pmid character varying NOT NULL,
+  score double precision NOT NULL,
+  PRIMARY KEY (entity_id, pmid)
+);
@@ -1,42 +1,43 @@
-import datetime
-import pdb
+"""
+Convert data/citations.csv into the binary data/links file read by ranker.
+
+The csv is streamed once into a geniepy citation graph store (data/graph),
+then the links file is written from the store's cited-by arrays a block of
+rows at a time, with no per-integer conversion.
+"""
 import numpy as np
-import csv
-import struct
+from geniepy.datamgmt.citegraph import (
+    CitationGraphBuilder,
+    iter_citations_csv,
+)
 
-articles = set()
-max = 0
+BLOCK_ROWS = 1 << 20
 
-with open("data/citations.csv", "r") as rfile:
-    reader = csv.reader(rfile)
-    count = 0
-    for row in reader:
-        count += 1
-        if count % 100000 == 0:
-            print(count)
-        cited = int(row[0])
-        articles.add(cited)
-        if cited > max:
-            max = cited
-        for i in row[1:]:
-            citer = int(i)
-            articles.add(citer)
-            if citer > max:
-                max = citer
+builder = CitationGraphBuilder("data/graph")
+print(builder.add_cited_by(iter_citations_csv("data/citations.csv")))
+graph = builder.build()
+offsets, indices = graph.csr()
+degrees = graph.degrees()
+articles = np.count_nonzero((degrees > 0) | (graph.degrees("cites") > 0))
+max_pmid = graph.num_nodes - 1
+print(articles)
+print(max_pmid)
 
-with open("data/citations.csv", "r") as rfile:
-    reader = csv.reader(rfile)
-    with open("data/links", "wb") as wfile:
-        wfile.write(max.to_bytes(4, signed=False, byteorder="little"))
-        wfile.write(len(articles).to_bytes(4, signed=False, byteorder="little"))
-        print(len(articles))
-        print(max)
-        count = 0
-        for row in reader:
-            wfile.write(int(row[0]).to_bytes(4, signed=False, byteorder="little"))
-            wfile.write(len(row[1:]).to_bytes(4, signed=False, byteorder="little"))
-            count += 1
-            if count % 100000 == 0:
-                print(count)
-            for i in row[1:]:
-                wfile.write(int(i).to_bytes(4, signed=False, byteorder="little"))
+with open("data/links", "wb") as wfile:
+    np.array([max_pmid, articles], dtype="<u4").tofile(wfile)
+    for first in range(0, graph.num_nodes, BLOCK_ROWS):
+        last = min(first + BLOCK_ROWS, graph.num_nodes)
+        rows = np.flatnonzero(degrees[first:last]) + first
+        if not len(rows):
+            continue
+        # each row: cited pmid, number of citations, citing pmids
+        start, end = offsets[first], offsets[last]
+        block = np.empty(2 * len(rows) + end - start, dtype="<u4")
+        headers = offsets[rows] - start + 2 * np.arange(len(rows))
+        block[headers] = rows
+        block[headers + 1] = degrees[rows]
+        citing = np.ones(len(block), dtype=bool)
+        citing[headers] = citing[headers + 1] = False
+        block[citing] = indices[start:end]
+        block.tofile(wfile)
+        print(last)
@@ -119,22 +119,26 @@ def show(id):
             journals_data = np.array(cur.fetchall()).T.reshape(2, -1).tolist()
 
             cur.execute("""
-                SELECT DISTINCT paper_links.title, paper_links.link, paper_links.citations, pubmed_ranks.pubmed_rank
+                SELECT DISTINCT paper_links.title, paper_links.link, paper_links.citations, pubmed_ranks.pubmed_rank, paper_ranks.score
                 FROM paper_links LEFT OUTER JOIN pubmed_ranks
                 ON paper_links.pmid = pubmed_ranks.id
+                LEFT OUTER JOIN paper_ranks
+                ON paper_links.pmid = paper_ranks.pmid AND paper_links.gene_id = paper_ranks.entity_id
                 WHERE gene_id = %s
-                ORDER BY pubmed_ranks.pubmed_rank DESC
+                ORDER BY paper_ranks.score DESC NULLS LAST, pubmed_ranks.pubmed_rank DESC
                 LIMIT 50;
             """, (relationship[0], ))
             gene_links = [[row[0], row[1], row[2], str(row[3])] for row in cur.fetchall()]
 
 
             cur.execute("""
-                SELECT DISTINCT paper_links.title, paper_links.link, paper_links.citations, pubmed_ranks.pubmed_rank
+                SELECT DISTINCT paper_links.title, paper_links.link, paper_links.citations, pubmed_ranks.pubmed_rank, paper_ranks.score
                 FROM paper_links LEFT OUTER JOIN pubmed_ranks
                 ON paper_links.pmid = pubmed_ranks.id
+                LEFT OUTER JOIN paper_ranks
+                ON paper_links.pmid = paper_ranks.pmid AND paper_links.mesh_id = paper_ranks.entity_id
                 WHERE mesh_id = %s
-                ORDER BY pubmed_ranks.pubmed_rank DESC
+                ORDER BY paper_ranks.score DESC NULLS LAST, pubmed_ranks.pubmed_rank DESC
                 LIMIT 50;
             """, (relationship[1], ))
             disease_links = [[row[0], row[1], row[2], str(row[3])] for row in cur.fetchall()]
@@ -0,0 +1,57 @@
+"""
+Benchmark PubMed article field extraction.
+
+Compare the articles/sec of the property based PubMedArticle, which queries the
+element tree on every property access, against the single pass ArticleRecord
+extractor on the sample article sets in tests/resources.
+
+Usage: python bench_article_extract.py [number of repetitions]
+"""
+import glob
+import os
+import sys
+from timeit import default_timer as timer
+import xml.etree.ElementTree as ET
+from geniepy.pubmed import PubMedArticle, ArticleRecord
+
+RESOURCES_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "tests", "resources"
+)
+DEFAULT_REPEAT = 200
+
+
+def load_articles() -> [ET.Element]:
+    """Load the <PubmedArticle> elements of all sample article sets."""
+    elements = []
+    pattern = os.path.join(RESOURCES_DIR, "sample_articleset*.xml")
+    for xml_file in sorted(glob.glob(pattern)):
+        elements.extend(ET.parse(xml_file).getroot().findall("PubmedArticle"))
+    return elements
+
+
+def bench(name: str, extract, elements: [ET.Element], repeat: int) -> float:
+    """Run extract over all elements repeat times and print articles/sec."""
+    start = timer()
+    for _ in range(repeat):
+        for element in elements:
+            extract(element)
+    elapsed = timer() - start
+    rate = len(elements) * repeat / elapsed
+    print(f"{name:<24} {rate:>12,.0f} articles/sec")
+    return rate
+
+
+if __name__ == "__main__":
+    REPEAT = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPEAT
+    ELEMENTS = load_articles()
+    print(f"{len(ELEMENTS)} sample articles x {REPEAT} repetitions")
+    BASE_RATE = bench(
+        "PubMedArticle.to_dict", lambda el: PubMedArticle(el).to_dict, ELEMENTS, REPEAT
+    )
+    RECORD_RATE = bench(
+        "ArticleRecord.to_dict",
+        lambda el: ArticleRecord.from_element(el).to_dict,
+        ELEMENTS,
+        REPEAT,
+    )
+    print(f"Speedup: {RECORD_RATE / BASE_RATE:.1f}x")
@@ -0,0 +1,51 @@
+"""
+Benchmark memory held by a chunk of parsed PubMed articles.
+
+Compare the memory retained by PubMedArticle objects, which keep their whole xml
+element tree alive, against the compact ArticleRecord objects yielded by
+ArticleSetParser.iter_articles, on the sample article sets in tests/resources.
+
+Usage: python bench_article_memory.py
+"""
+import glob
+import os
+import tracemalloc
+import xml.etree.ElementTree as ET
+from geniepy.pubmed import PubMedArticle, ArticleSetParser
+
+RESOURCES_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), os.pardir, "tests", "resources"
+)
+
+
+def article_chunk(xml_file: str) -> [PubMedArticle]:
+    """Parse article set keeping PubMedArticle objects."""
+    root = ET.parse(xml_file).getroot()
+    articles = [PubMedArticle(element) for element in root.findall("PubmedArticle")]
+    root.clear()
+    return articles
+
+
+def record_chunk(xml_file: str) -> list:
+    """Stream article set keeping compact ArticleRecord objects."""
+    return list(ArticleSetParser.iter_articles(xml_file))
+
+
+def retained_bytes(build, xml_file: str) -> (int, int):
+    """Return number of objects built and bytes still allocated by them."""
+    tracemalloc.start()
+    chunk = build(xml_file)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(chunk), retained
+
+
+if __name__ == "__main__":
+    pattern = os.path.join(RESOURCES_DIR, "sample_articleset*.xml")
+    for XML_FILE in sorted(glob.glob(pattern)):
+        print(os.path.basename(XML_FILE))
+        COUNT, ARTICLE_BYTES = retained_bytes(article_chunk, XML_FILE)
+        _, RECORD_BYTES = retained_bytes(record_chunk, XML_FILE)
+        print(f"  PubMedArticle  {ARTICLE_BYTES / COUNT:>10,.0f} bytes/article")
+        print(f"  ArticleRecord  {RECORD_BYTES / COUNT:>10,.0f} bytes/article")
+        print(f"  Reduction      {ARTICLE_BYTES / RECORD_BYTES:>10.1f}x")
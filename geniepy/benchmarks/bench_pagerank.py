@@ -0,0 +1,100 @@
+"""
+Benchmark sparse PageRank on a synthetic citation graph.
+
+Generate a CSR cited-by graph the size of PubMed (30M articles by default)
+with a skewed number of citations per article, then time power iteration
+PageRank with float32 and float64 scores and an increasing number of SpMV
+threads. Reports seconds per iteration, iterations to converge and the memory
+held by the transition matrix. Then compares the seconds per entity of
+personalized PageRank ranked one entity at a time and in batches.
+
+Usage: python bench_pagerank.py [nodes] [average citations] [max threads]
+"""
+import os
+import sys
+from timeit import default_timer as timer
+import numpy as np
+import scipy.sparse as sp
+from geniepy.ranking import PageRank, top_papers
+
+DEFAULT_NODES = 30000000
+DEFAULT_AVG_CITATIONS = 10
+ENTITIES = 32
+SEEDS_PER_ENTITY = 1000
+
+
+def synthetic_graph(nodes: int, avg_citations: int, seed: int = 0) -> tuple:
+    """
+    Generate cited-by CSR arrays with pareto distributed citation counts.
+
+    Returns:
+        tuple -- (offsets, indices) int32 arrays
+    """
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(2.0, nodes) + 1
+    degrees = rng.poisson(avg_citations * weights / weights.mean())
+    offsets = np.zeros(nodes + 1, dtype=np.int64)
+    np.cumsum(degrees, out=offsets[1:])
+    indices = rng.integers(0, nodes, offsets[-1], dtype=np.int32)
+    return offsets.astype(np.int32), indices
+
+
+def bench(offsets, indices, dtype, threads: int) -> float:
+    """Run PageRank to convergence and print timings, return s/iteration."""
+    start = timer()
+    ranker = PageRank(offsets, indices, dtype=dtype, threads=threads)
+    build = timer() - start
+    start = timer()
+    result = ranker.run()
+    elapsed = timer() - start
+    per_iteration = elapsed / max(result.iterations, 1)
+    weights_bytes = len(indices) * ranker.dtype.itemsize
+    matrix_bytes = offsets.nbytes + indices.nbytes + weights_bytes
+    print(
+        f"{np.dtype(dtype).name:<8} {threads:>3} threads  build {build:6.1f}s  "
+        f"{result.iterations:>3} iterations  {per_iteration:7.3f} s/iter  "
+        f"residual {result.residual:.1e}  matrix {matrix_bytes / 2 ** 30:.1f} GiB"
+    )
+    return per_iteration
+
+
+def bench_personalized(offsets, indices, batch_size: int) -> float:
+    """Rank papers of ENTITIES random seed sets, return s/entity."""
+    rng = np.random.default_rng(1)
+    nodes = len(offsets) - 1
+    rows = np.repeat(np.arange(ENTITIES), SEEDS_PER_ENTITY)
+    cols = rng.integers(0, nodes, len(rows))
+    seeds = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(ENTITIES, nodes))
+    seeds.data[:] = 1
+    entities = np.arange(ENTITIES)
+    ranker = PageRank(offsets, indices)
+    start = timer()
+    for _ in top_papers(ranker, entities, seeds, batch_size=batch_size):
+        pass
+    per_entity = (timer() - start) / ENTITIES
+    print(f"personalized  batch {batch_size:>3}  {per_entity:7.3f} s/entity")
+    return per_entity
+
+
+if __name__ == "__main__":
+    NODES = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NODES
+    AVG = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_AVG_CITATIONS
+    MAX_THREADS = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    START = timer()
+    OFFSETS, INDICES = synthetic_graph(NODES, AVG)
+    print(
+        f"{NODES:,} articles, {len(INDICES):,} citations "
+        f"generated in {timer() - START:.1f}s"
+    )
+    # 1, 2, 4... threads up to MAX_THREADS
+    THREADS = sorted({2 ** i for i in range(MAX_THREADS.bit_length())} | {MAX_THREADS})
+    for DTYPE in (np.float32, np.float64):
+        BASE = None
+        for THREAD_CNT in THREADS:
+            PER_ITERATION = bench(OFFSETS, INDICES, DTYPE, THREAD_CNT)
+            BASE = BASE or PER_ITERATION
+            print(f"{'':<13} speedup x{BASE / PER_ITERATION:.2f}")
+    SINGLE = bench_personalized(OFFSETS, INDICES, 1)
+    for BATCH_SIZE in (4, 16):
+        PER_ENTITY = bench_personalized(OFFSETS, INDICES, BATCH_SIZE)
+        print(f"{'':<13} speedup x{SINGLE / PER_ENTITY:.2f}")
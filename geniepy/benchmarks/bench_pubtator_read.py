@@ -0,0 +1,63 @@
+"""
+Benchmark parsing Pubtator chunks.
+
+Generate a synthetic gene2pubtatorcentral file, then compare parsing all five
+columns as objects against parsing only the PMID and GeneID columns as int32
+and categorical, as PubtatorGeneScraper does. Reports seconds and memory per
+million rows.
+
+Usage: python bench_pubtator_read.py [rows]
+"""
+import io
+import sys
+from timeit import default_timer as timer
+import numpy as np
+import pandas as pd
+from geniepy.datamgmt.scrapers import PubtatorGeneScraper
+
+DEFAULT_ROWS = 2000000
+CHUNKSIZE = 500000
+
+
+def synthetic_pubtator(rows: int, seed: int = 0) -> bytes:
+    """Generate tab separated Pubtator gene rows."""
+    rng = np.random.default_rng(seed)
+    genes = (rng.zipf(1.3, rows) % 100000).astype(str).astype(object)
+    # Some mentions are annotated with several genes
+    several = rng.random(rows) < 0.02
+    genes[several] = genes[several] + ";" + genes[np.flatnonzero(several) - 1]
+    frame = pd.DataFrame(
+        {
+            "PMID": np.sort(rng.integers(1, 33000000, rows)),
+            "Type": "Gene",
+            "GeneID": genes,
+            "Mentions": "BRCA1|breast cancer 1",
+            "Resource": "GNormPlus",
+        }
+    )
+    return frame.to_csv(sep="\t", header=False, index=False).encode()
+
+
+def bench(data: bytes, **kwargs) -> (float, int):
+    """Read data in chunks, return seconds and bytes held by all chunks."""
+    start = timer()
+    chunks = list(pd.read_csv(io.BytesIO(data), chunksize=CHUNKSIZE, **kwargs))
+    elapsed = timer() - start
+    held = sum(chunk.memory_usage(deep=True).sum() for chunk in chunks)
+    return elapsed, held
+
+
+if __name__ == "__main__":
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    DATA = synthetic_pubtator(ROWS)
+    MILLIONS = ROWS / 1e6
+    ALL_COLUMNS = {"delimiter": "\t", "names": PubtatorGeneScraper.HEADER_NAMES}
+    for NAME, OPTIONS in (
+        ("all columns", ALL_COLUMNS),
+        ("projected", PubtatorGeneScraper.read_options()),
+    ):
+        ELAPSED, HELD = bench(DATA, **OPTIONS)
+        print(
+            f"{NAME:<12} {ELAPSED / MILLIONS:6.2f} s/M rows  "
+            f"{HELD / MILLIONS / 2 ** 20:7.1f} MiB/M rows"
+        )
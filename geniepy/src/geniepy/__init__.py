@@ -11,6 +11,7 @@ from geniepy.datamgmt import DaoManager
 import geniepy.datamgmt.daos as daos
 import geniepy.datamgmt.repositories as dr
 import geniepy.datamgmt.tables as gt
+from geniepy.datamgmt.scrapers import PubMedScraper
 from geniepy.classmgmt import ClassificationMgr
 from geniepy.classmgmt.classifiers import Classifier
 from geniepy.classmgmt.classifiers import PCPCLSFR_NAME, CTCLSFR_NAME
@@ -30,7 +31,7 @@ __author__ = "The Harvard LAMP Team"
 __copyright__ = "The Harvard LAMP Team"
 __license__ = "MIT"
 
-__all__ = ["run", "run_predictions", "update_tables"]
+__all__ = ["run", "run_predictions", "update_tables", "backfill_citations"]
 
 
 def create_repos():
@@ -148,12 +149,19 @@ def create_tables():
 
 
 def update_tables():
-    """Call scrapes to download data and create/append tables."""
+    """Call scrapers to download new data, and apply changes of snapshot sources."""
     daomgr: DaoManager = create_daomgr()
     chunksize = config.get_chunksize()
     daomgr.download(chunksize)
 
 
+def backfill_citations():
+    """Backfill citations of all ingested PubMed articles, resuming if interrupted."""
+    daomgr: DaoManager = create_daomgr()
+    start, end = daomgr.get_pmid_range()
+    PubMedScraper().backfill_citations(start, end)
+
+
 def sample_run():
     """Run through entire cycle of creating tables and predictions with sample data."""  # noqa
     daomgr: DaoManager = create_daomgr()
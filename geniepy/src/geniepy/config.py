@@ -109,12 +109,72 @@ def get_pubmed_data_file() -> str:
     return configdict["pubmed_data_file"]
 
 
+def get_pubmed_manifest_file() -> str:
+    """Retrieve path for PubMed sync manifest database."""
+    configdict = read_yaml()
+    return configdict["pubmed_manifest_file"]
+
+
+def get_citation_cache_file() -> str:
+    """Retrieve path for citation cache database."""
+    configdict = read_yaml()
+    return configdict["citation_cache_file"]
+
+
+def get_citation_cache_ttl_days() -> int:
+    """Retrieve number of days cached citations are used before refreshing."""
+    configdict = read_yaml()
+    return configdict["citation_cache_ttl_days"]
+
+
+def get_citation_backfill_file() -> str:
+    """Retrieve path for citation backfill checkpoint database."""
+    configdict = read_yaml()
+    return configdict["citation_backfill_file"]
+
+
+def get_citation_source() -> str:
+    """Retrieve source of citations: 'api' or 'local' reference lists."""
+    configdict = read_yaml()
+    return configdict["citation_source"]
+
+
+def get_snapshot_dir() -> str:
+    """Retrieve directory of local snapshots of Pubtator and SJR sources."""
+    configdict = read_yaml()
+    return configdict["snapshot_dir"]
+
+
+def get_cooccurrence_dir() -> str:
+    """Retrieve work directory of gene-disease co-occurrence counts."""
+    configdict = read_yaml()
+    return configdict["cooccurrence_dir"]
+
+
+def get_citation_references_dir() -> str:
+    """Retrieve directory of references extracted from PubMed articles."""
+    configdict = read_yaml()
+    return configdict["citation_references_dir"]
+
+
 def get_pubmed_download_dir() -> str:
     """Retrieve path where to download PubMed data files."""
     configdict = read_yaml()
     return configdict["pubmed_download_dir"]
 
 
+def get_pubmed_prefetch_files() -> int:
+    """Retrieve number of PubMed data files downloaded ahead of parsing."""
+    configdict = read_yaml()
+    return configdict["pubmed_prefetch_files"]
+
+
+def get_pubmed_ftp_sessions() -> int:
+    """Retrieve maximum number of concurrent PubMed FTP sessions."""
+    configdict = read_yaml()
+    return configdict["pubmed_ftp_sessions"]
+
+
 def get_logger(logger_name: str):
     """Retrieve geniepy logger."""
     file_handler = TimedRotatingFileHandler(LOG_FILE, when="midnight")
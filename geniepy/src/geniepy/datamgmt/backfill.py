@@ -0,0 +1,306 @@
+"""
+Resumable citation backfill.
+
+Fetches the citing articles of every PMID in a range, i.e. the range of
+ingested PubMed articles, in fixed windows of PMIDs. Citations are written as
+they arrive to the citation cache, and each completed window is written to its
+own CSV shard and checkpointed in a SQLite database. A restarted backfill skips
+checkpointed windows and PMIDs already cached, so it resumes where it stopped.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from time import monotonic
+from typing import Iterable
+import asyncio
+import os
+import sqlite3
+import geniepy.config as config
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.citations import AsyncCitationClient
+
+DEFAULT_WINDOW_SIZE = 10000
+CSV_SEPARATOR = "|"
+CSV_HEADER = ["article_id", "cited_count", "cited_by_id"]
+
+
+def pmid_windows(start: int, end: int, window_size: int) -> [(int, int)]:
+    """
+    Split PMIDs start to end (inclusive) in windows aligned to window_size.
+
+    Windows are aligned, so the same PMIDs fall in the same windows when the
+    range grows. Only the windows at the edges of the range are clipped.
+
+    Returns:
+        [(int, int)] -- (first, last) PMIDs of each window
+    """
+    windows = []
+    first = max(start, 1)
+    while first <= end:
+        last = min((first // window_size + 1) * window_size - 1, end)
+        windows.append((first, last))
+        first = last + 1
+    return windows
+
+
+class BackfillCheckpoint:
+    """SQLite record of the PMID windows whose citations were backfilled."""
+
+    __slots__ = ["_conn"]
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS windows (
+            first INTEGER NOT NULL,
+            last INTEGER NOT NULL,
+            cited INTEGER NOT NULL,
+            completed TEXT NOT NULL,
+            PRIMARY KEY (first, last)
+        )
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) checkpoint database.
+
+        Arguments:
+            path {str} -- path to sqlite database file, ':memory:' for tests
+        """
+        if path != ":memory:":
+            path = str(Path(path).expanduser())
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute(self.SCHEMA)
+
+    def completed(self) -> {(int, int)}:
+        """Return (first, last) PMIDs of completed windows."""
+        return set(self._conn.execute("SELECT first, last FROM windows"))
+
+    def complete(self, first: int, last: int, cited: int):
+        """Checkpoint window, cited is the number of PMIDs with citations."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?)",
+                (first, last, cited, datetime.now().isoformat(timespec="seconds")),
+            )
+
+    def reset(self):
+        """Forget all completed windows, so the next backfill starts over."""
+        with self._conn:
+            self._conn.execute("DELETE FROM windows")
+
+    def close(self):
+        """Close checkpoint database."""
+        self._conn.close()
+
+
+class BackfillProgress:
+    """Track PMIDs processed, throughput and estimated time to completion."""
+
+    __slots__ = ["total", "done", "_started", "_clock"]
+
+    def __init__(self, total: int, clock=monotonic):
+        """
+        Start tracking progress.
+
+        Arguments:
+            total {int} -- number of PMIDs to process
+
+        Keyword Arguments:
+            clock -- monotonic clock returning seconds
+        """
+        self.total = total
+        self.done = 0
+        self._clock = clock
+        self._started = clock()
+
+    def update(self, count: int):
+        """Record count more PMIDs processed."""
+        self.done += count
+
+    def rate(self) -> float:
+        """PMIDs processed per second."""
+        elapsed = self._clock() - self._started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta(self) -> timedelta:
+        """Estimated time left, None until throughput is known."""
+        rate = self.rate()
+        if not rate:
+            return None
+        return timedelta(seconds=round((self.total - self.done) / rate))
+
+    def report(self) -> str:
+        """Summary of progress, throughput and ETA."""
+        percent = 100 * self.done / self.total if self.total else 100.0
+        eta = self.eta()
+        return (
+            f"{self.done}/{self.total} PMIDs ({percent:.1f}%), "
+            f"{self.rate():.0f} PMIDs/s, ETA {eta if eta is not None else 'unknown'}"
+        )
+
+
+class _Window:
+    """Citations of a window of PMIDs, until all its PMIDs are fetched."""
+
+    __slots__ = ["first", "last", "remaining", "citations", "failed"]
+
+    def __init__(self, first: int, last: int):
+        self.first = first
+        self.last = last
+        self.remaining = last - first + 1
+        self.citations = {}
+        self.failed = False
+
+
+class CitationBackfill:
+    """
+    Checkpointed backfill of the citations of a range of PMIDs.
+
+    PMIDs of consecutive windows are streamed through one AsyncCitationClient,
+    so the requests in flight aren't drained at window boundaries. Windows with
+    failed batches aren't checkpointed and are retried by the next run.
+    """
+
+    LOGGER = config.get_logger("CitationBackfill")
+
+    # pylint: disable=bad-continuation
+    def __init__(
+        self,
+        client: AsyncCitationClient,
+        checkpoint: BackfillCheckpoint,
+        cache: CitationCache = None,
+        output_dir: str = None,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+    ):
+        """
+        Initialize backfill job.
+
+        Arguments:
+            client {AsyncCitationClient} -- client fetching citations
+            checkpoint {BackfillCheckpoint} -- record of completed windows
+
+        Keyword Arguments:
+            cache {CitationCache} -- cache citations are written to, and read
+                                     from to skip PMIDs already fetched
+            output_dir {str} -- directory of the CSV shards of completed
+                                windows, None to only write the cache
+            window_size {int} -- number of PMIDs per checkpointed window
+        """
+        self._client = client
+        self._checkpoint = checkpoint
+        self._cache = cache
+        self._output_dir = output_dir
+        self._window_size = max(window_size, 1)
+        self._progress = None
+
+    def pending(self, start: int, end: int) -> [(int, int)]:
+        """Return windows of PMIDs start to end not yet completed."""
+        completed = self._checkpoint.completed()
+        return [
+            window
+            for window in pmid_windows(start, end, self._window_size)
+            if window not in completed
+        ]
+
+    def shard_path(self, first: int, last: int) -> str:
+        """Path of CSV shard of window."""
+        return os.path.join(self._output_dir, f"citations-{first:08d}-{last:08d}.csv")
+
+    def _write_shard(self, window: _Window):
+        """Write cited PMIDs of window to its shard, replaced when complete."""
+        path = self.shard_path(window.first, window.last)
+        tmp_path = os.path.join(self._output_dir, "." + os.path.basename(path))
+        with open(tmp_path, "w") as shard:
+            shard.write(CSV_SEPARATOR.join(CSV_HEADER) + "\n")
+            for pmid in sorted(window.citations):
+                citing = window.citations[pmid]
+                if citing:
+                    shard.write(
+                        f"{pmid}{CSV_SEPARATOR}{len(citing)}"
+                        f"{CSV_SEPARATOR}{','.join(citing)}\n"
+                    )
+        os.replace(tmp_path, path)
+
+    def _record(self, window: _Window, citations: {int: [str]}, count: int):
+        """Add count fetched (or failed) PMIDs to window, finish it if complete."""
+        if citations is None:
+            window.failed = True
+        else:
+            window.citations.update(citations)
+        window.remaining -= count
+        self._progress.update(count)
+        if window.remaining > 0:
+            return
+        if window.failed:
+            self.LOGGER.error(
+                f"Window {window.first}-{window.last} incomplete, retried next run"
+            )
+            return
+        if self._output_dir is not None:
+            self._write_shard(window)
+        cited = sum(1 for citing in window.citations.values() if citing)
+        self._checkpoint.complete(window.first, window.last, cited)
+        self.LOGGER.info(
+            f"Window {window.first}-{window.last} done, {cited} cited: "
+            + self._progress.report()
+        )
+
+    def _stream(self, windows: [(int, int)], open_windows: dict) -> Iterable[int]:
+        """Stream PMIDs of windows missing from the cache, opening each window."""
+        for first, last in windows:
+            window = _Window(first, last)
+            pmids = range(first, last + 1)
+            cached = self._cache.get_many(pmids) if self._cache is not None else {}
+            if len(cached) == len(pmids):
+                self._record(window, cached, len(cached))
+                continue
+            open_windows[first] = window
+            if cached:
+                self._record(window, cached, len(cached))
+            yield from (pmid for pmid in pmids if pmid not in cached)
+
+    async def arun(self, start: int, end: int) -> int:
+        """
+        Backfill citations of PMIDs start to end (inclusive).
+
+        Returns:
+            int -- number of windows completed by this run
+        """
+        windows = self.pending(start, end)
+        total = sum(last - first + 1 for first, last in windows)
+        self.LOGGER.info(
+            f"Backfilling citations of PMIDs {start}-{end}: {len(windows)} windows, "
+            f"{total} PMIDs left"
+        )
+        self._progress = BackfillProgress(total)
+        open_windows = {}
+        async with self._client:
+            pmid_stream = self._stream(windows, open_windows)
+            async for batch, citations in self._client.iter_fetch(pmid_stream):
+                if citations is not None and self._cache is not None:
+                    self._cache.put_many(citations)
+                # Batches may span two windows
+                for first in {self._window_of(pmid, open_windows) for pmid in batch}:
+                    window = open_windows[first]
+                    in_window = [p for p in batch if window.first <= p <= window.last]
+                    if citations is None:
+                        self._record(window, None, len(in_window))
+                    else:
+                        found = {pmid: citations[pmid] for pmid in in_window}
+                        self._record(window, found, len(in_window))
+                    if window.remaining <= 0:
+                        del open_windows[first]
+        completed = len(windows) - len(self.pending(start, end))
+        self.LOGGER.info(f"Backfill done, {completed} windows completed")
+        return completed
+
+    def _window_of(self, pmid: int, open_windows: dict) -> int:
+        """Return first PMID of the open window holding pmid."""
+        for first, window in open_windows.items():
+            if first <= pmid <= window.last:
+                return first
+        raise KeyError(pmid)
+
+    def run(self, start: int, end: int) -> int:
+        """Blocking version of arun."""
+        return asyncio.run(self.arun(start, end))
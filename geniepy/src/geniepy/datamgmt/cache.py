@@ -0,0 +1,172 @@
+"""
+Citation cache.
+
+Single-file SQLite store of the citing articles of each PMID, shared by the
+scraper and its worker processes. The database runs in WAL mode, so readers
+don't block the writer, and concurrent writers wait for each other instead of
+failing. Entries older than the time to live are treated as missing, so
+citation counts get refreshed.
+"""
+from itertools import islice
+from pathlib import Path
+from time import time
+import os
+import sqlite3
+
+DEFAULT_TTL = 30 * 24 * 3600
+"""Default time to live of cached citations, in seconds."""
+
+
+class CitationCache:
+    """
+    SQLite (WAL) backed cache of citing PMIDs, keyed by cited PMID.
+
+    Connections are opened lazily in each process using the cache, so a cache
+    object can be handed to worker processes (i.e. pickled by a process pool).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS citations (
+            pmid INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL,
+            citing TEXT NOT NULL,
+            fetched REAL NOT NULL
+        )
+    """
+    BUSY_TIMEOUT = 60
+    MAX_VARIABLES = 500
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL):
+        """
+        Initialize cache, the database is opened when first used.
+
+        Arguments:
+            path {str} -- path to sqlite database file
+
+        Keyword Arguments:
+            ttl {float} -- time to live of entries in seconds, None to never expire
+        """
+        self._path = str(Path(path).expanduser())
+        self._ttl = ttl
+        self._conn = None
+        self._pid = None
+
+    def __getstate__(self) -> dict:
+        """Pickle settings only, connections can't be shared across processes."""
+        return {"_path": self._path, "_ttl": self._ttl}
+
+    def __setstate__(self, state: dict):
+        """Restore settings, connection is opened when first used."""
+        self.__init__(state["_path"], state["_ttl"])
+
+    @property
+    def path(self) -> str:
+        """Path to sqlite database file."""
+        return self._path
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Connection of current process, opened on first use."""
+        if self._conn is None or self._pid != os.getpid():
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self._path, timeout=self.BUSY_TIMEOUT)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(self.SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _oldest_fresh(self) -> float:
+        """Fetch time of the oldest entry still fresh."""
+        return time() - self._ttl if self._ttl is not None else float("-inf")
+
+    def get_many(self, pmids: [int]) -> {int: [str]}:
+        """
+        Look up fresh cached citations of pmids.
+
+        Arguments:
+            pmids {[int]} -- PMIDs of cited articles
+
+        Returns:
+            {int: [str]} -- citing PMIDs of cached pmids, missing and expired
+                            pmids are left out
+        """
+        oldest = self._oldest_fresh()
+        cached = {}
+        pmids = iter(pmids)
+        while True:
+            batch = [int(pmid) for pmid in islice(pmids, self.MAX_VARIABLES)]
+            if not batch:
+                return cached
+            rows = self._db.execute(
+                "SELECT pmid, citing FROM citations WHERE fetched >= ? AND pmid IN "
+                f"({','.join('?' * len(batch))})",
+                [oldest] + batch,
+            )
+            for pmid, citing in rows:
+                cached[pmid] = citing.split(",") if citing else []
+
+    def put_many(self, citations: {int: [str]}):
+        """
+        Store citing PMIDs of cited PMIDs, replacing previous entries.
+
+        Arguments:
+            citations {{int: [str]}} -- citing PMIDs, keyed by cited PMID
+        """
+        fetched = time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO citations VALUES (?, ?, ?, ?)",
+                (
+                    (int(pmid), len(citing), ",".join(citing), fetched)
+                    for pmid, citing in citations.items()
+                ),
+            )
+
+    def __len__(self) -> int:
+        """Number of cached entries, including expired ones."""
+        return self._db.execute("SELECT COUNT(*) FROM citations").fetchone()[0]
+
+    def size(self) -> dict:
+        """
+        Report cache size.
+
+        Returns:
+            dict -- number of entries, expired entries and bytes on disk
+        """
+        expired = self._db.execute(
+            "SELECT COUNT(*) FROM citations WHERE fetched < ?", (self._oldest_fresh(),)
+        ).fetchone()[0]
+        files = [self._path, self._path + "-wal"]
+        return {
+            "entries": len(self),
+            "expired": expired,
+            "bytes": sum(os.path.getsize(f) for f in files if os.path.exists(f)),
+        }
+
+    def purge_expired(self) -> int:
+        """Delete expired entries, return number of deleted entries."""
+        with self._db:
+            cursor = self._db.execute(
+                "DELETE FROM citations WHERE fetched < ?", (self._oldest_fresh(),)
+            )
+        return cursor.rowcount
+
+    def compact(self) -> int:
+        """
+        Delete expired entries and give the freed space back to the disk.
+
+        Returns:
+            int -- number of deleted entries
+        """
+        deleted = self.purge_expired()
+        self._db.execute("VACUUM")
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def close(self):
+        """Close connection of current process."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,357 @@
+"""
+PubMed citation fetching.
+
+Resolves the articles citing given PMIDs (pubmed_pubmed_citedin links) with
+batched E-utilities elink requests. Each PMID is sent as its own 'id'
+parameter, so the response holds one LinkSet per requested PMID. Requests are
+sent by an asyncio client, so a single process keeps many of them in flight.
+
+https://www.ncbi.nlm.nih.gov/books/NBK25499/#chapter4.ELink
+"""
+from itertools import islice
+from random import uniform
+from typing import AsyncGenerator, Iterable
+import asyncio
+import xml.etree.ElementTree as ET
+import aiohttp
+import geniepy.config as config
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.ratelimit import ApiKeyScheduler
+from geniepy.errors import CitationError
+
+ELINK_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi"
+LINK_NAME = "pubmed_pubmed_citedin"
+DEFAULT_BATCH_SIZE = 200
+
+
+def elink_params(pmids: [int], api_key: str = None) -> [tuple]:
+    """
+    Build elink form parameters requesting the citing articles of pmids.
+
+    Arguments:
+        pmids {[int]} -- PMIDs of cited articles
+
+    Keyword Arguments:
+        api_key {str} -- NCBI API key, if any
+
+    Returns:
+        [tuple] -- (name, value) parameters, with one 'id' per PMID
+    """
+    params = [("dbfrom", "pubmed"), ("linkname", LINK_NAME)]
+    if api_key:
+        params.append(("api_key", api_key))
+    params.extend(("id", str(pmid)) for pmid in pmids)
+    return params
+
+
+def parse_elink(response: str) -> {int: [str]}:
+    """
+    Parse elink response into citing articles of each requested PMID.
+
+    Arguments:
+        response {str} -- elink xml response
+
+    Returns:
+        {int: [str]} -- PMIDs of citing articles, keyed by cited PMID
+
+    Raises:
+        CitationError -- If response is not a valid elink result
+    """
+    try:
+        root = ET.fromstring(response)
+    except ET.ParseError as exp:
+        raise CitationError(f"Invalid elink response: {exp}")
+    error = root.find("ERROR")
+    if root.tag != "eLinkResult" or error is not None:
+        message = error.text if error is not None else root.tag
+        raise CitationError(f"elink error: {message}")
+    citations = {}
+    for link_set in root.iterfind("LinkSet"):
+        pmid = link_set.findtext("IdList/Id")
+        if pmid is None:
+            continue
+        citing = []
+        for link_set_db in link_set.iterfind("LinkSetDb"):
+            if link_set_db.findtext("LinkName") == LINK_NAME:
+                citing.extend(link.text for link in link_set_db.iterfind("Link/Id"))
+        citations[int(pmid)] = citing
+    return citations
+
+
+class ThrottledError(CitationError):
+    """Request was throttled by the server (429 Too Many Requests)."""
+
+
+def _retry_after(headers) -> float:
+    """Parse Retry-After delay in seconds, None if missing or not in seconds."""
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def batches(pmids: Iterable[int], batch_size: int):
+    """Split (possibly lazy) pmids iterable in batches of at most batch_size."""
+    pmids = iter(pmids)
+    while True:
+        batch = list(islice(pmids, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class AsyncCitationClient:
+    """
+    Asyncio elink client keeping many batched requests in flight.
+
+    All requests share one pooled keep-alive session, so connections are
+    reused across batches. The number of requests in flight is capped, each
+    request has a timeout and failed requests are retried after a jittered
+    exponential backoff. Requests are sent with the API key with capacity left
+    according to the ApiKeyScheduler, which also holds back throttled keys.
+    """
+
+    LOGGER = config.get_logger("AsyncCitationClient")
+
+    DEFAULT_MAX_IN_FLIGHT = 16
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 0.5
+
+    def __init__(
+        self,
+        api_keys: [str] = (),
+        url: str = ELINK_URL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        timeout: int = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        scheduler: ApiKeyScheduler = None,
+    ):
+        """
+        Initialize client, the session is opened by the first request.
+
+        Keyword Arguments:
+            api_keys {[str]} -- NCBI API keys, rate limited per key
+            url {str} -- elink endpoint
+            batch_size {int} -- maximum number of PMIDs per request
+            max_in_flight {int} -- maximum number of concurrent requests
+            timeout {int} -- request timeout in seconds
+            retries {int} -- number of retries after failed requests
+            backoff {float} -- base delay in seconds before retrying
+            scheduler {ApiKeyScheduler} -- shared scheduler, instead of one
+                                           rate limiting api_keys
+        """
+        self._scheduler = scheduler or ApiKeyScheduler(api_keys)
+        self._url = url
+        self._batch_size = max(batch_size, 1)
+        self._max_in_flight = max(max_in_flight, 1)
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._session = None
+        self._in_flight = None
+
+    @property
+    def batch_size(self) -> int:
+        """Maximum number of PMIDs per request."""
+        return self._batch_size
+
+    @property
+    def max_in_flight(self) -> int:
+        """Maximum number of concurrent requests."""
+        return self._max_in_flight
+
+    @property
+    def scheduler(self) -> ApiKeyScheduler:
+        """Scheduler rate limiting requests per API key."""
+        return self._scheduler
+
+    async def open(self):
+        """Open pooled keep-alive session, if not open yet."""
+        if self._session is None:
+            self._in_flight = asyncio.Semaphore(self._max_in_flight)
+            connector = aiohttp.TCPConnector(limit=self._max_in_flight)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+
+    async def close(self):
+        """Close session and its pooled connections."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self.LOGGER.info(self._scheduler.report())
+
+    async def __aenter__(self):
+        """Open session."""
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        """Close session."""
+        await self.close()
+
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter, so retries don't arrive in bursts."""
+        return self._backoff * (2**attempt) * uniform(0.5, 1.5)
+
+    async def _post(self, pmids: [int]) -> str:
+        """Send one elink request with the next API key, return response text."""
+        async with self._in_flight:
+            api_key = await self._scheduler.acquire()
+            async with self._session.post(
+                self._url, data=elink_params(pmids, api_key)
+            ) as response:
+                if response.status == 429:
+                    self._scheduler.throttled(api_key, _retry_after(response.headers))
+                    raise ThrottledError("429 Too Many Requests")
+                response.raise_for_status()
+                text = await response.text()
+        self._scheduler.succeeded(api_key)
+        return text
+
+    async def fetch_batch(self, pmids: [int]) -> {int: [str]}:
+        """
+        Fetch citing articles of one batch of pmids with a single request.
+
+        Raises:
+            CitationError -- If batch couldn't be fetched after all retries
+        """
+        await self.open()
+        error = None
+        throttled = False
+        for attempt in range(self._retries + 1):
+            if attempt and not throttled:
+                # Throttled keys are already held back by the scheduler
+                await asyncio.sleep(self._retry_delay(attempt - 1))
+            throttled = False
+            try:
+                fetched = parse_elink(await self._post(pmids))
+                return {int(pmid): fetched.get(int(pmid), []) for pmid in pmids}
+            except ThrottledError as exp:
+                throttled = True
+                error = exp.message
+            except CitationError as exp:
+                error = exp.message
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exp:
+                error = str(exp) or type(exp).__name__
+            self.LOGGER.warning(
+                f"elink attempt {attempt + 1} for {len(pmids)} PMIDs failed: {error}"
+            )
+        raise CitationError(f"Unable to fetch citations: {error}")
+
+    async def fetch(self, pmids: [int]) -> {int: [str]}:
+        """
+        Fetch citing articles of pmids, all batches concurrently.
+
+        Returns:
+            {int: [str]} -- PMIDs of citing articles, keyed by cited PMID.
+                            PMIDs without citations map to an empty list.
+
+        Raises:
+            CitationError -- If a batch couldn't be fetched
+        """
+        tasks = [
+            asyncio.ensure_future(self.fetch_batch(batch))
+            for batch in batches(pmids, self._batch_size)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # gather leaves the other batches running when one fails
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        citations = {}
+        for result in results:
+            citations.update(result)
+        return citations
+
+    async def iter_fetch(self, pmids: Iterable[int]) -> AsyncGenerator:
+        """
+        Fetch citing articles of a (lazy) stream of pmids.
+
+        Only a bounded window of batches is scheduled at a time, so any number
+        of pmids can be streamed. Results are yielded as batches complete, not
+        in pmid order.
+
+        Returns:
+            AsyncGenerator -- yields (batch pmids, citations) tuples, citations
+                              is None if the batch couldn't be fetched
+        """
+        batch_iter = batches(pmids, self._batch_size)
+        pending = {}
+        try:
+            while True:
+                while len(pending) < 2 * self._max_in_flight:
+                    batch = next(batch_iter, None)
+                    if batch is None:
+                        break
+                    pending[asyncio.ensure_future(self.fetch_batch(batch))] = batch
+                if not pending:
+                    return
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    batch = pending.pop(task)
+                    try:
+                        yield batch, task.result()
+                    except CitationError as exp:
+                        self.LOGGER.error(exp.message)
+                        yield batch, None
+        finally:
+            # Consumer stopped early, don't leave batches running
+            for task in pending:
+                task.cancel()
+
+
+class CitationFetcher:
+    """
+    Blocking facade of AsyncCitationClient for synchronous callers.
+
+    Runs the client on its own event loop, so the session and its keep-alive
+    connections are reused across fetch calls. With a cache, only PMIDs
+    missing from the cache are requested and their citations are cached.
+    """
+
+    def __init__(self, cache: CitationCache = None, **kwargs):
+        """
+        Initialize fetcher, see AsyncCitationClient for keyword arguments.
+
+        Keyword Arguments:
+            cache {CitationCache} -- cache of previously fetched citations
+        """
+        self._cache = cache
+        self._loop = asyncio.new_event_loop()
+        self._client = AsyncCitationClient(**kwargs)
+
+    def fetch(self, pmids: [int]) -> {int: [str]}:
+        """
+        Fetch citing articles of pmids, batches are requested concurrently.
+
+        Returns:
+            {int: [str]} -- PMIDs of citing articles, keyed by cited PMID.
+                            PMIDs without citations map to an empty list.
+
+        Raises:
+            CitationError -- If a batch couldn't be fetched
+        """
+        if self._cache is None:
+            return self._loop.run_until_complete(self._client.fetch(pmids))
+        citations = self._cache.get_many(pmids)
+        missing = [pmid for pmid in pmids if int(pmid) not in citations]
+        if missing:
+            fetched = self._loop.run_until_complete(self._client.fetch(missing))
+            self._cache.put_many(fetched)
+            citations.update(fetched)
+        return citations
+
+    def close(self):
+        """Close http session and event loop."""
+        self._loop.run_until_complete(self._client.close())
+        self._loop.close()
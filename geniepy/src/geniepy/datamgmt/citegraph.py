@@ -0,0 +1,308 @@
+"""
+Compact citation graph store.
+
+The graph is stored in compressed sparse row (CSR) form, in both directions:
+'cited_by' rows hold the PMIDs citing each PMID, and 'cites' rows the PMIDs
+each PMID cites. Rows are indexed by PMID, so each direction is an int32
+offsets array of length max PMID + 2 and an int32 indices array of length
+number of citations, saved as .npy files.
+
+Arrays are opened as read only memory maps, so lookups are O(1) slices that
+don't copy any data, and processes opening the same store share its pages.
+"""
+from pathlib import Path
+from typing import Generator, Iterable
+import csv
+import os
+import numpy as np
+
+INDEX_DTYPE = np.int32
+"""Dtype of offsets and indices arrays."""
+CITED_BY = "cited_by"
+"""Direction from cited to citing PMIDs."""
+CITES = "cites"
+"""Direction from citing to cited PMIDs."""
+DIRECTIONS = (CITED_BY, CITES)
+
+
+def _array_path(directory: Path, direction: str, name: str) -> Path:
+    """Path of offsets or indices array of direction."""
+    return directory.joinpath(f"{direction}.{name}.npy")
+
+
+class CitationGraph:
+    """Read only, memory mapped CSR citation graph."""
+
+    __slots__ = ["_directory", "_offsets", "_indices"]
+
+    def __init__(self, directory: str):
+        """
+        Open graph store.
+
+        Arguments:
+            directory {str} -- directory of the store's .npy files
+
+        Raises:
+            FileNotFoundError -- If the store wasn't built
+        """
+        self._directory = Path(directory).expanduser()
+        self._offsets = {}
+        self._indices = {}
+        for direction in DIRECTIONS:
+            self._offsets[direction] = np.load(
+                _array_path(self._directory, direction, "offsets"), mmap_mode="r"
+            )
+            self._indices[direction] = np.load(
+                _array_path(self._directory, direction, "indices"), mmap_mode="r"
+            )
+
+    @property
+    def num_nodes(self) -> int:
+        """Number of rows, i.e. max PMID + 1."""
+        return len(self._offsets[CITED_BY]) - 1
+
+    @property
+    def num_edges(self) -> int:
+        """Number of citations."""
+        return len(self._indices[CITED_BY])
+
+    def csr(self, direction: str = CITED_BY) -> (np.ndarray, np.ndarray):
+        """
+        Memory mapped arrays of direction.
+
+        Keyword Arguments:
+            direction {str} -- CITED_BY or CITES
+
+        Returns:
+            (np.ndarray, np.ndarray) -- (offsets, indices) arrays
+        """
+        return self._offsets[direction], self._indices[direction]
+
+    def _row(self, direction: str, pmid: int) -> np.ndarray:
+        """Slice of indices of row pmid, empty for unknown PMIDs."""
+        offsets = self._offsets[direction]
+        if not 0 <= pmid < len(offsets) - 1:
+            return self._indices[direction][:0]
+        return self._indices[direction][offsets[pmid] : offsets[pmid + 1]]
+
+    def cited_by(self, pmid: int) -> np.ndarray:
+        """PMIDs citing pmid, a read only view of the store."""
+        return self._row(CITED_BY, int(pmid))
+
+    def cites(self, pmid: int) -> np.ndarray:
+        """PMIDs cited by pmid, a read only view of the store."""
+        return self._row(CITES, int(pmid))
+
+    def citation_count(self, pmid: int) -> int:
+        """Number of articles citing pmid."""
+        return len(self.cited_by(pmid))
+
+    def reference_count(self, pmid: int) -> int:
+        """Number of articles cited by pmid."""
+        return len(self.cites(pmid))
+
+    def degrees(self, direction: str = CITED_BY) -> np.ndarray:
+        """Row lengths of direction, i.e. citation counts of every PMID."""
+        return np.diff(self._offsets[direction])
+
+    def new_citations(self, cited_by: Iterable[tuple]) -> np.ndarray:
+        """
+        Citations of a stream of cited-by lists missing from the store.
+
+        Arguments:
+            cited_by {Iterable[tuple]} -- (cited PMID, citing PMIDs) tuples
+
+        Returns:
+            np.ndarray -- (k, 2) array of unique (cited, citing) PMID pairs
+        """
+        edges = [np.zeros((0, 2), dtype=np.int64)]
+        for cited, citing in cited_by:
+            citing = np.asarray(citing, dtype=np.int64)
+            missing = np.setdiff1d(citing, self.cited_by(cited))
+            if len(missing):
+                pairs = np.empty((len(missing), 2), dtype=np.int64)
+                pairs[:, 0] = int(cited)
+                pairs[:, 1] = missing
+                edges.append(pairs)
+        return np.unique(np.concatenate(edges), axis=0)
+
+
+class CitationGraphBuilder:
+    """
+    Build a CitationGraph store from a stream of cited-by lists.
+
+    Citations are spooled to disk as they are added, while the degree of every
+    PMID is counted. Building then computes the offsets from the degrees and
+    scatters the spooled citations into memory mapped indices arrays, a chunk
+    at a time, so memory usage is bounded by the offsets arrays. Rows keep the
+    order in which citations were added.
+    """
+
+    DEFAULT_CHUNK_SIZE = 1 << 22
+    SPOOL_NAME = ".edges.spool"
+
+    def __init__(self, directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize builder, the store is written when built.
+
+        Arguments:
+            directory {str} -- directory of the store's .npy files
+
+        Keyword Arguments:
+            chunk_size {int} -- number of citations buffered in memory
+        """
+        self._directory = Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._chunk_size = max(chunk_size, 1)
+        self._spool_path = self._directory.joinpath(self.SPOOL_NAME)
+        self._spool = open(self._spool_path, "wb")
+        self._buffer = []
+        self._buffered = 0
+        self._degrees = {
+            direction: np.zeros(0, dtype=np.int64) for direction in DIRECTIONS
+        }
+        self._num_edges = 0
+
+    def add(self, cited: int, citing: Iterable[int]):
+        """Add PMIDs citing cited."""
+        citing = np.asarray(citing, dtype=np.int64)
+        if not len(citing):
+            return
+        edges = np.empty((len(citing), 2), dtype=np.int64)
+        edges[:, 0] = int(cited)
+        edges[:, 1] = citing
+        self._buffer.append(edges)
+        self._buffered += len(edges)
+        if self._buffered >= self._chunk_size:
+            self._flush()
+
+    def add_cited_by(self, cited_by: Iterable[tuple]) -> int:
+        """
+        Add stream of cited-by lists.
+
+        Streams of iter_citations_csv, iter_article_citations and
+        ReferenceIndex.iter_cited_by can be added as they are.
+
+        Arguments:
+            cited_by {Iterable[tuple]} -- (cited PMID, citing PMIDs) tuples
+
+        Returns:
+            int -- number of citations added so far
+        """
+        for cited, citing in cited_by:
+            self.add(cited, citing)
+        return self._num_edges + self._buffered
+
+    def _count(self, direction: str, rows: np.ndarray):
+        """Add rows to degrees of direction, growing it to the max PMID."""
+        degrees = self._degrees[direction]
+        counts = np.bincount(rows, minlength=len(degrees))
+        counts[: len(degrees)] += degrees
+        self._degrees[direction] = counts
+
+    def _flush(self):
+        """Spool buffered citations and count their degrees."""
+        if not self._buffer:
+            return
+        edges = np.concatenate(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        if edges.min() < 0 or edges.max() > np.iinfo(INDEX_DTYPE).max:
+            raise ValueError("PMIDs must fit in int32")
+        self._count(CITED_BY, edges[:, 0])
+        self._count(CITES, edges[:, 1])
+        edges.astype(INDEX_DTYPE).tofile(self._spool)
+        self._num_edges += len(edges)
+
+    def _iter_spool(self) -> Generator[np.ndarray, None, None]:
+        """Read spooled (cited, citing) citations a chunk at a time."""
+        with open(self._spool_path, "rb") as spool:
+            while True:
+                chunk = np.fromfile(
+                    spool, dtype=INDEX_DTYPE, count=2 * self._chunk_size
+                )
+                if not len(chunk):
+                    return
+                yield chunk.reshape(-1, 2)
+
+    def build(self) -> CitationGraph:
+        """
+        Write the store and open it.
+
+        Returns:
+            CitationGraph -- The memory mapped graph
+
+        Raises:
+            ValueError -- If there are too many citations for int32 offsets
+        """
+        self._flush()
+        self._spool.close()
+        if self._num_edges > np.iinfo(INDEX_DTYPE).max:
+            raise ValueError(f"{self._num_edges} citations overflow int32 offsets")
+        num_nodes = max(len(degrees) for degrees in self._degrees.values())
+        # Rows are (cited, citing) for CITED_BY, (citing, cited) for CITES
+        for column, direction in enumerate(DIRECTIONS):
+            degrees = np.zeros(num_nodes, dtype=np.int64)
+            degrees[: len(self._degrees[direction])] = self._degrees[direction]
+            offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+            np.cumsum(degrees, out=offsets[1:])
+            self._write_direction(direction, offsets, column)
+        os.remove(self._spool_path)
+        return CitationGraph(str(self._directory))
+
+    def _write_direction(self, direction: str, offsets: np.ndarray, column: int):
+        """Scatter spooled citations into indices array of direction."""
+        indices_path = _array_path(self._directory, direction, "indices")
+        tmp_indices = indices_path.with_name("." + indices_path.name)
+        indices = np.lib.format.open_memmap(
+            tmp_indices, mode="w+", dtype=INDEX_DTYPE, shape=(self._num_edges,)
+        )
+        cursor = offsets[:-1].copy()
+        for chunk in self._iter_spool():
+            rows, cols = chunk[:, column], chunk[:, 1 - column]
+            order = np.argsort(rows, kind="stable")
+            rows, cols = rows[order], cols[order]
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            sizes = np.diff(np.r_[starts, len(rows)])
+            rank = np.arange(len(rows)) - np.repeat(starts, sizes)
+            indices[cursor[rows] + rank] = cols
+            cursor[rows[starts]] += sizes
+        indices.flush()
+        del indices
+        offsets_path = _array_path(self._directory, direction, "offsets")
+        tmp_offsets = offsets_path.with_name("." + offsets_path.name)
+        np.save(tmp_offsets, offsets.astype(INDEX_DTYPE))
+        os.replace(tmp_indices, indices_path)
+        os.replace(tmp_offsets, offsets_path)
+
+
+def iter_citations_csv(path: str) -> Generator[tuple, None, None]:
+    """
+    Stream cited-by lists of a citations csv file.
+
+    Each row holds a cited PMID followed by the PMIDs citing it, i.e.
+    1234567,23456,5678 (see front-end/article_rank/fetch.py).
+
+    Returns:
+        Generator[tuple] -- (cited PMID, [citing PMIDs]) tuples
+    """
+    with open(path, "r", newline="") as csv_file:
+        for row in csv.reader(csv_file):
+            if row and row[0].strip().isdigit():
+                yield int(row[0]), [int(pmid) for pmid in row[1:] if pmid]
+
+
+def iter_article_citations(chunks: Iterable[list]) -> Generator[tuple, None, None]:
+    """
+    Stream cited-by lists of scraped articles, see PubMedScraper.scrape.
+
+    Arguments:
+        chunks {Iterable[list]} -- chunks of articles with citation metadata
+
+    Returns:
+        Generator[tuple] -- (cited PMID, [citing PMIDs]) tuples
+    """
+    for chunk in chunks:
+        for article in chunk:
+            if article.pmid and article.citationPmid:
+                yield int(article.pmid), article.citationPmid.split(",")
@@ -0,0 +1,333 @@
+"""
+Gene-disease co-occurrence counts over Pubtator annotations.
+
+Pubtator gene and disease annotations are joined on PMID with sparse
+incidence matrices: for a range of PMIDs, G is the genes x PMIDs matrix of
+gene annotations and D the (disease, year) x PMIDs matrix of disease
+annotations, each paper's column shifted to the row of its publication year.
+G @ D.T then counts, for every gene, disease and year, the papers annotated
+with both, in a single sparse product.
+
+Both phases run out of core. Annotations are appended to PMID range partition
+files as they are streamed in, then each PMID range is joined on its own and
+its counts are appended to gene partition files, which are finally summed one
+at a time. Memory is bounded by the size of a partition instead of the size of
+the Pubtator tables.
+"""
+from pathlib import Path
+from typing import Generator, Iterable
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+PMID_SPAN = 1 << 20
+"""Number of PMIDs per annotation partition."""
+COUNT_PARTITIONS = 64
+"""Number of gene partitions of the counts."""
+ANNOTATION_DTYPE = np.int32
+"""PMIDs and entity codes fit in 32 bit integers."""
+COUNTS_COLUMNS = ["gene_id", "disease_id", "year", "pub_count", "pub_cum_count"]
+GENES = "genes"
+DISEASES = "diseases"
+
+
+class EntityCodes:
+    """Dense integer codes of entity IDs, in order of appearance."""
+
+    def __init__(self):
+        """Initialize empty vocabulary."""
+        self._codes = {}
+        self._ids = []
+
+    def __len__(self) -> int:
+        """Number of entities."""
+        return len(self._ids)
+
+    def encode(self, ids: np.ndarray) -> np.ndarray:
+        """Codes of ids, new IDs get the next codes."""
+        inverse, uniques = pd.factorize(ids)
+        codes = np.empty(len(uniques), dtype=np.int64)
+        for index, entity in enumerate(uniques):
+            code = self._codes.get(entity)
+            if code is None:
+                code = self._codes[entity] = len(self._ids)
+                self._ids.append(entity)
+            codes[index] = code
+        return codes[inverse]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """IDs of codes."""
+        return np.asarray(self._ids, dtype=object)[codes]
+
+
+class CooccurrenceEngine:
+    """
+    Per year counts of papers annotated with both a gene and a disease.
+
+    Annotated papers without a known publication year aren't counted. Entities
+    with several IDs separated by ';' (e.g. Pubtator genes) count for each of
+    their IDs, and an entity annotating a paper many times counts once.
+    """
+
+    DEFAULT_BUFFER_SIZE = 1 << 22
+
+    # pylint: disable=bad-continuation
+    def __init__(
+        self,
+        directory: str,
+        pmid_span: int = PMID_SPAN,
+        count_partitions: int = COUNT_PARTITIONS,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ):
+        """
+        Initialize engine, spooling partitions to a new private directory.
+
+        Arguments:
+            directory {str} -- parent of the work directory, created if missing
+
+        Keyword Arguments:
+            pmid_span {int} -- number of PMIDs per annotation partition
+            count_partitions {int} -- number of gene partitions of the counts
+            buffer_size {int} -- annotations buffered before written
+        """
+        parent = Path(directory).expanduser()
+        parent.mkdir(parents=True, exist_ok=True)
+        # Own directory, other files and engines in parent are left alone
+        self._directory = Path(tempfile.mkdtemp(prefix="counts-", dir=parent))
+        self._span = pmid_span
+        self._count_partitions = max(count_partitions, 1)
+        self._buffer_size = max(buffer_size, 1)
+        self._codes = {GENES: EntityCodes(), DISEASES: EntityCodes()}
+        self._buffers = {GENES: [], DISEASES: []}
+        self._buffered = {GENES: 0, DISEASES: 0}
+        self._years = np.zeros(0, dtype=np.int16)
+
+    @property
+    def num_genes(self) -> int:
+        """Number of distinct gene IDs added."""
+        return len(self._codes[GENES])
+
+    @property
+    def num_diseases(self) -> int:
+        """Number of distinct disease IDs added."""
+        return len(self._codes[DISEASES])
+
+    def _path(self, kind: str, partition: int) -> Path:
+        """Path of partition file of kind."""
+        return self._directory.joinpath(f"{kind}-{partition:05d}.i32")
+
+    # pylint: disable=bad-continuation
+    def _add(
+        self, kind: str, chunks: Iterable[pd.DataFrame], column: str, prefix: str = ""
+    ) -> int:
+        """Encode and spool (PMID, entity) annotations of chunks."""
+        count = 0
+        for chunk in chunks:
+            chunk = chunk[["PMID", column]].dropna()
+            ids = chunk[column].astype(str).str.split(";")
+            lengths = ids.str.len().to_numpy()
+            pmids = np.repeat(chunk["PMID"].to_numpy(dtype=np.int64), lengths)
+            ids = np.concatenate(ids.to_numpy()) if len(ids) else np.array([])
+            if prefix and len(ids):
+                ids = pd.Series(ids, dtype=object)
+                prefixed = ids.str.startswith(prefix)
+                ids = ids.where(~prefixed, ids.str[len(prefix) :]).to_numpy()
+            annotations = np.empty((len(pmids), 2), dtype=ANNOTATION_DTYPE)
+            annotations[:, 0] = pmids
+            annotations[:, 1] = self._codes[kind].encode(ids)
+            self._buffers[kind].append(annotations)
+            self._buffered[kind] += len(annotations)
+            if self._buffered[kind] >= self._buffer_size:
+                self._flush(kind)
+            count += len(annotations)
+        self._flush(kind)
+        return count
+
+    def add_genes(self, chunks: Iterable[pd.DataFrame], column: str = "GeneID") -> int:
+        """
+        Add gene annotations, i.e. PubtatorGeneScraper or gene2pubtator chunks.
+
+        Returns:
+            int -- number of annotations added
+        """
+        return self._add(GENES, chunks, column)
+
+    # pylint: disable=bad-continuation
+    def add_diseases(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        column: str = "DiseaseID",
+        prefix: str = "",
+    ) -> int:
+        """
+        Add disease annotations, i.e. PubtatorDiseaseScraper chunks.
+
+        Keyword Arguments:
+            column {str} -- disease ID column
+            prefix {str} -- prefix removed from IDs, i.e. 'MESH:' to count
+                            diseases by the mesh_id of CTD relationships
+
+        Returns:
+            int -- number of annotations added
+        """
+        return self._add(DISEASES, chunks, column, prefix)
+
+    def add_years(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Add publication years of papers, i.e. pubmed table chunks.
+
+        Arguments:
+            chunks {Iterable[pd.DataFrame]} -- pmid and date_completed chunks
+
+        Returns:
+            int -- number of papers with a year
+        """
+        count = 0
+        for chunk in chunks:
+            years = pd.to_numeric(
+                chunk["date_completed"].astype(str).str[:4], errors="coerce"
+            )
+            pmids = pd.to_numeric(chunk["pmid"], errors="coerce")
+            known = (years.notna() & pmids.notna()).to_numpy()
+            pmids = pmids.to_numpy()[known].astype(np.int64)
+            if not len(pmids):
+                continue
+            if pmids.max() >= len(self._years):
+                grown = np.zeros(pmids.max() + 1, dtype=np.int16)
+                grown[: len(self._years)] = self._years
+                self._years = grown
+            self._years[pmids] = years.to_numpy()[known]
+            count += len(pmids)
+        return count
+
+    def _flush(self, kind: str):
+        """Append buffered annotations to their PMID partition files."""
+        if not self._buffers[kind]:
+            return
+        annotations = np.concatenate(self._buffers[kind])
+        self._buffers[kind] = []
+        self._buffered[kind] = 0
+        partitions = annotations[:, 0] // self._span
+        order = np.argsort(partitions, kind="stable")
+        annotations, partitions = annotations[order], partitions[order]
+        bounds = np.flatnonzero(np.diff(partitions)) + 1
+        for chunk in np.split(annotations, bounds):
+            partition = int(chunk[0, 0] // self._span)
+            with open(self._path(kind, partition), "ab") as part_file:
+                chunk.tofile(part_file)
+
+    def _load(self, path: Path, columns: int) -> np.ndarray:
+        """Load partition file as rows of columns int32."""
+        if not path.exists():
+            return np.zeros((0, columns), dtype=ANNOTATION_DTYPE)
+        return np.fromfile(path, dtype=ANNOTATION_DTYPE).reshape(-1, columns)
+
+    def _incidence(self, rows: np.ndarray, cols: np.ndarray, shape) -> sp.csr_matrix:
+        """0/1 csr matrix of (rows, cols), duplicates counted once."""
+        matrix = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=shape
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix
+
+    def _join(self, partition: int, first_year: int, num_years: int) -> int:
+        """Count co-occurrences of PMID partition into count partitions."""
+        genes = self._load(self._path(GENES, partition), 2)
+        diseases = self._load(self._path(DISEASES, partition), 2)
+        if not len(genes) or not len(diseases):
+            return 0
+        start = partition * self._span
+        years = np.zeros(self._span, dtype=np.int64)
+        known = self._years[start : start + self._span]
+        years[: len(known)] = known
+        # Papers without a year aren't counted
+        genes = genes[years[genes[:, 0] - start] > 0]
+        diseases = diseases[years[diseases[:, 0] - start] > 0]
+        gene_matrix = self._incidence(
+            genes[:, 1], genes[:, 0] - start, (self.num_genes, self._span)
+        )
+        year_rows = years[diseases[:, 0] - start] - first_year
+        disease_matrix = self._incidence(
+            diseases[:, 1].astype(np.int64) * num_years + year_rows,
+            diseases[:, 0] - start,
+            (self.num_diseases * num_years, self._span),
+        )
+        counts = (gene_matrix @ disease_matrix.T).tocoo()
+        if not counts.nnz:
+            return 0
+        rows = np.empty((counts.nnz, 4), dtype=ANNOTATION_DTYPE)
+        rows[:, 0] = counts.row
+        rows[:, 1] = counts.col // num_years
+        rows[:, 2] = counts.col % num_years + first_year
+        rows[:, 3] = counts.data
+        partitions = rows[:, 0] % self._count_partitions
+        for count_partition in np.unique(partitions):
+            with open(self._path("counts", count_partition), "ab") as part_file:
+                rows[partitions == count_partition].tofile(part_file)
+        return counts.nnz
+
+    def _reduce(self, partition: int) -> pd.DataFrame:
+        """Sum counts of gene partition over PMID partitions."""
+        rows = self._load(self._path("counts", partition), 4).astype(np.int64)
+        if not len(rows):
+            return None
+        # Sort by gene, disease, year and sum equal keys
+        order = np.lexsort((rows[:, 2], rows[:, 1], rows[:, 0]))
+        rows = rows[order]
+        starts = np.flatnonzero(
+            np.r_[True, (rows[1:, :3] != rows[:-1, :3]).any(axis=1)]
+        )
+        keys = rows[starts, :3]
+        counts = np.add.reduceat(rows[:, 3], starts)
+        # Cumulative counts restart at the first year of each pair
+        pairs = np.flatnonzero(
+            np.r_[True, (keys[1:, :2] != keys[:-1, :2]).any(axis=1)]
+        )
+        cumulative = np.cumsum(counts)
+        offsets = np.repeat(
+            cumulative[pairs] - counts[pairs], np.diff(np.r_[pairs, len(keys)])
+        )
+        return pd.DataFrame(
+            {
+                "gene_id": self._codes[GENES].decode(keys[:, 0]),
+                "disease_id": self._codes[DISEASES].decode(keys[:, 1]),
+                "year": keys[:, 2].astype(np.int16),
+                "pub_count": counts.astype(np.int32),
+                "pub_cum_count": (cumulative - offsets).astype(np.int32),
+            },
+            columns=COUNTS_COLUMNS,
+        )
+
+    def iter_counts(self) -> Generator[pd.DataFrame, None, None]:
+        """
+        Join gene and disease annotations on PMID and count them per year.
+
+        Returns:
+            Generator[pd.DataFrame] -- chunks of gene_id, disease_id, year,
+                                       pub_count and pub_cum_count (papers up
+                                       to year) rows, a chunk per gene partition
+                                       sorted by gene, disease and year
+        """
+        for kind in (GENES, DISEASES):
+            self._flush(kind)
+        known = self._years[self._years > 0]
+        if not len(known):
+            return
+        first_year = int(known.min())
+        num_years = int(known.max()) - first_year + 1
+        partitions = {
+            int(path.stem.split("-")[1]) for path in self._directory.glob("genes-*")
+        }
+        for partition in sorted(partitions):
+            self._join(partition, first_year, num_years)
+        for partition in range(self._count_partitions):
+            counts = self._reduce(partition)
+            if counts is not None:
+                yield counts
+
+    def close(self):
+        """Delete private work directory."""
+        shutil.rmtree(self._directory, ignore_errors=True)
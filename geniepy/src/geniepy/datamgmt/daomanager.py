@@ -36,6 +36,8 @@ class DaoManager:
         "_scores",
     ]
 
+    LOGGER = config.get_logger("DaoManager")
+
     def create_repos(self):
         """Configure and create scoring repositories."""
         credentials = config.get_credentials()
@@ -122,6 +124,12 @@ class DaoManager:
         # Make sure go past max to include all numbers in range
         return int(max_df.iloc[0][0]) + chunksize
 
+    def get_pmid_range(self) -> (int, int):
+        """Retrieve the (min, max) PMIDs of ingested PubMed articles."""
+        range_query = self._pubmed_dao.query_all.replace("*", "MIN(pmid), MAX(pmid)")
+        range_df = next(self._pubmed_dao.query(range_query, 1, exact=True))
+        return int(range_df.iloc[0][0]), int(range_df.iloc[0][1])
+
     def get_features(self, offset: int, chunksize: int) -> pd.DataFrame:
         """
         Generate the dataframe records for classifiers.
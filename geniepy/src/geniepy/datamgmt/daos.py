@@ -17,6 +17,8 @@ from geniepy.datamgmt.parsers import (
     PubtatorDiseaseParser,
     SjrParser,
 )
+from geniepy.datamgmt.snapshots import is_removed
+from geniepy.datamgmt.references import is_updated
 import geniepy.datamgmt.repositories as dr
 
 
@@ -67,26 +69,38 @@ class BaseDao(ABC):
             data.
         """
         for chunk_df in self._parser.fetch(chunksize, **kwargs):
-            self._repository.save(chunk_df)
+            if is_removed(chunk_df):
+                # Rows removed from source since last update
+                self._repository.delete(chunk_df)
+            elif is_updated(chunk_df):
+                # Columns of records stored by previous chunks or runs
+                self._repository.update(chunk_df)
+            else:
+                self._repository.save(self._parser.to_table(chunk_df))
+        # Deletes the repository staged for the whole refresh
+        self._repository.flush()
 
     def purge(self):
         """Purge all dao's database records."""
         self._repository.delete_all()
 
     # pylint: disable=bad-continuation
-    def query(self, query: str, chunksize: int) -> Generator[DataFrame, None, None]:
+    def query(
+        self, query: str, chunksize: int, exact=False
+    ) -> Generator[DataFrame, None, None]:
         """
         Query DAO repo and returns a generator of DataFrames with query results.
 
         Keyword Arguments:
             query {str} -- Query string.
             chunksize {int} -- Number of rows of dataframe per chunk
+            exact {bool} -- If true, query is sent as is (i.e. aggregates)
 
         Returns:
             Generator[DataFrame] -- Generator to iterate over DataFrame results.
         """
         # pylint: disable=no-member
-        return self._repository.query(query=query, chunksize=chunksize)
+        return self._repository.query(query=query, chunksize=chunksize, exact=exact)
 
     def save(self, payload: DataFrame):
         """
@@ -0,0 +1,339 @@
+"""
+FTP download management.
+
+Keeps a small pool of logged-in FTP sessions to be reused across downloads,
+resumes interrupted transfers from where they stopped and verifies downloaded
+files against the .md5 sidecar files published next to them (i.e. NCBI PubMed).
+Single file sources (i.e. Pubtator, SJR) are streamed instead of downloaded,
+decompressing them on the fly, so they can be parsed while they download.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from ftplib import FTP, error_perm, all_errors
+from io import BufferedReader, BytesIO
+from urllib.error import URLError
+from urllib.request import urlopen
+from pathlib import Path
+from queue import LifoQueue, Empty
+from threading import BoundedSemaphore
+import fnmatch
+import gzip
+import hashlib
+import os
+import geniepy.config as config
+from geniepy.errors import DownloadError
+
+RemoteFile = namedtuple("RemoteFile", "name size mtime")
+"""Remote directory entry, size and mtime (YYYYMMDDHHMMSS) are None if unknown."""
+
+DownloadedFile = namedtuple("DownloadedFile", "path md5")
+"""Downloaded file path and md5 hex digest, md5 is None if not verified."""
+
+GZIP_MAGIC = b"\x1f\x8b"
+STREAM_BUFFER_SIZE = 1 << 20
+STREAM_TIMEOUT = 60
+
+
+class FtpSessionPool:
+    """Thread safe pool of logged-in FTP sessions to a server directory."""
+
+    LOGGER = config.get_logger("FtpSessionPool")
+
+    DEFAULT_SIZE = 2
+    DEFAULT_TIMEOUT = 60
+
+    def __init__(
+        self,
+        server: str,
+        directory: str,
+        size: int = DEFAULT_SIZE,
+        timeout: int = DEFAULT_TIMEOUT,
+        port: int = 21,
+    ):
+        """
+        Initialize pool, sessions are only opened when first needed.
+
+        Arguments:
+            server {str} -- FTP server host name
+            directory {str} -- Remote directory sessions work from
+
+        Keyword Arguments:
+            size {int} -- Maximum number of open sessions
+            timeout {int} -- Socket timeout in seconds
+            port {int} -- FTP server port
+        """
+        self._server = server
+        self._directory = directory
+        self._timeout = timeout
+        self._port = port
+        self._size = max(size, 1)
+        self._idle = LifoQueue()
+        self._slots = BoundedSemaphore(self._size)
+
+    @property
+    def size(self) -> int:
+        """Maximum number of open sessions."""
+        return self._size
+
+    def _connect(self) -> FTP:
+        """Open new logged-in session in binary mode."""
+        ftp = FTP(timeout=self._timeout)
+        ftp.connect(self._server, self._port)
+        ftp.login()
+        ftp.cwd(self._directory)
+        ftp.voidcmd("TYPE I")
+        return ftp
+
+    def _get_idle(self) -> FTP:
+        """Return idle session still alive, None if there is none."""
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except Empty:
+                return None
+            try:
+                ftp.voidcmd("NOOP")
+                return ftp
+            except all_errors:
+                self._discard(ftp)
+
+    @staticmethod
+    def _discard(ftp: FTP):
+        """Close session, ignoring errors of already broken connections."""
+        try:
+            ftp.close()
+        except all_errors:
+            pass
+
+    @contextmanager
+    def session(self) -> FTP:
+        """
+        Borrow logged-in session from the pool.
+
+        Sessions are returned to the pool when done, unless an error occurred
+        while using them, in which case they are closed.
+        """
+        self._slots.acquire()
+        ftp = None
+        try:
+            ftp = self._get_idle() or self._connect()
+            yield ftp
+            self._idle.put(ftp)
+        except BaseException:
+            if ftp is not None:
+                self._discard(ftp)
+            raise
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close all idle sessions."""
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except Empty:
+                return
+            try:
+                ftp.quit()
+            except all_errors:
+                self._discard(ftp)
+
+
+class FtpDownloader:
+    """
+    Resumable, verified downloads of files from a FTP server directory.
+
+    Files are first written to a '.part' file which is renamed once the
+    transfer completed and the file checksum matched the '.md5' sidecar.
+    Interrupted transfers are resumed from the size of the '.part' file.
+    """
+
+    LOGGER = config.get_logger("FtpDownloader")
+
+    PART_EXTN = ".part"
+    MD5_EXTN = ".md5"
+    DEFAULT_RETRIES = 2
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(
+        self,
+        pool: FtpSessionPool,
+        download_dir: str,
+        retries: int = DEFAULT_RETRIES,
+        verify: bool = True,
+    ):
+        """
+        Initialize downloader.
+
+        Arguments:
+            pool {FtpSessionPool} -- Pool of sessions used to download files
+            download_dir {str} -- Local directory to download files to
+
+        Keyword Arguments:
+            retries {int} -- Number of retries after failed transfers
+            verify {bool} -- Verify files against their .md5 sidecar file
+        """
+        self._pool = pool
+        self._download_dir = Path(download_dir).expanduser()
+        self._retries = retries
+        self._verify = verify
+
+    @property
+    def sessions(self) -> int:
+        """Maximum number of concurrent downloads."""
+        return self._pool.size
+
+    def close(self):
+        """Close all ftp sessions."""
+        self._pool.close()
+
+    def list_files(self, pattern: str = "*") -> [str]:
+        """List names of files in remote directory matching pattern."""
+        with self._pool.session() as ftp:
+            names = [Path(name).name for name in ftp.nlst()]
+        return sorted(fnmatch.filter(names, pattern))
+
+    def list_remote(self, pattern: str = "*") -> [RemoteFile]:
+        """
+        List files in remote directory matching pattern, with size and mtime.
+
+        Uses a single MLSD listing, falling back to names only on servers
+        that don't support it.
+        """
+        with self._pool.session() as ftp:
+            try:
+                entries = [
+                    RemoteFile(
+                        name,
+                        int(facts["size"]) if "size" in facts else None,
+                        facts.get("modify"),
+                    )
+                    for name, facts in ftp.mlsd(facts=["type", "size", "modify"])
+                    if facts.get("type", "file") == "file"
+                ]
+            except error_perm:
+                entries = [
+                    RemoteFile(Path(name).name, None, None) for name in ftp.nlst()
+                ]
+        entries = [entry for entry in entries if fnmatch.fnmatch(entry.name, pattern)]
+        return sorted(entries)
+
+    def remote_md5(self, ftp: FTP, ftp_file: str) -> str:
+        """
+        Read md5 hex digest published in the sidecar file of ftp_file.
+
+        NCBI sidecars are formatted as: MD5(<filename>)= <hex digest>
+        """
+        sidecar = BytesIO()
+        ftp.retrbinary("RETR " + ftp_file + self.MD5_EXTN, sidecar.write)
+        content = sidecar.getvalue().decode("ascii").strip()
+        return content.split("=")[-1].strip().split()[0].lower()
+
+    @classmethod
+    def file_md5(cls, file_path: Path) -> str:
+        """Compute md5 hex digest of local file."""
+        md5 = hashlib.md5()
+        with open(file_path, "rb") as local_file:
+            for block in iter(lambda: local_file.read(cls.BUFFER_SIZE), b""):
+                md5.update(block)
+        return md5.hexdigest()
+
+    def _transfer(self, ftp: FTP, ftp_file: str, part_path: Path):
+        """Transfer remote file into part file, resuming from its current size."""
+        # Listings switch sessions to ASCII mode, where SIZE isn't allowed
+        ftp.voidcmd("TYPE I")
+        remote_size = ftp.size(ftp_file)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if remote_size is not None and offset > remote_size:
+            # Part file doesn't belong to current remote file
+            part_path.unlink()
+            offset = 0
+        if remote_size is not None and offset == remote_size:
+            return
+        if offset:
+            self.LOGGER.info(f"Resuming {ftp_file} from byte {offset}")
+        with open(part_path, "ab", buffering=self.BUFFER_SIZE) as part_file:
+            ftp.retrbinary(
+                "RETR " + ftp_file,
+                part_file.write,
+                blocksize=self.BUFFER_SIZE,
+                rest=offset or None,
+            )
+
+    def download(self, ftp_file: str) -> DownloadedFile:
+        """
+        Download remote file into download directory.
+
+        Arguments:
+            ftp_file {str} -- Name of the file in the remote directory
+
+        Returns:
+            DownloadedFile -- Absolute path to downloaded file and its md5
+
+        Raises:
+            DownloadError -- If file couldn't be downloaded and verified
+        """
+        self._download_dir.mkdir(parents=True, exist_ok=True)
+        file_path = self._download_dir.joinpath(ftp_file)
+        part_path = self._download_dir.joinpath(ftp_file + self.PART_EXTN)
+        error = None
+        actual = None
+        for attempt in range(self._retries + 1):
+            try:
+                with self._pool.session() as ftp:
+                    self._transfer(ftp, ftp_file, part_path)
+                    if self._verify:
+                        expected = self.remote_md5(ftp, ftp_file)
+                # Session is back in the pool: a corrupt file isn't a broken
+                # connection
+                if self._verify:
+                    actual = self.file_md5(part_path)
+                    if actual != expected:
+                        # Corrupt file can't be resumed, start over
+                        part_path.unlink()
+                        raise DownloadError(
+                            f"{ftp_file} md5 mismatch: {actual} != {expected}"
+                        )
+                os.replace(part_path, file_path)
+                return DownloadedFile(str(file_path), actual)
+            except DownloadError as exp:
+                error = exp.message
+            except all_errors as exp:
+                error = str(exp)
+            self.LOGGER.warning(
+                f"Download attempt {attempt + 1} of {ftp_file} failed: {error}"
+            )
+        raise DownloadError(f"Unable to download {ftp_file}: {error}")
+
+
+@contextmanager
+def open_url(url: str, timeout: int = STREAM_TIMEOUT) -> BufferedReader:
+    """
+    Open streaming download of url, e.g. ftp://, https:// or file://.
+
+    Nothing is written to disk, gzip data is detected from its magic number
+    and decompressed as it is read.
+
+    Arguments:
+        url {str} -- url of the file
+
+    Keyword Arguments:
+        timeout {int} -- Socket timeout in seconds
+
+    Returns:
+        BufferedReader -- Binary stream of the (decompressed) data
+
+    Raises:
+        DownloadError -- If url couldn't be opened
+    """
+    try:
+        response = urlopen(url, timeout=timeout)
+    except (URLError, OSError) as exp:
+        raise DownloadError(f"Unable to open {url}: {exp}")
+    try:
+        stream = BufferedReader(response, STREAM_BUFFER_SIZE)
+        if stream.peek(len(GZIP_MAGIC)).startswith(GZIP_MAGIC):
+            stream = BufferedReader(gzip.GzipFile(fileobj=stream), STREAM_BUFFER_SIZE)
+        yield stream
+    finally:
+        response.close()
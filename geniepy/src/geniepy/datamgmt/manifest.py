@@ -0,0 +1,167 @@
+"""
+Incremental sync manifest.
+
+Durable SQLite record of the files published by a remote source (i.e. PubMed
+baseline and update files), with their size, modification time, md5 and
+ingestion status. Scrapers use it to only fetch files that are new, changed,
+or whose ingestion didn't complete in a previous run.
+"""
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+from geniepy.datamgmt.downloads import RemoteFile
+
+PENDING = "pending"
+"""File is new or changed since it was last ingested."""
+DOWNLOADED = "downloaded"
+"""File was downloaded and verified, but not completely ingested."""
+INGESTED = "ingested"
+"""All records of file were ingested."""
+
+
+class SyncManifest:
+    """SQLite backed manifest of remote files and their ingestion status."""
+
+    __slots__ = ["_conn"]
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            directory TEXT NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER,
+            mtime TEXT,
+            md5 TEXT,
+            status TEXT NOT NULL,
+            updated TEXT NOT NULL,
+            PRIMARY KEY (directory, name)
+        )
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) manifest database.
+
+        Arguments:
+            path {str} -- path to sqlite database file, ':memory:' for tests
+        """
+        if path != ":memory:":
+            Path(path).expanduser().parent.mkdir(parents=True, exist_ok=True)
+            path = str(Path(path).expanduser())
+        # Only used by one thread at a time, but scrape generators may be
+        # resumed from a different thread than the one that created them
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(self.SCHEMA)
+
+    @staticmethod
+    def _now() -> str:
+        """Current timestamp."""
+        return datetime.now().isoformat(timespec="seconds")
+
+    def sync(self, directory: str, remote_files: [RemoteFile]) -> [str]:
+        """
+        Record remote listing and return files that need to be fetched.
+
+        New files are added as pending. Files whose size or modification time
+        changed since they were recorded are reset to pending.
+
+        Arguments:
+            directory {str} -- remote directory of the listed files
+            remote_files {[RemoteFile]} -- current remote listing
+
+        Returns:
+            [str] -- sorted names of remote files not yet ingested
+        """
+        now = self._now()
+        with self._conn:
+            for remote in remote_files:
+                row = self._conn.execute(
+                    "SELECT size, mtime FROM files WHERE directory=? AND name=?",
+                    (directory, remote.name),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO files VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                        (directory, remote.name, remote.size, remote.mtime, PENDING, now),
+                    )
+                elif self._changed(row, remote):
+                    self._conn.execute(
+                        "UPDATE files SET size=?, mtime=?, md5=NULL, status=?, updated=? "
+                        "WHERE directory=? AND name=?",
+                        (remote.size, remote.mtime, PENDING, now, directory, remote.name),
+                    )
+                elif row != (remote.size, remote.mtime):
+                    # Fill in attributes unknown when file was recorded
+                    self._conn.execute(
+                        "UPDATE files SET size=COALESCE(size, ?), mtime=COALESCE(mtime, ?) "
+                        "WHERE directory=? AND name=?",
+                        (remote.size, remote.mtime, directory, remote.name),
+                    )
+        names = {remote.name for remote in remote_files}
+        return [name for name in self.pending(directory) if name in names]
+
+    @staticmethod
+    def _changed(row: tuple, remote: RemoteFile) -> bool:
+        """Check if remote file changed, ignoring unknown attributes."""
+        size, mtime = row
+        if remote.size is not None and size is not None and remote.size != size:
+            return True
+        if remote.mtime is not None and mtime is not None and remote.mtime != mtime:
+            return True
+        return False
+
+    def pending(self, directory: str) -> [str]:
+        """Return sorted names of files in directory not yet ingested."""
+        rows = self._conn.execute(
+            "SELECT name FROM files WHERE directory=? AND status!=? ORDER BY name",
+            (directory, INGESTED),
+        )
+        return [row[0] for row in rows]
+
+    def set_status(self, directory: str, name: str, status: str, md5: str = None):
+        """Update ingestion status of file, and its md5 if given."""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE files SET status=?, md5=COALESCE(?, md5), updated=? "
+                "WHERE directory=? AND name=?",
+                (status, md5, self._now(), directory, name),
+            )
+
+    def status(self, directory: str, name: str) -> str:
+        """Return ingestion status of file, None if file isn't in manifest."""
+        row = self._conn.execute(
+            "SELECT status FROM files WHERE directory=? AND name=?", (directory, name)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, directory: str, name: str) -> dict:
+        """Return manifest entry of file as dict, None if file isn't in manifest."""
+        cursor = self._conn.execute(
+            "SELECT * FROM files WHERE directory=? AND name=?", (directory, name)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([col[0] for col in cursor.description], row))
+
+    def import_ingested(self, directory: str, names: [str]) -> int:
+        """
+        Record files ingested before the manifest existed (i.e. pubmed.dat).
+
+        Files already in the manifest are left untouched, so importing the same
+        names again has no effect.
+
+        Returns:
+            int -- number of files added to the manifest
+        """
+        now = self._now()
+        with self._conn:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO files VALUES (?, ?, NULL, NULL, NULL, ?, ?)",
+                [(directory, name, INGESTED, now) for name in names],
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Close manifest database."""
+        self._conn.close()
@@ -11,7 +11,8 @@ from pandas_schema import Column, Schema
 from pandas_schema.validation import IsDtypeValidation, MatchesPatternValidation
 import geniepy.datamgmt.scrapers as gs
 from geniepy.errors import ParserError
-from geniepy.pubmed import PubMedArticle
+from geniepy.datamgmt.references import is_updated
+from geniepy.pubmed import ArticleRecord
 from geniepy.classmgmt.classifiers import PCPCLSFR_NAME, CTCLSFR_NAME
 
 
@@ -45,6 +46,11 @@ class BaseParser(ABC):
             return ["Cannot validate None object"]
         return cls.schema.validate(payload)
 
+    @staticmethod
+    def to_table(data: DataFrame) -> DataFrame:
+        """Convert parsed data to the format stored by the repositories."""
+        return data
+
     @abstractstaticmethod
     def parse(data, dtype: DataType = None) -> DataFrame:
         """
@@ -185,8 +191,11 @@ class PubtatorDiseaseParser(BaseParser):
     def parse(data, dtype=DataType.DF) -> DataFrame:
         """Parse data and convert according to parser schema."""
         try:
-            parsed_df = data[["PMID", "DiseaseID"]].copy()
-            return parsed_df
+            columns = ["PMID", "DiseaseID"]
+            # Scraped chunks hold only these columns, don't copy them
+            if list(data.columns) == columns:
+                return data
+            return data[columns]
         except:
             return None
 
@@ -201,8 +210,11 @@ class PubtatorGeneParser(BaseParser):
     def parse(data, dtype=DataType.DF) -> DataFrame:
         """Parse data and convert according to parser schema."""
         try:
-            parsed_df = data[["PMID", "GeneID"]].copy()
-            return parsed_df
+            columns = ["PMID", "GeneID"]
+            # Scraped chunks hold only these columns, don't copy them
+            if list(data.columns) == columns:
+                return data
+            return data[columns]
         except:
             return None
 
@@ -217,7 +229,7 @@ class SjrParser(BaseParser):
     def parse(data, dtype=DataType.DF) -> DataFrame:
         """Parse data and convert according to parser schema."""
         try:
-            parsed_df = data[["Title", "SJR", "H index"]].copy()
+            parsed_df = data[gs.SjrScraper.COLUMNS].copy()
             parsed_df.rename(columns={"H index": "h_index"}, inplace=True)
             return parsed_df
         except:
@@ -254,10 +266,101 @@ class PubMedParser(BaseParser):
         ]
     )
 
+    COLUMNS = [
+        "pmid",
+        "date_completed",
+        "pub_model",
+        "title",
+        "iso_abbreviation",
+        "article_title",
+        "abstract",
+        "authors",
+        "language",
+        "chemicals",
+        "mesh_list",
+        "issn",
+        "issn_type",
+        "citation_count",
+        "citation_pmid",
+    ]
+    """The keys of the dataframe, in ArticleRecord.values order."""
+    LIST_COLUMNS = ["authors", "chemicals", "mesh_list"]
+    """Columns holding a list of values per article."""
+    CATEGORY_COLUMNS = [
+        "pub_model",
+        "title",
+        "iso_abbreviation",
+        "language",
+        "issn",
+        "issn_type",
+    ]
+    """Low cardinality columns, dictionary encoded."""
+    DATE_FORMAT = "%Y-%m-%d"
+    """Format of date_completed, as stored in the pubmed table."""
+    MISSING_DATE = "--"
+    """Stored date_completed of articles not completed."""
+
+    @staticmethod
+    def _article_values(article) -> tuple:
+        """Typed values of article, in COLUMNS order."""
+        if isinstance(article, ArticleRecord):
+            return article.values
+        # Property based PubMedArticle
+        return (
+            np.int64(article.pmid),
+            article.date_completed,
+            article.pub_model,
+            article.title,
+            article.iso_abbreviation,
+            article.article_title,
+            article.abstract,
+            article.authors,
+            article.language,
+            article.chemicals,
+            article.mesh_list,
+            article.issn,
+            article.issn_type,
+            article.citationCount,
+            article.citationPmid,
+        )
+
+    @staticmethod
+    def format_list(values) -> str:
+        """Comma separated quoted values, as stored in the pubmed table."""
+        return ", ".join(map(repr, values))
+
+    @staticmethod
+    def build_columns(data) -> dict:
+        """
+        Write articles straight into preallocated, typed column buffers.
+
+        Arguments:
+            data {[ArticleRecord]} -- The articles to be extracted
+
+        Returns:
+            dict -- numpy array per column, int64 for pmid and citation_count,
+                object arrays otherwise. List columns hold tuples of values.
+        """
+        articles = data if isinstance(data, list) else list(data)
+        size = len(articles)
+        columns = {key: np.empty(size, dtype=object) for key in PubMedParser.COLUMNS}
+        columns["pmid"] = np.empty(size, dtype=np.int64)
+        columns["citation_count"] = np.empty(size, dtype=np.int64)
+        buffers = [columns[key] for key in PubMedParser.COLUMNS]
+        for row, article in enumerate(articles):
+            for buffer, value in zip(buffers, PubMedParser._article_values(article)):
+                buffer[row] = value
+        return columns
+
     @staticmethod
     def parse(data, dtype: DataType = None) -> DataFrame:
         """
-        Parse data and convert according to parser schema.
+        Parse data into a typed dataframe, without per cell string conversion.
+
+        Produces int64 pmid and citation_count, datetime64 date_completed (NaT
+        if incomplete), dictionary encoded (categorical) journal columns and list
+        columns holding the actual sequence of values of each article. Use
+        to_table for the string columns of the pubmed table.
 
         Arguments:
             data {Implementation dependent} -- Data to be parsed
@@ -268,97 +371,51 @@ class PubMedParser(BaseParser):
         Returns:
             DataFrame -- The parsed dataframe.
         """
-        # Data passed in should be a list of xml element trees
-        # xml_list = data
-        articles = data
-
-        # The keys of the dataframe
-        keys = [
-            "pmid",
-            "date_completed",
-            "pub_model",
-            "title",
-            "iso_abbreviation",
-            "article_title",
-            "abstract",
-            "authors",
-            "language",
-            "chemicals",
-            "mesh_list",
-            "issn",
-            "issn_type",
-            "citation_count",
-            "citation_pmid",
-        ]
-
-        # Temp array variables to store from each xml element tree
-        pmid_list = []
-        date_completed_list = []
-        pub_model_list = []
-        title_list = []
-        iso_abbreviation_list = []
-        article_title_list = []
-        abstract_list = []
-        authors_list = []
-        language_list = []
-        chemicals_list = []
-        mesh_list_list = []
-        issn_list = []
-        issn_type_list = []
-        citation_count_list = []
-        citation_pmid_list = []
-
+        if is_updated(data):
+            # Backfilled citation columns, already in table format
+            return data
         try:
-            # General XML Tags
-            # for xml_article in xml_list:
-            for article in articles:
-                # article = PubMedArticle(xml_article)
-                pmid_list.append(np.int64(article.pmid))
-                date_completed_list.append(article.date_completed)
-                pub_model_list.append(article.pub_model)
-                title_list.append(article.title)
-                iso_abbreviation_list.append(article.iso_abbreviation)
-                article_title_list.append(article.article_title)
-                abstract_list.append(article.abstract)
-                authors_list.append(str(article.authors).strip("[]"))
-                language_list.append(article.language)
-                chemicals_list.append(str(article.chemicals).strip("[]"))
-                mesh_list_list.append(str(article.mesh_list).strip("[]"))
-                issn_list.append(str(article.issn).strip("[]"))
-                issn_type_list.append(str(article.issn_type).strip("[]"))
-                citation_count_list.append(str(article.citationCount).strip("[]"))
-                citation_pmid_list.append(str(article.citationPmid).strip("[]"))
-
-            # Create the array of arrays of values in dataframe
-            values = [
-                pmid_list,
-                date_completed_list,
-                pub_model_list,
-                title_list,
-                iso_abbreviation_list,
-                article_title_list,
-                abstract_list,
-                authors_list,
-                language_list,
-                chemicals_list,
-                mesh_list_list,
-                issn_list,
-                issn_type_list,
-                citation_count_list,
-                citation_pmid_list,
-            ]
-
-            # Zip df keys and values and create dataframe
-            zipped = list(zip(keys, values))
-            parsed_df = pd.DataFrame(dict(zipped))
-
-            errors = PubMedParser.validate(parsed_df)
-            if errors:
-                raise ParserError(errors)  # pragma: no cover - should never reach
-            return parsed_df
+            # Data passed in should be a list of pubmed articles
+            columns = PubMedParser.build_columns(data)
+            columns["date_completed"] = pd.to_datetime(
+                columns["date_completed"],
+                format=PubMedParser.DATE_FORMAT,
+                errors="coerce",
+            )
+            for key in PubMedParser.CATEGORY_COLUMNS:
+                columns[key] = pd.Categorical(columns[key])
+            return pd.DataFrame(columns, columns=PubMedParser.COLUMNS)
         except Exception as parse_exp:
             raise ParserError(parse_exp)
 
+    @staticmethod
+    def to_table(data: DataFrame) -> DataFrame:
+        """
+        Convert parsed articles to the string columns of the pubmed table.
+
+        List columns are stored as comma separated quoted values.
+
+        Arguments:
+            data {DataFrame} -- Articles parsed by parse
+
+        Returns:
+            DataFrame -- The articles as stored in the pubmed table.
+        """
+        if is_updated(data):
+            return data
+        table = data.copy(deep=False)
+        table["date_completed"] = (
+            data["date_completed"]
+            .dt.strftime(PubMedParser.DATE_FORMAT)
+            .fillna(PubMedParser.MISSING_DATE)
+        )
+        for key in PubMedParser.CATEGORY_COLUMNS:
+            table[key] = data[key].astype(object)
+        format_list = PubMedParser.format_list
+        for key in PubMedParser.LIST_COLUMNS:
+            table[key] = [format_list(values) for values in data[key]]
+        return table
+
 
 class ClassifierParser(BaseParser):
     """
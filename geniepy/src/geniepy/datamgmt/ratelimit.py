@@ -0,0 +1,185 @@
+"""
+Rate limiting of API requests across several API keys.
+
+NCBI E-utilities allow 10 requests per second per API key (3 without key)
+and answer 429 Too Many Requests past that. Each key gets a token bucket, and
+every request is sent with the key that has capacity left, so total throughput
+approaches the sum of the key quotas without any key being throttled.
+"""
+from time import monotonic
+import asyncio
+import geniepy.config as config
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate, up to its capacity."""
+
+    __slots__ = ["rate", "capacity", "tokens", "updated", "blocked_until"]
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        """
+        Initialize full bucket.
+
+        Arguments:
+            rate {float} -- tokens added per second
+            capacity {float} -- maximum number of tokens, i.e. allowed burst
+            now {float} -- current clock time
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = now
+
+    def _refill(self, now: float):
+        """Add tokens accumulated since last update."""
+        if now > self.updated:
+            refill = (now - self.updated) * self.rate
+            self.tokens = min(self.capacity, self.tokens + refill)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available, 0 if available now."""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        """Consume one token."""
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now: float, seconds: float):
+        """Hold bucket for seconds after being throttled, then refill from one token."""
+        self._refill(now)
+        self.tokens = min(self.capacity, 1)
+        self.updated = max(self.updated, now + seconds)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class ApiKeyScheduler:
+    """
+    Schedule requests on the API key with capacity.
+
+    Keys throttled by the server (429) are held back with an exponential
+    backoff, or for the Retry-After delay given by the server, while requests
+    keep flowing through the other keys.
+    """
+
+    LOGGER = config.get_logger("ApiKeyScheduler")
+
+    DEFAULT_RATE = 10
+    ANONYMOUS_RATE = 3
+    DEFAULT_BURST = 1
+    DEFAULT_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+
+    def __init__(
+        self,
+        api_keys: [str] = (),
+        rate: float = None,
+        burst: float = DEFAULT_BURST,
+        clock=monotonic,
+    ):
+        """
+        Initialize one token bucket per API key.
+
+        Keyword Arguments:
+            api_keys {[str]} -- API keys, None is scheduled if there is none
+            rate {float} -- requests per second per key, defaults to the NCBI
+                            limit with or without API key
+            burst {float} -- requests a key may send at once
+            clock -- monotonic clock returning seconds
+        """
+        if rate is None:
+            rate = self.DEFAULT_RATE if api_keys else self.ANONYMOUS_RATE
+        keys = list(api_keys) or [None]
+        self._clock = clock
+        now = clock()
+        self._buckets = {key: TokenBucket(rate, burst, now) for key in keys}
+        self._throttles = dict.fromkeys(keys, 0)
+        self._requests = dict.fromkeys(keys, 0)
+        self._started = None
+
+    @property
+    def capacity(self) -> float:
+        """Maximum total requests per second, sum of the key quotas."""
+        return sum(bucket.rate for bucket in self._buckets.values())
+
+    def next_key(self) -> (str, float):
+        """
+        Take a token from the key with most capacity left.
+
+        Returns:
+            (str, float) -- (key, 0) if a key had a token, otherwise
+                            (None, seconds until the next token is available)
+        """
+        now = self._clock()
+        best_key, best_tokens, min_delay = None, None, None
+        for key, bucket in self._buckets.items():
+            delay = bucket.delay(now)
+            if delay <= 0:
+                if best_tokens is None or bucket.tokens > best_tokens:
+                    best_key, best_tokens = key, bucket.tokens
+            elif min_delay is None or delay < min_delay:
+                min_delay = delay
+        if best_tokens is None:
+            return None, min_delay
+        self._buckets[best_key].take(now)
+        self._requests[best_key] += 1
+        if self._started is None:
+            self._started = now
+        return best_key, 0.0
+
+    async def acquire(self) -> str:
+        """Wait until a key has capacity, and return it for the next request."""
+        while True:
+            key, delay = self.next_key()
+            if not delay:
+                return key
+            await asyncio.sleep(delay)
+
+    def throttled(self, key: str, retry_after: float = None):
+        """
+        Hold key back after the server throttled a request sent with it.
+
+        Arguments:
+            key {str} -- API key of the throttled request
+
+        Keyword Arguments:
+            retry_after {float} -- delay requested by the server, in seconds
+        """
+        self._throttles[key] += 1
+        if retry_after is None:
+            retry_after = min(
+                self.DEFAULT_BACKOFF * 2 ** (self._throttles[key] - 1),
+                self.MAX_BACKOFF,
+            )
+        self._buckets[key].block(self._clock(), retry_after)
+        self.LOGGER.warning(f"API key throttled, holding it for {retry_after:.1f}s")
+
+    def succeeded(self, key: str):
+        """Reset backoff of key after a successful request."""
+        self._throttles[key] = 0
+
+    @property
+    def requests(self) -> int:
+        """Number of requests scheduled."""
+        return sum(self._requests.values())
+
+    def requests_per_second(self) -> float:
+        """Achieved requests per second since the first request."""
+        if self._started is None:
+            return 0.0
+        elapsed = self._clock() - self._started
+        return self.requests / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> str:
+        """Summary of achieved throughput against the key quotas."""
+        return (
+            f"{self.requests} requests on {len(self._buckets)} keys: "
+            f"{self.requests_per_second():.1f} req/s of {self.capacity:.1f} req/s"
+        )
@@ -0,0 +1,325 @@
+"""
+Local citation graph from PubMed reference lists.
+
+PubMed records list the articles they cite in PubmedData/ReferenceList and in
+CommentsCorrections entries of type 'Cites'. The (citing, cited) edges found
+while parsing are appended to partition files on disk, each holding the edges
+of a range of cited PMIDs. Inverting the graph into cited-by lists is then a
+streaming pass over the partitions, one at a time, with memory bounded by the
+size of a partition instead of the size of the graph.
+
+Articles are stored before the articles citing them are parsed, so their
+citation counts are backfilled afterwards: partitions with new edges are
+recorded on disk until their cited-by lists were merged into the citation
+cache and the resulting updates consumed, even across interrupted runs.
+"""
+from pathlib import Path
+from typing import Generator, Iterable
+import os
+import numpy as np
+import pandas as pd
+from geniepy.datamgmt.cache import CitationCache
+
+PARTITION_SPAN = 1 << 20
+"""Number of cited PMIDs per partition file."""
+EDGE_DTYPE = np.int32
+"""PMIDs fit in 32 bit integers."""
+UPDATED = "updated"
+"""DataFrame.attrs key set on chunks of columns updated in stored records."""
+
+
+def is_updated(chunk) -> bool:
+    """Check if chunk holds columns to update in records already stored."""
+    return isinstance(chunk, pd.DataFrame) and bool(chunk.attrs.get(UPDATED))
+
+
+class ReferenceIndex:
+    """
+    Disk partitioned (citing, cited) edges, inverted into cited-by lists.
+
+    Edges are buffered in memory and appended to the partition file of their
+    cited PMID when the buffer is full, so recording references doesn't slow
+    down parsing. Edges of articles parsed twice (i.e. revised in an update
+    file) are deduplicated when inverted.
+    """
+
+    DEFAULT_BUFFER_SIZE = 1 << 20
+    DIRTY_NAME = "dirty.txt"
+
+    # pylint: disable=bad-continuation
+    def __init__(
+        self,
+        directory: str,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        partition_span: int = PARTITION_SPAN,
+    ):
+        """
+        Open (or create) index directory.
+
+        Arguments:
+            directory {str} -- directory of partition files
+
+        Keyword Arguments:
+            buffer_size {int} -- number of edges buffered before written
+            partition_span {int} -- number of cited PMIDs per partition
+        """
+        self._directory = Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._buffer_size = max(buffer_size, 1)
+        self._span = partition_span
+        self._citing = []
+        self._cited = []
+        self._dirty_path = self._directory.joinpath(self.DIRTY_NAME)
+        self._dirty = set()
+        if self._dirty_path.exists():
+            self._dirty = {int(line) for line in self._dirty_path.read_text().split()}
+
+    @property
+    def dirty(self) -> {int}:
+        """Partitions with edges added and not yet backfilled, kept on disk."""
+        return set(self._dirty)
+
+    def clear_dirty(self, partitions: Iterable[int]):
+        """Mark partitions backfilled."""
+        self._dirty.difference_update(partitions)
+        tmp_path = self._dirty_path.with_name("." + self.DIRTY_NAME)
+        tmp_path.write_text("".join(f"{partition}\n" for partition in self._dirty))
+        tmp_path.replace(self._dirty_path)
+
+    def partitions(self) -> [int]:
+        """Sorted numbers of the partitions on disk."""
+        return sorted(
+            int(path.stem.split("-")[1]) for path in self._directory.glob("edges-*.i32")
+        )
+
+    def _partition_path(self, partition: int) -> Path:
+        """Path of partition file."""
+        return self._directory.joinpath(f"edges-{partition:05d}.i32")
+
+    def add(self, citing: int, cited: Iterable[int]):
+        """Record that article citing cites articles cited."""
+        for pmid in cited:
+            self._citing.append(citing)
+            self._cited.append(pmid)
+        if len(self._cited) >= self._buffer_size:
+            self.flush()
+
+    def add_articles(self, articles: Iterable) -> int:
+        """
+        Record references of parsed articles.
+
+        Arguments:
+            articles {Iterable[ArticleRecord]} -- parsed articles
+
+        Returns:
+            int -- number of edges recorded
+        """
+        edges = 0
+        for article in articles:
+            references = article.references
+            if references and article.pmid:
+                self.add(int(article.pmid), references)
+                edges += len(references)
+        return edges
+
+    def flush(self):
+        """Append buffered edges to their partition files."""
+        if not self._cited:
+            return
+        edges = np.empty((len(self._cited), 2), dtype=EDGE_DTYPE)
+        edges[:, 0] = self._citing
+        edges[:, 1] = self._cited
+        self._citing = []
+        self._cited = []
+        partitions = edges[:, 1] // self._span
+        order = np.argsort(partitions, kind="stable")
+        edges, partitions = edges[order], partitions[order]
+        bounds = np.flatnonzero(np.diff(partitions)) + 1
+        # Recorded before the edges, a partition is never left clean with
+        # edges that weren't backfilled
+        added = {int(partition) for partition in np.unique(partitions)}
+        with open(self._dirty_path, "a") as dirty_file:
+            dirty_file.write("".join(f"{partition}\n" for partition in added))
+        self._dirty.update(added)
+        for chunk in np.split(edges, bounds):
+            partition = int(chunk[0, 1] // self._span)
+            with open(self._partition_path(partition), "ab") as part_file:
+                chunk.tofile(part_file)
+
+    def _load(self, partition: int) -> np.ndarray:
+        """Load unique edges of partition, sorted by cited then citing PMID."""
+        path = self._partition_path(partition)
+        if not path.exists():
+            return np.empty((0, 2), dtype=EDGE_DTYPE)
+        edges = np.fromfile(path, dtype=EDGE_DTYPE).reshape(-1, 2)
+        order = np.lexsort((edges[:, 0], edges[:, 1]))
+        edges = edges[order]
+        if len(edges) > 1:
+            keep = np.ones(len(edges), dtype=bool)
+            keep[1:] = np.any(edges[1:] != edges[:-1], axis=1)
+            edges = edges[keep]
+        return edges
+
+    def iter_cited_by(
+        self, partitions: Iterable[int] = None
+    ) -> Generator[tuple, None, None]:
+        """
+        Invert edges into the citing PMIDs of each cited PMID.
+
+        Keyword Arguments:
+            partitions {Iterable[int]} -- partitions to invert, all if None
+
+        Returns:
+            Generator[tuple] -- (cited PMID, sorted citing PMIDs array), in
+                                cited PMID order
+        """
+        self.flush()
+        if partitions is None:
+            partitions = self.partitions()
+        for partition in sorted(partitions):
+            edges = self._load(partition)
+            if not len(edges):
+                continue
+            cited = edges[:, 1]
+            bounds = np.flatnonzero(np.diff(cited)) + 1
+            starts = np.concatenate(([0], bounds))
+            for start, citing in zip(starts, np.split(edges[:, 0], bounds)):
+                yield int(cited[start]), citing
+
+    def iter_counts(self, partitions: Iterable[int] = None) -> Generator:
+        """
+        Count citing articles of each cited PMID.
+
+        Returns:
+            Generator[tuple] -- (cited PMIDs array, counts array) per partition
+        """
+        self.flush()
+        if partitions is None:
+            partitions = self.partitions()
+        for partition in sorted(partitions):
+            edges = self._load(partition)
+            if len(edges):
+                yield np.unique(edges[:, 1], return_counts=True)
+
+    # pylint: disable=bad-continuation
+    def write_cache(
+        self,
+        cache: CitationCache,
+        partitions: Iterable[int] = None,
+        batch_size: int = 10000,
+    ) -> int:
+        """
+        Merge local cited-by lists into the citation cache.
+
+        Citing PMIDs already cached (i.e. fetched from the API) are kept, so
+        cached lists are the union of both sources. PMIDs not cited by any
+        local reference are left out, to be filled in by the API.
+
+        Arguments:
+            cache {CitationCache} -- cache the cited-by lists are merged into
+
+        Keyword Arguments:
+            partitions {Iterable[int]} -- partitions to invert, all if None
+            batch_size {int} -- number of cited PMIDs written at once
+
+        Returns:
+            int -- number of cited PMIDs whose cached list changed
+        """
+        written = 0
+        batch = {}
+        for cited, citing in self.iter_cited_by(partitions):
+            batch[cited] = citing
+            if len(batch) >= batch_size:
+                written += self._write(cache, batch)
+                batch = {}
+        if batch:
+            written += self._write(cache, batch)
+        return written
+
+    def _write(self, cache: CitationCache, batch: dict) -> int:
+        """Write changed cited-by lists of batch to cache."""
+        changed = self._merge(cache, batch)
+        cache.put_many(changed)
+        return len(changed)
+
+    def iter_updates(self, cache: CitationCache, chunksize: int = 10000) -> Generator:
+        """
+        Backfill citations of the PMIDs cited in dirty partitions.
+
+        Cited-by lists of each dirty partition are merged into the cache, and
+        those that changed are yielded as citation columns to update in the
+        stored articles: a daily file dirties partitions all over the PMID
+        space, but only updates the articles it cites for the first time. A
+        partition is marked backfilled once the consumer asks for the chunks
+        following its own, so an interrupted backfill resumes from it.
+
+        Arguments:
+            cache {CitationCache} -- cache the cited-by lists are merged into
+
+        Keyword Arguments:
+            chunksize {int} -- number of cited PMIDs per chunk
+
+        Returns:
+            Generator[pd.DataFrame] -- pmid, citation_count and citation_pmid
+                                       chunks flagged by is_updated
+        """
+        for partition in sorted(self.dirty):
+            batch = {}
+            for cited, citing in self.iter_cited_by([partition]):
+                batch[cited] = citing
+                if len(batch) >= chunksize:
+                    yield from self._iter_changed(cache, batch)
+                    batch = {}
+            if batch:
+                yield from self._iter_changed(cache, batch)
+            self.clear_dirty([partition])
+
+    def _iter_changed(self, cache: CitationCache, batch: dict) -> Generator:
+        """Yield changed citation columns of batch, cached once consumed."""
+        changed = self._merge(cache, batch)
+        if changed:
+            yield self._updates(changed)
+            # Cached once applied, an interrupted backfill yields them again
+            cache.put_many(changed)
+
+    @staticmethod
+    def _updates(merged: dict) -> pd.DataFrame:
+        """Citation columns of merged cited-by lists."""
+        chunk = pd.DataFrame(
+            {
+                "pmid": np.fromiter(merged, dtype=np.int64, count=len(merged)),
+                "citation_count": [len(citing) for citing in merged.values()],
+                "citation_pmid": [",".join(citing) for citing in merged.values()],
+            }
+        )
+        chunk["citation_count"] = chunk["citation_count"].astype(np.int64)
+        chunk.attrs[UPDATED] = True
+        return chunk
+
+    @staticmethod
+    def _merge(cache: CitationCache, batch: dict) -> dict:
+        """
+        Union of local and cached citing PMIDs of batch.
+
+        Returns:
+            dict -- merged cited-by lists that differ from the cached ones
+        """
+        cached = cache.get_many(batch)
+        merged = {}
+        for cited, citing in batch.items():
+            local = [str(pmid) for pmid in citing]
+            previous = cached.get(cited)
+            if previous:
+                local = sorted(set(local).union(previous), key=int)
+                if local == sorted(previous, key=int):
+                    continue
+            merged[cited] = local
+        return merged
+
+    def clear(self):
+        """Delete all partition files."""
+        self._citing = []
+        self._cited = []
+        for partition in self.partitions():
+            os.remove(self._partition_path(partition))
+        self.clear_dirty(self.dirty)
@@ -1,4 +1,5 @@
 """Data Access Repositories to abstract interation with databases."""
+from collections import Counter
 from typing import Generator
 from abc import ABC, abstractmethod
 import pandas as pd
@@ -6,12 +7,17 @@ from datetime import datetime
 from pandas import DataFrame
 from google.oauth2 import service_account
 import pandas_gbq
-from sqlalchemy import create_engine, Table
+from sqlalchemy import and_, bindparam, create_engine, literal_column, select, Table
 from geniepy.errors import DaoError, ConnectionError
 from geniepy.datamgmt.tables import RepoProperties
 import geniepy.config as config
 
 
+def row_counts(payload: DataFrame) -> Counter:
+    """Number of copies of each distinct row of payload, as a tuple."""
+    return Counter(payload.astype(object).itertuples(index=False, name=None))
+
+
 class BaseRepository(ABC):
     """Base Abstract Class for Data Access Object Repositories."""
 
@@ -50,6 +56,35 @@ class BaseRepository(ABC):
             DaoError: if cannot save payload to db
         """
 
+    @abstractmethod
+    def delete(self, payload: DataFrame):
+        """
+        Delete a record matching each row of payload, on all of its columns.
+
+        A row appearing n times in payload deletes n copies of the record.
+
+        Arguments:
+            payload {DataFrame} -- the rows to be deleted from db
+
+        Raises:
+            DaoError: if cannot delete payload from db
+        """
+
+    @abstractmethod
+    def update(self, payload: DataFrame):
+        """
+        Set payload's columns in records whose primary key matches a row.
+
+        Arguments:
+            payload {DataFrame} -- primary key and updated columns
+
+        Raises:
+            DaoError: if cannot update records in db
+        """
+
+    def flush(self):
+        """Apply writes the repository deferred, i.e. staged deletes."""
+
     @abstractmethod
     def delete_all(self):
         """Delete all records in repository."""
@@ -116,6 +151,69 @@ class SqlRepository(BaseRepository):
         except Exception as sql_exp:
             raise DaoError(sql_exp)
 
+    def delete(self, payload: DataFrame):
+        """
+        Delete a record matching each row of payload, on all of its columns.
+
+        A row appearing n times in payload deletes n copies of the record,
+        told apart by their SQLite rowid.
+
+        Arguments:
+            payload {DataFrame} -- the rows to be deleted from db
+
+        Raises:
+            DaoError: if cannot delete payload from db
+        """
+        if not len(payload):
+            return
+        columns = list(payload.columns)
+        rowid = literal_column("rowid")
+        where = [self._table.c[col] == bindparam(f"_{col}") for col in columns]
+        copies = (
+            select([rowid])
+            .select_from(self._table)
+            .where(and_(*where))
+            .limit(bindparam("_copies"))
+        )
+        statement = self._table.delete().where(rowid.in_(copies))
+        records = [
+            dict(zip([f"_{col}" for col in columns] + ["_copies"], row + (count,)))
+            for row, count in row_counts(payload).items()
+        ]
+        try:
+            with self._engine.begin() as connection:
+                connection.execute(statement, records)
+        except Exception as sql_exp:
+            raise DaoError(sql_exp)
+
+    def update(self, payload: DataFrame):
+        """
+        Set payload's columns in records whose primary key matches a row.
+
+        Arguments:
+            payload {DataFrame} -- primary key and updated columns
+
+        Raises:
+            DaoError: if cannot update records in db
+        """
+        if not len(payload):
+            return
+        columns = list(payload.columns)
+        statement = (
+            self._table.update()
+            .where(self._table.c[self._pkey] == bindparam(f"_{self._pkey}"))
+            .values({col: bindparam(f"_{col}") for col in columns if col != self._pkey})
+        )
+        records = [
+            {f"_{col}": value for col, value in zip(columns, row)}
+            for row in payload.astype(object).itertuples(index=False, name=None)
+        ]
+        try:
+            with self._engine.begin() as connection:
+                connection.execute(statement, records)
+        except Exception as sql_exp:
+            raise DaoError(sql_exp)
+
     def delete_all(self):
         """Delete all records in repository."""
         self._table.drop(self._engine)
@@ -225,6 +323,116 @@ class GbqRepository(BaseRepository):  # pragma: no cover
             self.LOGGER.exception(str(sql_exp))
             raise DaoError(sql_exp)
 
+    @property
+    def staging_removed(self) -> str:
+        """Staging table of the rows to delete on flush."""
+        return self.tablename + "_removed"
+
+    def delete(self, payload: DataFrame):
+        """
+        Delete a record matching each row of payload, on all of its columns.
+
+        A row appearing n times in payload deletes n copies of the record.
+        Distinct rows and their counts are appended to a staging table, and
+        deleted from the table on flush, so a refresh runs a single DML
+        transaction whatever the number of chunks. Staged rows outlive an
+        interrupted refresh and are deleted by the next flush.
+
+        Arguments:
+            payload {DataFrame} -- the rows to be deleted from db
+
+        Raises:
+            DaoError: if cannot stage payload
+        """
+        if not len(payload):
+            return
+        counts = row_counts(payload)
+        removed = DataFrame(list(counts), columns=payload.columns)
+        removed = removed.astype(payload.dtypes.to_dict())
+        removed["_copies"] = list(counts.values())
+        try:
+            self.LOGGER.info(f"Staging {len(payload)} records to delete")
+            pandas_gbq.to_gbq(
+                removed, self.staging_removed, if_exists="append", progress_bar=False
+            )
+        except Exception as sql_exp:
+            self.LOGGER.exception(str(sql_exp))
+            raise DaoError(sql_exp)
+
+    def flush(self):
+        """
+        Delete the rows staged by delete.
+
+        BigQuery can't tell copies of a row apart in a DELETE, so the records
+        matching staged rows are deleted and their copies beyond the staged
+        counts inserted back, in a transaction that also empties the staging
+        table. Records are matched on all columns but the save date, and only
+        the matching records are rewritten.
+
+        Raises:
+            DaoError: if cannot delete staged rows from db
+        """
+        dataset, name = self.tablename.split(".", 1)
+        columns = [col["name"] for col in self._table if col["name"] != "date"]
+        names = ", ".join(f"`{col}`" for col in columns)
+        partition = ", ".join(f"t.`{col}`" for col in columns)
+        match = " AND ".join(f"t.`{col}` = s.`{col}`" for col in columns)
+        table, staging = self.tablename, self.staging_removed
+        try:
+            pandas_gbq.read_gbq(
+                f"IF EXISTS (SELECT 1 FROM {dataset}.INFORMATION_SCHEMA.TABLES "
+                f"WHERE table_name = '{name}_removed') THEN "
+                f"CREATE TEMP TABLE kept AS "
+                f"SELECT * EXCEPT (_copy, _copies) FROM ("
+                f"SELECT t.*, s._copies, "
+                f"ROW_NUMBER() OVER (PARTITION BY {partition}) AS _copy "
+                f"FROM {table} t JOIN (SELECT {names}, SUM(_copies) AS _copies "
+                f"FROM {staging} GROUP BY {names}) s ON {match}"
+                f") WHERE _copy > _copies; "
+                f"BEGIN TRANSACTION; "
+                f"DELETE FROM {table} t WHERE EXISTS "
+                f"(SELECT 1 FROM {staging} s WHERE {match}); "
+                f"INSERT INTO {table} SELECT * FROM kept; "
+                f"DELETE FROM {staging} WHERE TRUE; "
+                f"COMMIT TRANSACTION; "
+                f"END IF;",
+                progress_bar_type=None,
+            )
+        except Exception as sql_exp:
+            self.LOGGER.exception(str(sql_exp))
+            raise DaoError(sql_exp)
+
+    def update(self, payload: DataFrame):
+        """
+        Set payload's columns in records whose primary key matches a row.
+
+        Rows are uploaded to a staging table, then applied with a single DML
+        statement joining the staging table.
+
+        Arguments:
+            payload {DataFrame} -- primary key and updated columns
+
+        Raises:
+            DaoError: if cannot update records in db
+        """
+        if not len(payload):
+            return
+        staging = self.tablename + "_updated"
+        assign = ", ".join(
+            f"`{col}` = s.`{col}`" for col in payload.columns if col != self._pkey
+        )
+        try:
+            self.LOGGER.info(f"Updating {len(payload)} records of: {self.tablename}")
+            pandas_gbq.to_gbq(payload, staging, if_exists="replace", progress_bar=False)
+            pandas_gbq.read_gbq(
+                f"UPDATE {self.tablename} t SET {assign} FROM {staging} s "
+                f"WHERE t.`{self._pkey}` = s.`{self._pkey}`",
+                progress_bar_type=None,
+            )
+        except Exception as sql_exp:
+            self.LOGGER.exception(str(sql_exp))
+            raise DaoError(sql_exp)
+
     def delete_all(self):
         """Delete all records in repository."""
         pandas_gbq.to_gbq(
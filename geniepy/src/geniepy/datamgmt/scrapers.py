@@ -1,28 +1,35 @@
 """Scraping module to fetch data from online sources."""
-from contextlib import redirect_stdout
-import binascii
-from concurrent.futures import ProcessPoolExecutor
-from multiprocessing import Process
+from collections import deque
+from itertools import islice
+from queue import Queue, Empty, Full
+from threading import Event, Thread
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Generator
 from abc import ABC, abstractmethod
-import wget
 import gzip
+import pickle
 import shutil
 import os
+import numpy as np
 import pandas as pd
 import geniepy.config as config
-from ftplib import FTP
-import requests
-import xml.etree.ElementTree as ET
-from random import randint
 from pathlib import Path
-from geniepy.pubmed import PubMedArticle
-from joblib import Memory
-
-
-# Initialize memoization
-memory = Memory(str(config.TMP_DIR), verbose=0)
+from geniepy.pubmed import ArticleRecord, ArticleSetParser
+from geniepy.datamgmt.downloads import (
+    DownloadedFile,
+    FtpDownloader,
+    FtpSessionPool,
+    RemoteFile,
+    open_url,
+)
+from geniepy.datamgmt.manifest import SyncManifest, DOWNLOADED, INGESTED
+from geniepy.datamgmt.citations import AsyncCitationClient, CitationFetcher
+from geniepy.datamgmt.backfill import BackfillCheckpoint, CitationBackfill
+from geniepy.datamgmt.references import ReferenceIndex
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.snapshots import SnapshotDiff
+from geniepy.errors import CitationError, DownloadError
 
 
 class BaseScraper(ABC):
@@ -51,55 +58,91 @@ class BaseScraper(ABC):
 
 
 class PubtatorGeneScraper(BaseScraper):
-    """Scrape PMID/GENEID from pubtator."""
+    """
+    Scrape PMID/GENEID from pubtator.
+
+    The gzipped file is streamed straight into the chunked csv reader, so
+    chunks are yielded while it downloads and it is never written to disk.
+    Only the PMID and entity ID columns are parsed, as int32 PMIDs and
+    categorical entity IDs (gene IDs may list several IDs separated by ';').
+
+    Baseline scrapes record the snapshot locally, updates then only return the
+    rows added since, and the rows removed flagged by snapshots.is_removed.
+    """
+
+    LOGGER = config.get_logger("PubtatorScraper")
 
     SOURCE_NAME = "Pubtator Genes"
-    TMP_DIR = config.TMP_DIR
     FTP_URL = "ftp://ftp.ncbi.nlm.nih.gov/pub/lu/PubTatorCentral/gene2pubtatorcentral.gz"  # noqa
     SAMPLE_FTP_URL = "ftp://ftp.ncbi.nlm.nih.gov/pub/lu/PubTatorCentral/gene2pubtatorcentral.sample"  # noqa
-    DOWNLOAD_NAME = "pubtator-gene.download"
-    CSV_NAME = "pubtator-gene.csv"
     HEADER_NAMES = ["PMID", "Type", "GeneID", "Mentions", "Resource"]
+    ENTITY_COLUMN = "GeneID"
+    SNAPSHOT_NAME = "pubtator-gene"
+    DEFAULT_SNAPSHOT_DIR = "~/.geniepy.d/snapshots"
 
-    def __init__(self):
-        self.TMP_DIR.mkdir(parents=True, exist_ok=True)
-
-    @property
-    def download_path(self):
-        """Path to pubtator gzip downloaded file."""
-        download_path = self.TMP_DIR.joinpath(self.DOWNLOAD_NAME).resolve()
-        return download_path
-
-    @property
-    def csv_path(self):
-        """Path to pubtator csv downloaded file."""
-        csv_path = self.TMP_DIR.joinpath(self.CSV_NAME).resolve()
-        return csv_path
-
-    def is_gzip(self, filepath) -> bool:
-        """Check if file is gzipped."""
-        with open(filepath, "rb") as test_f:
-            return binascii.hexlify(test_f.read(2)) == b"1f8b"
-
-    def download(self):
-        """Download records from online sources."""
-        print(f"Downloading {self.SOURCE_NAME} records...")
-        if not self.download_path.exists():
-            with redirect_stdout(None):
-                wget.download(self.FTP_URL, str(self.download_path), bar=None)
-        if self.is_gzip(self.download_path):
-            with gzip.open(self.download_path, "rb") as f_in:
-                with open(self.csv_path, "wb") as f_out:
-                    shutil.copyfileobj(f_in, f_out)
-        else:
-            self.download_path.rename(self.csv_path)
-        self.clean_up()
+    @classmethod
+    def read_options(cls) -> dict:
+        """pandas.read_csv arguments of the projected, typed columns."""
+        return {
+            "delimiter": "\t",
+            "names": cls.HEADER_NAMES,
+            "usecols": ["PMID", cls.ENTITY_COLUMN],
+            "dtype": {"PMID": np.int32, cls.ENTITY_COLUMN: "category"},
+        }
 
     def set_sample(self, kwargs):
         """Set sample url if is_sample is set."""
         if kwargs.get("is_sample"):
             self.FTP_URL = self.SAMPLE_FTP_URL
 
+    def read_chunks(self, chunksize: int, **kwargs) -> Generator:
+        """
+        Stream download of FTP_URL through the chunked csv reader.
+
+        Keyword Arguments:
+            chunksize {int} -- number of rows of each chunk
+            kwargs -- pandas.read_csv arguments
+
+        Returns:
+            Generator -- The generator yielding DataFrame chunks
+        """
+        print(f"Streaming {self.SOURCE_NAME} records...")
+        with open_url(self.FTP_URL) as stream:
+            yield from pd.read_csv(stream, chunksize=chunksize, **kwargs)
+
+    def create_snapshot(self) -> SnapshotDiff:
+        """Create local snapshot of source from Config"""
+        try:
+            snapshot_dir = config.get_snapshot_dir()
+        except Exception as e:
+            snapshot_dir = self.DEFAULT_SNAPSHOT_DIR
+            self.LOGGER.exception(e)
+        directory = os.path.join(os.path.expanduser(snapshot_dir), self.SNAPSHOT_NAME)
+        return SnapshotDiff(directory)
+
+    def diff_chunks(self, chunks: Generator, **kwargs) -> Generator:
+        """
+        Record chunks of baseline scrapes, diff them with the last on updates.
+
+        Keyword Arguments:
+            chunks {Generator} -- chunks of the whole source
+            kwargs -- scrape arguments
+
+        Returns:
+            Generator -- The generator yielding all chunks on baseline, only
+                         added and removed rows otherwise
+        """
+        if kwargs.get("is_sample"):
+            # Samples aren't snapshots of the source
+            return chunks if kwargs.get("baseline") else ()
+        snapshot = self.create_snapshot()
+        if kwargs.get("baseline"):
+            return snapshot.record(chunks)
+        if not snapshot.exists:
+            self.LOGGER.warning(f"No {self.SOURCE_NAME} snapshot, scrape baseline")
+            return ()
+        return snapshot.update(chunks)
+
     def scrape(self, chunksize: int, **kwargs) -> Generator:
         """
         Download pmid/geneid data from pubtator.
@@ -107,21 +150,8 @@ class PubtatorGeneScraper(BaseScraper):
         ftp://ftp.ncbi.nlm.nih.gov/pub/lu/PubTatorCentral/disease2pubtatorcentral.gz
         """
         self.set_sample(kwargs)
-        if kwargs.get("baseline"):
-            self.download()
-            csv_gen = pd.read_csv(
-                self.csv_path,
-                chunksize=chunksize,
-                delimiter="\t",
-                names=self.HEADER_NAMES,
-            )
-            return csv_gen
-        return ()
-
-    def clean_up(self):
-        """Delete all temp files."""
-        if os.path.exists(self.download_path):
-            os.remove(self.download_path)
+        chunks = self.read_chunks(chunksize, **self.read_options())
+        return self.diff_chunks(chunks, **kwargs)
 
 
 class PubtatorDiseaseScraper(PubtatorGeneScraper):
@@ -130,9 +160,9 @@ class PubtatorDiseaseScraper(PubtatorGeneScraper):
     SOURCE_NAME = "Pubtator Diseases"
     FTP_URL = "ftp://ftp.ncbi.nlm.nih.gov/pub/lu/PubTatorCentral/disease2pubtatorcentral.gz"  # noqa
     SAMPLE_FTP_URL = "ftp://ftp.ncbi.nlm.nih.gov/pub/lu/PubTatorCentral/disease2pubtatorcentral.sample"  # noqa
-    DOWNLOAD_NAME = "pubtator-disease.download"
-    CSV_NAME = "pubtator-disease.csv"
     HEADER_NAMES = ["PMID", "Type", "DiseaseID", "Mentions", "Resource"]
+    ENTITY_COLUMN = "DiseaseID"
+    SNAPSHOT_NAME = "pubtator-disease"
 
 
 class SjrScraper(PubtatorGeneScraper):
@@ -141,17 +171,16 @@ class SjrScraper(PubtatorGeneScraper):
     SOURCE_NAME = "SJR"
     FTP_URL = "https://www.scimagojr.com/journalrank.php?out=xls"  # noqa
     SAMPLE_FTP_URL = "https://www.scimagojr.com/journalrank.php?area=1100&out=xls"
-    CSV_NAME = "sjr.csv"
+    SNAPSHOT_NAME = "sjr"
+    COLUMNS = ["Title", "SJR", "H index"]
+    """Columns kept by SjrParser, the only ones diffed."""
 
     def scrape(self, chunksize: int, **kwargs) -> Generator:
         """Download sjr data."""
         self.set_sample(kwargs)
-        if kwargs.get("baseline") is True:
-            # Only download if baseline is true
-            self.download()
-            csv_gen = pd.read_csv(self.csv_path, chunksize=chunksize, delimiter=";")
-            return csv_gen
-        return ()
+        # Changes of columns that aren't stored would replace identical rows
+        chunks = self.read_chunks(chunksize, delimiter=";", usecols=self.COLUMNS)
+        return self.diff_chunks(chunks, **kwargs)
 
 
 class CtdScraper(BaseScraper):
@@ -193,17 +222,24 @@ class PubMedScraper(BaseScraper):
     DEFAULT_PUBMED_BASELINE_DIR: str = "/pubmed/baseline/"
     DEFAULT_PUBMED_UPDATE_DIR: str = "/pubmed/updatefiles/"
     DEFAULT_PUBMED_DATA_FILE = "~/.geniepy.d/pubmed.dat"
+    DEFAULT_PUBMED_MANIFEST_FILE = "~/.geniepy.d/pubmed_manifest.db"
     DEFAULT_DOWNLOAD_DIR = "~/.geniepy.d/tmp/"
     DEFAULT_PUBMED_DATAFILE_EXTN = ".xml.gz"
     DEFAULT_DOWNLOAD_RETRIES = 2
+    DEFAULT_PREFETCH_FILES = 2
+    DEFAULT_FTP_SESSIONS = 2
+    DEFAULT_QUEUE_TIMEOUT = 1
+    DEFAULT_CITATION_BATCH_SIZE = 200
+    DEFAULT_CITATION_CACHE_FILE = "~/.geniepy.d/citations.db"
+    DEFAULT_CITATION_CACHE_TTL_DAYS = 30
+    DEFAULT_CITATION_BACKFILL_FILE = "~/.geniepy.d/citation_backfill.db"
+    DEFAULT_CITATION_SOURCE = "api"
+    DEFAULT_CITATION_REFERENCES_DIR = "~/.geniepy.d/references"
 
     # Constants for PubMed scraping
     TAG_ARTICLE = "PubmedArticle"
 
     # Constants for Citation scraping
-    API_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/elink.fcgi?dbfrom=pubmed&linkname=pubmed_pubmed_citedin"  # noqa
-    API_ID_PARAM = "&id="
-    API_KEY_PARAM = "&api_key="
     API_KEYS = [
         "70b53d4e84436970587aef3493a723cae708",
         "9ab4b04dcabcab740d1a297e6f3f54aa1e09",
@@ -223,11 +259,10 @@ class PubMedScraper(BaseScraper):
         "f10805158a7609bb115cb074b05e5923a407",
         "00d74dd1cb732cd7fc29f54168fe7055c809",
     ]
-    TAG_CITATION_ID = "./LinkSet/LinkSetDb/Link/Id"
 
     def __init__(self):
-        """Initialize memoization for citation scraping."""
-        self._citationScrape = memory.cache(self._citationScrape)
+        """Initialize cache of scraped citations, shared with worker processes."""
+        self._citation_cache = self._create_citation_cache()
 
     def scrape(self, chunksize: int, **kwargs) -> Generator:
         """
@@ -300,206 +335,310 @@ class PubMedScraper(BaseScraper):
 
         PubMedScraper.LOGGER.info(f"FTP_DIR: {FTP_DIR}")
 
-        # connect to pubmed ftp and retrieve list of ftp files
-        pubmed_ftp = self._ftp_connect(FTP_SERVER, FTP_DIR)
-        pubmed_files = self._ftp_file_list(pubmed_ftp)  # list of files from ftp
-        pubmed_history = self._read_history()  # list of historically scraped files
+        # pool of ftp sessions used to list and download files
+        downloader = self._create_downloader(FTP_SERVER, FTP_DIR)
+        pubmed_files = self._ftp_file_list(downloader)  # list of files from ftp
 
-        # close ftp connection
-        self._ftp_disconnect(pubmed_ftp)
+        # manifest of files already ingested, from this or previous runs
+        manifest = self._open_manifest()
+        if not BASELINE_SCRAPE_MODE:
+            self._import_history(manifest, FTP_DIR)
 
         PubMedScraper.LOGGER.info(f"Number of files in FTP: {len(pubmed_files)}")
-        PubMedScraper.LOGGER.info(f"Number of files in History: {len(pubmed_history)}")
-
-        if BASELINE_SCRAPE_MODE and not IS_SAMPLE:
-            pcitation = Process(
-                target=self.scrape_concurrent, args=(len(pubmed_files),)
-            )
-            pcitation.start()
 
-        # determine new files to parse
-        # in BASELINE_SCRAPE_MODE parse all files
-        pubmed_new_files = []
-        parsed_files = []
-        if BASELINE_SCRAPE_MODE:
-            pubmed_new_files = pubmed_files
-        else:
-            pubmed_new_files = list(set(pubmed_files) - set(pubmed_history))
+        # determine new files to parse: files new or changed on the ftp server,
+        # and files whose ingestion didn't complete in a previous run
+        pubmed_new_files = manifest.sync(FTP_DIR, pubmed_files)
 
         PubMedScraper.LOGGER.info(
             f"Number of new files to be parsed: {len(pubmed_new_files)}"
         )
 
-        # main scraping block
+        # set number of files downloaded ahead of parsing and parse workers
         try:
-            for pubmed_file in pubmed_new_files:
-                # connect to ftp
-                pubmed_ftp = self._ftp_connect(FTP_SERVER, FTP_DIR)
-                # download pubmed data file
-                retries = 0
-                while retries <= PubMedScraper.DEFAULT_DOWNLOAD_RETRIES:
-                    if self._ftp_download(pubmed_ftp, pubmed_file):
-                        PubMedScraper.LOGGER.info(
-                            f"Downloaded PubMed file: {pubmed_file}"
-                        )
-                        break
-                    retries += 1
-                # close ftp connection
-                self._ftp_disconnect(pubmed_ftp)
+            PREFETCH_FILES = config.get_pubmed_prefetch_files()
+        except Exception as e:
+            PREFETCH_FILES = PubMedScraper.DEFAULT_PREFETCH_FILES
+            PubMedScraper.LOGGER.exception(e)
+        try:
+            MAX_WORKERS = config.get_max_workers()
+        except Exception as e:
+            MAX_WORKERS = 0
+            PubMedScraper.LOGGER.exception(e)
 
-                # scrape downloaded PubMed data file
-                articles = self._pubmedScrape(pubmed_file)
-                PubMedScraper.LOGGER.info(
-                    f"{len(articles)} articles found in {pubmed_file}"
-                )
+        # download stage: background threads downloading the next files.
+        # The bounded queue blocks the downloads when PREFETCH_FILES files are
+        # waiting to be parsed, limiting disk usage.
+        downloaded_files = Queue(maxsize=max(PREFETCH_FILES, 1))
+        stop_download = Event()
+        download_thread = Thread(
+            target=self._download_stage,
+            args=(downloader, pubmed_new_files, downloaded_files, stop_download),
+            daemon=True,
+        )
+        download_thread.start()
 
-                # optimize chunksize based on number of
-                # available PubMed articles
-                chunk_size: int = 0
-                if chunksize > len(articles):
-                    chunk_size = len(articles)
-                else:
-                    chunk_size = chunksize
-                PubMedScraper.LOGGER.info(f"Chunksize is set to: {chunk_size}")
+        # parse stage: worker processes parsing downloaded files, if configured
+        executor = ProcessPoolExecutor(MAX_WORKERS) if MAX_WORKERS > 0 else None
+
+        # batched citation requests, one per chunk of articles. In local mode
+        # citations are inverted from parsed reference lists instead, and the
+        # API only fills gaps (see backfill_citations)
+        reference_index = self._create_reference_index()
+        citation_fetcher = None
+        if reference_index is None:
+            citation_fetcher = self._create_citation_fetcher()
+
+        # main scraping block
+        try:
+            for pubmed_file, md5, articles in self._parse_stage(
+                downloaded_files, executor, MAX_WORKERS, chunksize
+            ):
+                manifest.set_status(FTP_DIR, pubmed_file, DOWNLOADED, md5)
+                articles = iter(articles)
+                articles_cnt = 0
+                parsed = True
 
                 # yield articles to generator
                 while True:
-                    articles_chunk = []
-                    SAMPLE_CITATION_CNT = 10
-                    for i in range(chunk_size):
-                        if len(articles) > 0:
-                            article = articles.pop()
-                            if not IS_SAMPLE or (
-                                IS_SAMPLE and i <= SAMPLE_CITATION_CNT
-                            ):
-                                # scrape citation metadata
-                                # in is_sample mode only scrape first 1000 citations
-                                citations = self._citationScrape(article.pmid)
-                                article.set_citationCount(citations[1])
-                                article.set_citationPmid(citations[2])
-                                PubMedScraper.LOGGER.info(
-                                    f"Get citations for PMID: {article.pmid} [{i+1} of {chunk_size}]"
-                                )
-                            articles_chunk.append(article)
-                        else:
-                            break
-
+                    try:
+                        articles_chunk = list(islice(articles, chunksize))
+                    except Exception as e:
+                        # truncated or corrupt file, fetched again next run
+                        PubMedScraper.LOGGER.error(
+                            f"Failed to parse {pubmed_file}: {e}"
+                        )
+                        parsed = False
+                        break
                     if len(articles_chunk) <= 0:
                         break
 
+                    # scrape citation metadata of whole chunk
+                    # in is_sample mode only scrape first citations of chunk
+                    SAMPLE_CITATION_CNT = 10
+                    cited_articles = articles_chunk
+                    if IS_SAMPLE:
+                        cited_articles = articles_chunk[: SAMPLE_CITATION_CNT + 1]
+                    if reference_index is not None:
+                        reference_index.add_articles(articles_chunk)
+                    self._set_citations(citation_fetcher, cited_articles)
+
+                    articles_cnt += len(articles_chunk)
                     PubMedScraper.LOGGER.info(f"Yielded {len(articles_chunk)} articles")
                     yield articles_chunk
 
-                # update list of parsed files
-                parsed_files.append(pubmed_file)
+                PubMedScraper.LOGGER.info(
+                    f"{articles_cnt} articles found in {pubmed_file}"
+                )
+                if not parsed:
+                    continue
+
+                # all articles consumed, don't fetch file again. References are
+                # written first, so they are backfilled even if the run stops
+                if reference_index is not None:
+                    reference_index.flush()
+                manifest.set_status(FTP_DIR, pubmed_file, INGESTED)
+
+            if reference_index is not None:
+                # articles yielded before the articles citing them were parsed:
+                # invert partitions with new references into the cache, and
+                # yield the citation columns to update in stored articles
+                cited_cnt = 0
+                for updates in reference_index.iter_updates(
+                    self._citation_cache, chunksize
+                ):
+                    cited_cnt += len(updates)
+                    yield updates
+                PubMedScraper.LOGGER.info(
+                    f"Local citations of {cited_cnt} articles backfilled"
+                )
 
         except GeneratorExit:
             # ignore error.
             pass
 
         finally:
+            # stop pipeline stages
+            stop_download.set()
+            download_thread.join()
+            downloader.close()
+            if citation_fetcher is not None:
+                citation_fetcher.close()
+            if reference_index is not None:
+                reference_index.flush()
+            self._citation_cache.purge_expired()
+            if executor is not None:
+                executor.shutdown()
+
             # clean up downloaded files
             self._clean_up()
             PubMedScraper.LOGGER.info("PubMed Scraper: Clean-up")
 
-            # update history
-            self._update_history(parsed_files)
-            PubMedScraper.LOGGER.info("PubMed Scraper: Updated History")
-
-            # if baseline dataset was scraped; reset scrape history
-            if BASELINE_SCRAPE_MODE:
-                self._clear_history()
-                PubMedScraper.LOGGER.info(
-                    "PubMed Scraper: Cleared History (after BASELINE)"
-                )
+            manifest.close()
 
         return
 
-    def _ftp_connect(self, ftp_server, ftp_dir) -> FTP:
-        """Opens FTP connection and returns the FTP handle"""
-        try:
-            ftp = FTP(ftp_server)
-            ftp.login()
-            ftp.cwd(ftp_dir)
-            return ftp
-        except Exception as e:
-            PubMedScraper.LOGGER.exception(e)
-            return None
+    def _download_stage(
+        self,
+        downloader: FtpDownloader,
+        pubmed_files: [str],
+        downloaded_files: Queue,
+        stop: Event,
+    ):
+        """
+        Download files concurrently, one per ftp session in the pool.
 
-    def _ftp_disconnect(self, ftp: FTP):
-        """Disconnect and close FTP connection"""
+        The (name, md5) of the downloaded files are queued in the same order
+        as pubmed_files, skipping files that failed to download. The end of
+        the files is always signaled, so the parse stage never waits forever.
+        """
         try:
-            ftp.close()
-            return
+            with ThreadPoolExecutor(max_workers=downloader.sessions) as executor:
+                pending = deque()
+                files = iter(pubmed_files)
+                while True:
+                    # Keep one download in flight per ftp session
+                    while not stop.is_set() and len(pending) < downloader.sessions:
+                        pubmed_file = next(files, None)
+                        if pubmed_file is None:
+                            break
+                        future = executor.submit(
+                            self._ftp_download, downloader, pubmed_file
+                        )
+                        pending.append((pubmed_file, future))
+                    if not pending or stop.is_set():
+                        break
+                    pubmed_file, future = pending.popleft()
+                    downloaded = future.result()
+                    if downloaded is not None and not self._queue_put(
+                        downloaded_files, (pubmed_file, downloaded.md5), stop
+                    ):
+                        break
+                for _, future in pending:
+                    future.cancel()
         except Exception as e:
             PubMedScraper.LOGGER.exception(e)
-            return
+        finally:
+            # signal no more files
+            self._queue_put(downloaded_files, None, stop)
+
+    @staticmethod
+    def _queue_put(queue: Queue, item, stop: Event) -> bool:
+        """Put item in bounded queue, giving up if stop is set while blocked."""
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=PubMedScraper.DEFAULT_QUEUE_TIMEOUT)
+                return True
+            except Full:
+                continue
+        return False
+
+    # pylint: disable=bad-continuation
+    def _parse_stage(
+        self,
+        downloaded_files: Queue,
+        executor: ProcessPoolExecutor,
+        max_workers: int,
+        chunksize: int,
+    ) -> Generator:
+        """
+        Parse downloaded files and yield (filename, md5, articles) in order.
 
-    def _ftp_file_list(self, ftp: FTP) -> []:
-        """Read list of files in FTP directory"""
-        ftp_files = []
+        Up to max_workers files are parsed ahead by the executor while the
+        articles of the current file are consumed. Workers spill the parsed
+        articles in chunks, streamed back from disk. Without executor each file
+        is streamed in the calling process as it is consumed. Files that failed
+        to parse in a worker are logged and skipped, so they stay pending.
+        """
+        pending = deque()
+        no_more_files = False
+        while pending or not no_more_files:
+            # Only block waiting for a download when nothing is being parsed
+            while not no_more_files and len(pending) < max(max_workers, 1):
+                try:
+                    downloaded = downloaded_files.get(block=not pending)
+                except Empty:
+                    break
+                if downloaded is None:
+                    no_more_files = True
+                elif executor is None:
+                    pending.append((downloaded, None))
+                else:
+                    file_path = self._get_download_path(downloaded[0])
+                    future = executor.submit(parse_pubmed_file, file_path, chunksize)
+                    pending.append((downloaded, future))
+            if pending:
+                (pubmed_file, md5), future = pending.popleft()
+                if future is None:
+                    yield pubmed_file, md5, self._pubmedScrape(pubmed_file)
+                    continue
+                try:
+                    spill_path = future.result()
+                except Exception as e:
+                    PubMedScraper.LOGGER.error(f"Failed to parse {pubmed_file}: {e}")
+                    continue
+                yield pubmed_file, md5, read_parsed_file(spill_path)
+
+    def _create_downloader(self, ftp_server: str, ftp_dir: str) -> FtpDownloader:
+        """Create downloader with pool of ftp sessions to PubMed directory"""
         try:
-            ftp.retrlines(
-                f"LIST *{PubMedScraper.DEFAULT_PUBMED_DATAFILE_EXTN}", ftp_files.append
-            )
-            ftp_files = [
-                file.split(" ")[-1].lower() for file in ftp_files
-            ]  # transform filenames
-            return ftp_files
+            sessions = config.get_pubmed_ftp_sessions()
         except Exception as e:
+            sessions = PubMedScraper.DEFAULT_FTP_SESSIONS
             PubMedScraper.LOGGER.exception(e)
-            return ftp_files
+        pool = FtpSessionPool(ftp_server, ftp_dir, size=sessions)
+        return FtpDownloader(
+            pool,
+            os.path.expanduser(self._get_download_dir()),
+            retries=PubMedScraper.DEFAULT_DOWNLOAD_RETRIES,
+        )
 
-    def _ftp_download(self, ftp: FTP, ftp_file: str) -> bool:
-        """Downloads given file from the FTP server"""
+    def _ftp_file_list(self, downloader: FtpDownloader) -> [RemoteFile]:
+        """Read list of files in FTP directory, with their size and mtime"""
         try:
-            # check if the download path exists.
-            # if not, create the path
-            download_path = os.path.expanduser(self._get_download_dir())
-            Path(download_path).mkdir(parents=True, exist_ok=True)
-
-            # downlad file
-            download_filepath = os.path.join(download_path, ftp_file)
-            PubMedScraper.LOGGER.info(
-                f"Attempt to download PubMed file to: {download_filepath}"
-            )
-            ftp.retrbinary("RETR " + ftp_file, open(download_filepath, "wb").write)
-            return True
+            extension = PubMedScraper.DEFAULT_PUBMED_DATAFILE_EXTN
+            return downloader.list_remote(f"*{extension}")
         except Exception as e:
             PubMedScraper.LOGGER.exception(e)
-            return False
+            return []
 
-    def _read_history(self) -> []:
-        """Read and create list of PubMed filenames
-        which are already scraped"""
-        history = []
+    def _ftp_download(
+        self, downloader: FtpDownloader, ftp_file: str
+    ) -> DownloadedFile:
+        """Downloads given file from the FTP server, None if download failed"""
         try:
-            with open(self._get_history_filepath(), "r") as f:
-                for line in f.readlines():
-                    history.append(line.replace("\n", "").lower())
-            return history
+            downloaded = downloader.download(ftp_file)
+            PubMedScraper.LOGGER.info(f"Downloaded PubMed file: {downloaded.path}")
+            return downloaded
+        except DownloadError as e:
+            PubMedScraper.LOGGER.error(e.message)
+            return None
         except Exception as e:
-            PubMedScraper.LOGGER.info(
-                "History file not found. New History file will be created."
-            )
-            return []
+            # i.e. download directory or md5 file errors, file stays pending
+            PubMedScraper.LOGGER.error(f"Failed to download {ftp_file}: {e}")
+            return None
 
-    def _update_history(self, file_list: []):
-        """Read and create list of PubMed filenames
-        which are already scraped"""
+    def _open_manifest(self) -> SyncManifest:
+        """Open manifest of PubMed files and their ingestion status"""
         try:
-            with open(self._get_history_filepath(), "a+") as f:
-                f.writelines(map(lambda x: x + "\n", file_list))
+            manifest_file = config.get_pubmed_manifest_file()
         except Exception as e:
+            manifest_file = PubMedScraper.DEFAULT_PUBMED_MANIFEST_FILE
             PubMedScraper.LOGGER.exception(e)
-            return
+        return SyncManifest(os.path.expanduser(manifest_file))
 
-    def _clear_history(self):
-        """Clear scrape history"""
+    def _import_history(self, manifest: SyncManifest, ftp_dir: str):
+        """Import files listed in legacy history file as ingested"""
         history_file = self._get_history_filepath()
-        if os.path.exists(history_file):
-            os.remove(history_file)
-        pass
+        if not os.path.exists(history_file):
+            return
+        with open(history_file, "r") as f:
+            history = [line.strip().lower() for line in f if line.strip()]
+        imported = manifest.import_ingested(ftp_dir, history)
+        if imported:
+            PubMedScraper.LOGGER.info(
+                f"Imported {imported} files from history file: {history_file}"
+            )
 
     def _get_history_filepath(self) -> str:
         """Get PubMed data file path from Config"""
@@ -508,7 +647,7 @@ class PubMedScraper(BaseScraper):
             return history_file_path
         except Exception as e:
             PubMedScraper.LOGGER.exception(e)
-            return PubMedScraper.DEFAULT_PUBMED_BASELINE_DIR
+            return os.path.expanduser(PubMedScraper.DEFAULT_PUBMED_DATA_FILE)
 
     def _get_download_dir(self) -> str:
         """Get path where to download PubMed data files"""
@@ -518,59 +657,106 @@ class PubMedScraper(BaseScraper):
             PubMedScraper.LOGGER.exception(e)
             return PubMedScraper.DEFAULT_DOWNLOAD_DIR
 
-    def _pubmedScrape(self, pubmed_file) -> []:
-        """Scrape all pubmed articles from pubmed data file"""
-        pubmed_articles = []
+    def _get_download_path(self, pubmed_file: str) -> str:
+        """Get path of downloaded PubMed data file"""
+        file_path = os.path.expanduser(self._get_download_dir())
+        return os.path.join(file_path, pubmed_file)
+
+    def _pubmedScrape(self, pubmed_file) -> Generator:
+        """Stream all pubmed articles from pubmed data file, raising parse errors"""
+        file = self._get_download_path(pubmed_file)
+        with gzip.open(file, "rb") as f:
+            yield from ArticleSetParser.iter_articles(f)
+
+    def backfill_citations(self, start: int, end: int, output_dir: str = None) -> int:
+        """
+        Backfill citations of PMIDs start to end, i.e. all ingested articles.
+
+        Completed windows of PMIDs are checkpointed, so an interrupted backfill
+        resumes where it stopped when called again.
+
+        Arguments:
+            start {int} -- first PMID
+            end {int} -- last PMID
+
+        Keyword Arguments:
+            output_dir {str} -- directory of CSV shards, None to only fill cache
+
+        Returns:
+            int -- number of windows completed
+        """
         try:
-            file_path = os.path.expanduser(self._get_download_dir())
-            file = os.path.join(file_path, pubmed_file)
-            with gzip.open(file, "rb") as f:
-                xml_root = ET.fromstring(f.read())
-                xml_list = xml_root.findall(PubMedScraper.TAG_ARTICLE)
-                for article_xml in xml_list:
-                    pubmed_articles.append(PubMedArticle(article_xml))
-            return pubmed_articles
+            checkpoint_file = config.get_citation_backfill_file()
         except Exception as e:
+            checkpoint_file = PubMedScraper.DEFAULT_CITATION_BACKFILL_FILE
             PubMedScraper.LOGGER.exception(e)
-            return []
-
-    def scrape_concurrent(self, files_cnt):
-        """Start parallel processes to speed up scraping citations."""
-        articles_per_file = 30000
-        max_pmid = files_cnt * articles_per_file
-        PubMedScraper.LOGGER.info(
-            f"Start concurrent citation scraping for {max_pmid} articles"
+        try:
+            max_in_flight = max(config.get_max_workers(), 1) * 4
+        except Exception as e:
+            max_in_flight = AsyncCitationClient.DEFAULT_MAX_IN_FLIGHT
+            PubMedScraper.LOGGER.exception(e)
+        checkpoint = BackfillCheckpoint(os.path.expanduser(checkpoint_file))
+        client = AsyncCitationClient(
+            api_keys=PubMedScraper.API_KEYS,
+            batch_size=PubMedScraper.DEFAULT_CITATION_BATCH_SIZE,
+            max_in_flight=max_in_flight,
+        )
+        backfill = CitationBackfill(
+            client, checkpoint, cache=self._citation_cache, output_dir=output_dir
         )
-        start = 0
-        for chunk in range(0, max_pmid, articles_per_file):
-            max_workers = config.get_max_workers()
-            if max_workers > 0:
-                with ProcessPoolExecutor(max_workers=max_workers) as executor:
-                    executor.map(self._citationScrape, range(start, chunk))
-            start = chunk
-
-    def _citationScrape(self, pmid: int) -> []:
-        """Scrape citation metadata from PubMed API"""
-        null_citation = [pmid, 0, ""]
-
-        # fire PubMed API request
         try:
-            req = requests.get(PubMedScraper._citationApiUrl(pmid))
-            PubMedScraper.LOGGER.info(f"Scraped citations for article: {pmid}")
-            tree = ET.fromstring(req.text)
+            return backfill.run(start, end)
+        finally:
+            checkpoint.close()
+
+    def _create_citation_cache(self) -> CitationCache:
+        """Create cache of scraped citations from Config"""
+        try:
+            cache_file = config.get_citation_cache_file()
+            ttl_days = config.get_citation_cache_ttl_days()
         except Exception as e:
+            cache_file = PubMedScraper.DEFAULT_CITATION_CACHE_FILE
+            ttl_days = PubMedScraper.DEFAULT_CITATION_CACHE_TTL_DAYS
             PubMedScraper.LOGGER.exception(e)
-            return null_citation
+        return CitationCache(os.path.expanduser(cache_file), ttl=ttl_days * 24 * 3600)
+
+    def _create_citation_fetcher(self) -> CitationFetcher:
+        """Create fetcher requesting citations of many PMIDs at once"""
+        return CitationFetcher(
+            cache=self._citation_cache,
+            api_keys=PubMedScraper.API_KEYS,
+            batch_size=PubMedScraper.DEFAULT_CITATION_BATCH_SIZE,
+        )
 
-        # scrape citation data from API response
-        citation_tree = tree.findall(PubMedScraper.TAG_CITATION_ID)
-        if citation_tree and len(citation_tree) > 0:
-            citations = []
-            for _ in citation_tree:
-                citations.append(_.text)
-            return [pmid, len(citation_tree), ",".join(citations)]
+    def _create_reference_index(self) -> ReferenceIndex:
+        """Create index of parsed references in local citation mode, else None"""
+        try:
+            citation_source = config.get_citation_source()
+            references_dir = config.get_citation_references_dir()
+        except Exception as e:
+            citation_source = PubMedScraper.DEFAULT_CITATION_SOURCE
+            references_dir = PubMedScraper.DEFAULT_CITATION_REFERENCES_DIR
+            PubMedScraper.LOGGER.exception(e)
+        if citation_source != "local":
+            return None
+        return ReferenceIndex(os.path.expanduser(references_dir))
 
-        return null_citation
+    def _set_citations(self, citation_fetcher: CitationFetcher, articles: []):
+        """Scrape and set citation metadata of articles, only cached without fetcher"""
+        pmids = [int(article.pmid) for article in articles if article.pmid]
+        try:
+            if citation_fetcher is None:
+                citations = self._citation_cache.get_many(pmids)
+            else:
+                citations = citation_fetcher.fetch(pmids)
+                PubMedScraper.LOGGER.info(f"Scraped citations of {len(pmids)} articles")
+        except CitationError as e:
+            PubMedScraper.LOGGER.error(e.message)
+            citations = {}
+        for article in articles:
+            citing = citations.get(int(article.pmid), []) if article.pmid else []
+            article.set_citationCount(len(citing))
+            article.set_citationPmid(",".join(citing))
 
     def _clean_up(self):
         """Delete all downloaded pubmed files"""
@@ -582,18 +768,54 @@ class PubMedScraper(BaseScraper):
             PubMedScraper.LOGGER.exception(e)
             return
 
-    @classmethod
-    def _citationApiUrl(cls, pmid: int) -> str:
-        """Returns a fully formated citation API URL for a given PMID"""
-        return (
-            PubMedScraper.API_BASE_URL
-            + PubMedScraper.API_KEY_PARAM
-            + PubMedScraper._randomApiKey()
-            + PubMedScraper.API_ID_PARAM
-            + str(pmid)
-        )
 
-    @classmethod
-    def _randomApiKey(cls) -> str:
-        """Returns a random PubMed API key from a list of static API keys"""
-        return PubMedScraper.API_KEYS[randint(0, len(PubMedScraper.API_KEYS) - 1)]
+def parse_pubmed_file(file_path: str, chunksize: int) -> str:
+    """
+    Parse all articles of compressed pubmed data file in a worker process.
+
+    Articles are pickled in chunks to a spill file next to the data file, so
+    neither the worker nor the result hold the whole file in memory. The data
+    file is deleted once parsed, to free up disk space while the following
+    files are being downloaded.
+
+    Arguments:
+        file_path {str} -- absolute path to downloaded .xml.gz pubmed data file
+        chunksize {int} -- number of articles per pickled chunk
+
+    Returns:
+        str -- path of spill file, read with read_parsed_file
+
+    Raises:
+        Exception -- if the data file can't be parsed, e.g. truncated
+    """
+    spill_path = file_path + ".pkl"
+    try:
+        with gzip.open(file_path, "rb") as f, open(spill_path, "wb") as spill:
+            articles = ArticleSetParser.iter_articles(f)
+            while True:
+                chunk = list(islice(articles, max(chunksize, 1)))
+                if not chunk:
+                    break
+                pickle.dump(chunk, spill, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+        raise
+    os.remove(file_path)
+    return spill_path
+
+
+def read_parsed_file(spill_path: str) -> Generator:
+    """Stream articles spilled by parse_pubmed_file, deleting the spill file."""
+    try:
+        with open(spill_path, "rb") as spill:
+            while True:
+                try:
+                    chunk = pickle.load(spill)
+                except EOFError:
+                    break
+                yield from chunk
+    finally:
+        # Download dir may already be cleaned up when closed early
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
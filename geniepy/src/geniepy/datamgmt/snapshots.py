@@ -0,0 +1,290 @@
+"""
+Snapshot diffs of sources published as whole files (i.e. Pubtator, SJR).
+
+Rows of each snapshot are hashed into partitions, and each partition is
+fingerprinted by the number and the sum of its row hashes, which doesn't
+depend on the order of the rows. The previous snapshot is kept locally, one
+pickled DataFrame per partition, so only the partitions whose fingerprint
+changed are loaded and diffed, and only the rows added and removed since are
+sent to the DAOs instead of the whole table.
+
+Rows are compared as multisets: a row appearing twice in the new snapshot and
+once in the previous one is added once.
+
+The local copy follows the rows applied by the consumer: a partition's
+removed rows are recorded as gone once they were deleted, and its added rows
+once they were saved, so an interrupted update never deletes or inserts the
+same rows twice.
+"""
+from pathlib import Path
+from typing import Generator, Iterable
+import shutil
+import numpy as np
+import pandas as pd
+import geniepy.config as config
+
+REMOVED = "removed"
+"""DataFrame.attrs key set on chunks of rows removed from the source."""
+
+
+def is_removed(chunk: pd.DataFrame) -> bool:
+    """Check if chunk holds rows removed from the source."""
+    return bool(chunk.attrs.get(REMOVED))
+
+
+def row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """uint64 hash of each row's values."""
+    return pd.util.hash_pandas_object(chunk, index=False).to_numpy(np.uint64)
+
+
+def fingerprint(rows: pd.DataFrame) -> np.ndarray:
+    """Row count and sum of row hashes of rows, as uint64."""
+    total = row_hashes(rows).sum(dtype=np.uint64) if len(rows) else 0
+    return np.array([len(rows), total], dtype=np.uint64)
+
+
+def _occurrences(hashes: np.ndarray) -> np.ndarray:
+    """Index of each hash among the equal hashes before it."""
+    order = np.argsort(hashes, kind="stable")
+    ordered = hashes[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    sizes = np.diff(np.r_[starts, len(ordered)])
+    occurrences = np.empty(len(hashes), dtype=np.int64)
+    occurrences[order] = np.arange(len(ordered)) - np.repeat(starts, sizes)
+    return occurrences
+
+
+def _counts(hashes: np.ndarray, of: np.ndarray) -> np.ndarray:
+    """Number of times each hash of hashes appears in of."""
+    unique, counts = np.unique(of, return_counts=True)
+    index = np.searchsorted(unique, hashes).clip(max=max(len(unique) - 1, 0))
+    found = np.zeros(len(hashes), dtype=np.int64)
+    if len(unique):
+        matches = unique[index] == hashes
+        found[matches] = counts[index[matches]]
+    return found
+
+
+def diff_rows(previous: pd.DataFrame, current: pd.DataFrame) -> (pd.DataFrame,):
+    """
+    Rows added and removed between two versions of a partition.
+
+    Arguments:
+        previous {pd.DataFrame} -- rows of the previous snapshot
+        current {pd.DataFrame} -- rows of the new snapshot
+
+    Returns:
+        (pd.DataFrame, pd.DataFrame) -- (added, removed) rows
+    """
+    old = row_hashes(previous)
+    new = row_hashes(current)
+    added = _occurrences(new) >= _counts(new, old)
+    removed = _occurrences(old) >= _counts(old, new)
+    return current[added], previous[removed]
+
+
+class SnapshotDiff:
+    """Local partitioned copy of a source's last snapshot, diffed with the next."""
+
+    LOGGER = config.get_logger("SnapshotDiff")
+
+    DEFAULT_PARTITIONS = 256
+    DEFAULT_SPOOL_ROWS = 1 << 16
+    FINGERPRINTS_NAME = "fingerprints.npy"
+    SPOOL_DIR = ".spool"
+
+    # pylint: disable=bad-continuation
+    def __init__(
+        self,
+        directory: str,
+        partitions: int = DEFAULT_PARTITIONS,
+        spool_rows: int = DEFAULT_SPOOL_ROWS,
+    ):
+        """
+        Open snapshot store, created if it doesn't exist.
+
+        Arguments:
+            directory {str} -- directory of the source's partitions
+
+        Keyword Arguments:
+            partitions {int} -- number of hash partitions
+            spool_rows {int} -- rows buffered per partition before spooling
+        """
+        self._directory = Path(directory).expanduser()
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._partitions = max(partitions, 1)
+        self._spool_rows = max(spool_rows, 1)
+        self._spool_dir = self._directory.joinpath(self.SPOOL_DIR)
+        self._fingerprints_path = self._directory.joinpath(self.FINGERPRINTS_NAME)
+        self._reset_spool()
+
+    @property
+    def exists(self) -> bool:
+        """True if a snapshot was recorded."""
+        return self._fingerprints_path.exists()
+
+    def fingerprints(self) -> np.ndarray:
+        """(partitions, 2) uint64 array of row count and sum of row hashes."""
+        if not self.exists:
+            return np.zeros((self._partitions, 2), dtype=np.uint64)
+        return np.load(self._fingerprints_path)
+
+    def _save_fingerprints(self, fingerprints: np.ndarray):
+        """Save fingerprints atomically."""
+        tmp_path = self._directory.joinpath("." + self.FINGERPRINTS_NAME)
+        with open(tmp_path, "wb") as tmp_file:
+            np.save(tmp_file, fingerprints)
+        tmp_path.replace(self._fingerprints_path)
+
+    def _partition_path(self, partition: int) -> Path:
+        """Pickled rows of partition of the last snapshot."""
+        return self._directory.joinpath(f"part-{partition:05d}.pkl")
+
+    def _reset_spool(self):
+        """Drop rows of a snapshot not diffed."""
+        if self._spool_dir.exists():
+            shutil.rmtree(self._spool_dir)
+        self._spool_dir.mkdir()
+        self._buffers = [[] for _ in range(self._partitions)]
+        self._buffered = np.zeros(self._partitions, dtype=np.int64)
+        self._spooled = np.zeros(self._partitions, dtype=np.int64)
+        self._next = np.zeros((self._partitions, 2), dtype=np.uint64)
+
+    def add(self, chunk: pd.DataFrame):
+        """Add chunk of rows of the new snapshot."""
+        if chunk is None or not len(chunk):
+            return
+        hashes = row_hashes(chunk)
+        partitions = (hashes >> np.uint64(32)) % np.uint64(self._partitions)
+        partitions = partitions.astype(np.int64)
+        self._next[:, 0] += np.bincount(
+            partitions, minlength=self._partitions
+        ).astype(np.uint64)
+        # uint64 sums wrap around, which keeps them order independent
+        np.add.at(self._next[:, 1], partitions, hashes)
+        chunk = chunk.reset_index(drop=True)
+        for partition, rows in chunk.groupby(partitions, sort=False).indices.items():
+            self._buffers[partition].append(chunk.take(rows))
+            self._buffered[partition] += len(rows)
+            if self._buffered[partition] >= self._spool_rows:
+                self._spool(partition)
+
+    def _spool(self, partition: int):
+        """Write buffered rows of partition to the spool."""
+        if not self._buffers[partition]:
+            return
+        rows = pd.concat(self._buffers[partition], ignore_index=True)
+        fragment = self._spooled[partition]
+        rows.to_pickle(self._spool_dir.joinpath(f"{partition:05d}.{fragment:06d}.pkl"))
+        self._spooled[partition] += 1
+        self._buffers[partition] = []
+        self._buffered[partition] = 0
+
+    def _spooled_rows(self, partition: int) -> pd.DataFrame:
+        """Rows of partition in the new snapshot."""
+        self._spool(partition)
+        fragments = [
+            pd.read_pickle(self._spool_dir.joinpath(f"{partition:05d}.{frag:06d}.pkl"))
+            for frag in range(self._spooled[partition])
+        ]
+        if not fragments:
+            return None
+        return pd.concat(fragments, ignore_index=True)
+
+    def _previous_rows(self, partition: int, like: pd.DataFrame) -> pd.DataFrame:
+        """Rows of partition in the last snapshot, empty if it had none."""
+        path = self._partition_path(partition)
+        if path.exists():
+            return pd.read_pickle(path)
+        return like.iloc[:0] if like is not None else None
+
+    def _replace(self, partition: int, rows: pd.DataFrame):
+        """Make rows the last snapshot's rows of partition."""
+        path = self._partition_path(partition)
+        if rows is None or not len(rows):
+            if path.exists():
+                path.unlink()
+            return
+        tmp_path = path.with_name("." + path.name)
+        rows.to_pickle(tmp_path)
+        tmp_path.replace(path)
+
+    # pylint: disable=bad-continuation
+    def _commit(
+        self,
+        partition: int,
+        rows: pd.DataFrame,
+        fingerprints: np.ndarray,
+        rows_fingerprint: np.ndarray,
+    ):
+        """Record rows, with their fingerprint, as partition's last rows."""
+        self._replace(partition, rows)
+        fingerprints[partition] = rows_fingerprint
+        self._save_fingerprints(fingerprints)
+
+    def diff(self) -> Generator[pd.DataFrame, None, None]:
+        """
+        Diff added snapshot against the last one, and make it the last one.
+
+        A chunk is committed once the consumer asks for the next one, so an
+        interrupted update resumes with the rows not yet applied.
+
+        Returns:
+            Generator[pd.DataFrame] -- chunks of removed rows flagged by
+                                       is_removed, each followed by the added
+                                       rows of the same partition
+        """
+        fingerprints = self.fingerprints()
+        changed = np.flatnonzero((fingerprints != self._next).any(axis=1))
+        self.LOGGER.info(f"{len(changed)} of {self._partitions} partitions changed")
+        for partition in changed:
+            current = self._spooled_rows(partition)
+            previous = self._previous_rows(partition, current)
+            if current is None:
+                current = previous.iloc[:0]
+            added, removed = diff_rows(previous, current)
+            # Deleted first, not to delete rows just added
+            if len(removed):
+                removed.attrs[REMOVED] = True
+                yield removed
+                kept = previous.drop(index=removed.index)
+                self._commit(partition, kept, fingerprints, fingerprint(kept))
+            if len(added):
+                yield added
+            self._commit(partition, current, fingerprints, self._next[partition])
+        self._save_fingerprints(self._next)
+        self._reset_spool()
+
+    def update(self, chunks: Iterable[pd.DataFrame]) -> Generator:
+        """
+        Diff snapshot streamed in chunks against the last one.
+
+        Arguments:
+            chunks {Iterable[pd.DataFrame]} -- chunks of the new snapshot
+
+        Returns:
+            Generator[pd.DataFrame] -- chunks of removed rows flagged by
+                                       is_removed, each followed by the added
+                                       rows of the same partition
+        """
+        for chunk in chunks:
+            self.add(chunk)
+        yield from self.diff()
+
+    def record(self, chunks: Iterable[pd.DataFrame]) -> Generator:
+        """
+        Pass chunks of a full snapshot through, recording it as the last one.
+
+        Arguments:
+            chunks {Iterable[pd.DataFrame]} -- chunks of the snapshot
+
+        Returns:
+            Generator[pd.DataFrame] -- the same chunks
+        """
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+        for partition in range(self._partitions):
+            self._replace(partition, self._spooled_rows(partition))
+        self._save_fingerprints(self._next)
+        self._reset_spool()
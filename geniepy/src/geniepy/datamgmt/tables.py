@@ -104,7 +104,7 @@ PUBTATOR_GENE_DAO_TABLE = Table(
     MetaData(),
     # No primary key allows duplicate records
     Column("date", String, primary_key=False, nullable=False),
-    Column("PMID", String),
+    Column("PMID", Integer),
     Column("GeneID", String),
 )
 """Output DAO Repository Schema."""
@@ -123,7 +123,7 @@ PUBTATOR_DISEASE_DAO_TABLE = Table(
     MetaData(),
     # No primary key allows duplicate records
     Column("date", String, primary_key=False, nullable=False),
-    Column("PMID", String),
+    Column("PMID", Integer),
     Column("DiseaseID", String),
 )
 """Output DAO Repository Schema."""
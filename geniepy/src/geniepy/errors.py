@@ -23,6 +23,14 @@ class ConnectionError(GeniePyError):
     """Unable to connect."""
 
 
+class DownloadError(GeniePyError):
+    """Unable to download file."""
+
+
+class CitationError(GeniePyError):
+    """Unable to fetch citations."""
+
+
 class DaoError(GeniePyError):
     """Data Access Object Error."""
 
@@ -1,8 +1,18 @@
 """PubMed related functionality."""
 import xml.etree.ElementTree as ET
+from sys import intern
 import json
 import csv
+import gzip
+import os
 import jsonlines
+from datetime import date
+from typing import Generator, Iterable, TextIO
+
+PARQUET_BATCH_SIZE = 10000
+"""Default number of articles buffered per parquet write."""
+PARQUET_NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+"""Parquet partition of articles without completion year."""
 
 
 class PubMedArticle:
@@ -197,6 +207,352 @@ class PubMedArticle:
         return _dict
 
 
+class ArticleRecord:
+    """
+    Compact PubMed Article record extracted in a single pass over the article tree.
+
+    Exposes the same public properties as PubMedArticle, but all fields are
+    filled at construction time as typed primitives, so the xml element tree can
+    be released as soon as the record is built. Low cardinality strings (journal,
+    language, chemicals, mesh descriptors...) are interned to be shared across
+    records and list fields are stored as tuples.
+    """
+
+    FIELDS = [
+        "pmid",
+        "date_completed",
+        "pub_model",
+        "title",
+        "iso_abbreviation",
+        "article_title",
+        "abstract",
+        "authors",
+        "language",
+        "chemicals",
+        "mesh_list",
+        "issn",
+        "issn_type",
+    ]
+
+    __slots__ = [
+        "_pmid",
+        "_date_completed",
+        "_pub_model",
+        "_title",
+        "_iso_abbreviation",
+        "_article_title",
+        "_abstract",
+        "_authors",
+        "_language",
+        "_chemicals",
+        "_mesh_list",
+        "_issn",
+        "_issn_type",
+        "_references",
+        "citationCount",
+        "citationPmid",
+    ]
+
+    # pylint: disable=too-many-arguments, too-many-locals
+    def __init__(
+        self,
+        pmid: str = "",
+        date_completed: str = "--",
+        pub_model: str = "",
+        title: str = "",
+        iso_abbreviation: str = "",
+        article_title: str = "",
+        abstract: str = "",
+        authors: [str] = (),
+        language: str = "",
+        chemicals: [str] = (),
+        mesh_list: [str] = (),
+        issn: str = "",
+        issn_type: str = "",
+        references: [int] = (),
+    ):
+        """Construct record from already extracted field values."""
+        self._pmid: int = int(pmid) if pmid else 0
+        self._date_completed: str = intern(date_completed)
+        self._pub_model: str = intern(pub_model)
+        self._title: str = intern(title)
+        self._iso_abbreviation: str = intern(iso_abbreviation)
+        self._article_title: str = article_title
+        self._abstract: str = abstract
+        self._authors: (str,) = tuple(authors)
+        self._language: str = intern(language)
+        self._chemicals: (str,) = tuple(map(intern, chemicals))
+        self._mesh_list: (str,) = tuple(map(intern, mesh_list))
+        self._issn: str = intern(issn)
+        self._issn_type: str = intern(issn_type)
+        # Same article may be listed both as reference and comment
+        self._references: (int,) = tuple(dict.fromkeys(map(int, references)))
+        self.citationCount: int = 0
+        self.citationPmid: str = ""
+
+    @classmethod
+    def from_element(cls, article_tree: ET.Element) -> "ArticleRecord":
+        """
+        Extract all article fields walking the article element tree once.
+
+        Only the subtrees holding article fields are visited, every other
+        branch of the tree is skipped. The record keeps no reference to the
+        element tree.
+
+        Arguments:
+            article_tree {ET.Element} -- <PubmedArticle> element tree
+
+        Returns:
+            ArticleRecord -- The record with all article fields
+        """
+        fields = {"authors": [], "chemicals": [], "mesh_list": [], "references": []}
+        medline = article_tree.find(PubMedArticle.MEDLINE_TAG)
+        if medline is not None:
+            for node in medline:
+                handler = _MEDLINE_HANDLERS.get(node.tag)
+                if handler is not None:
+                    handler(node, fields)
+        # Articles may have several reference lists
+        for reference_list in article_tree.iterfind("PubmedData/ReferenceList"):
+            _extract_reference_list(reference_list, fields)
+        fields["date_completed"] = "-".join(
+            fields.pop(part, "") for part in ("Year", "Month", "Day")
+        )
+        return cls(**fields)
+
+    @property
+    def pmid(self) -> str:
+        """Pubmed article ID."""
+        return str(self._pmid) if self._pmid else ""
+
+    @property
+    def date_completed(self) -> str:
+        """Date completed record distributed to PubMed."""
+        return self._date_completed
+
+    @property
+    def pub_model(self) -> str:
+        """Publication model - medium/media in which article was published."""
+        return self._pub_model
+
+    @property
+    def title(self) -> str:
+        """Full journal title."""
+        return self._title
+
+    @property
+    def iso_abbreviation(self) -> str:
+        """Journal title ISO abbreviation."""
+        return self._iso_abbreviation
+
+    @property
+    def article_title(self) -> str:
+        """Entire title of journal article in English."""
+        return self._article_title
+
+    @property
+    def abstract(self) -> str:
+        """Entire abstract taken directly from published article."""
+        return self._abstract
+
+    @property
+    def authors(self) -> [str]:
+        """Names of authors published with article."""
+        return list(self._authors)
+
+    @property
+    def language(self) -> str:
+        """Tha language the article was published in."""
+        return self._language
+
+    @property
+    def chemicals(self) -> [str]:
+        """One or more chemical elements."""
+        return list(self._chemicals)
+
+    @property
+    def mesh_list(self) -> [str]:
+        """Article's suppl mesh list."""
+        return list(self._mesh_list)
+
+    @property
+    def issn(self) -> str:
+        """Journal ISSN ID."""
+        return self._issn
+
+    @property
+    def issn_type(self) -> str:
+        """Journal ISSN Type."""
+        return self._issn_type
+
+    @property
+    def references(self) -> [int]:
+        """PMIDs of articles cited by the article, from its reference list."""
+        return list(self._references)
+
+    @property
+    def values(self) -> tuple:
+        """
+        Typed record values, in FIELDS order followed by the citation fields.
+
+        The pmid is returned as int and list fields as tuples, without any
+        conversion, to be written directly into column buffers.
+        """
+        return (
+            self._pmid,
+            self._date_completed,
+            self._pub_model,
+            self._title,
+            self._iso_abbreviation,
+            self._article_title,
+            self._abstract,
+            self._authors,
+            self._language,
+            self._chemicals,
+            self._mesh_list,
+            self._issn,
+            self._issn_type,
+            self.citationCount,
+            self.citationPmid,
+        )
+
+    def set_citationCount(self, citation_count: int):
+        """Update property: citation_count."""
+        self.citationCount = citation_count
+
+    def set_citationPmid(self, citation_pmid: str):
+        """Update property: citation_pmid."""
+        self.citationPmid = citation_pmid
+
+    @property
+    def to_dict(self):
+        """Generate article model dictionary."""
+        _dict = {field: getattr(self, field) for field in self.FIELDS}
+        _dict["citation_count"] = self.citationCount
+        _dict["citation_pmid"] = self.citationPmid
+        return _dict
+
+
+def _text(element: ET.Element) -> str:
+    """Return element text, empty string if element has no text."""
+    return element.text or ""
+
+
+def _set_first(fields: dict, key: str, value: str):
+    """Set field only if not yet set, i.e. keep the first matching element."""
+    if key not in fields:
+        fields[key] = value
+
+
+def _extract_date_completed(node: ET.Element, fields: dict):
+    """Extract <DateCompleted> Year, Month and Day."""
+    for part in node:
+        if part.tag in ("Year", "Month", "Day"):
+            _set_first(fields, part.tag, _text(part))
+
+
+def _extract_journal(node: ET.Element, fields: dict):
+    """Extract <Journal> ISSN, title and ISO abbreviation."""
+    for child in node:
+        tag = child.tag
+        if tag == "ISSN":
+            if "issn" not in fields:
+                fields["issn"] = _text(child)
+                fields["issn_type"] = child.get("IssnType", "")
+        elif tag == "Title":
+            _set_first(fields, "title", _text(child))
+        elif tag == "ISOAbbreviation":
+            _set_first(fields, "iso_abbreviation", _text(child))
+
+
+def _extract_abstract(node: ET.Element, fields: dict):
+    """Extract first <AbstractText>."""
+    abstract = node.find("AbstractText")
+    if abstract is not None:
+        _set_first(fields, "abstract", _text(abstract))
+
+
+def _extract_authors(node: ET.Element, fields: dict):
+    """Extract '<ForeName> <LastName>' of each <Author>."""
+    authors = fields["authors"]
+    for author in node:
+        if author.tag != "Author":
+            continue
+        forename = lastname = ""
+        for name in author:
+            if name.tag == "ForeName":
+                forename = _text(name)
+            elif name.tag == "LastName":
+                lastname = _text(name)
+        authors.append(forename + " " + lastname)
+
+
+def _extract_article(node: ET.Element, fields: dict):
+    """Extract <Article> fields."""
+    _set_first(fields, "pub_model", node.get("PubModel", ""))
+    for child in node:
+        tag = child.tag
+        if tag == "Journal":
+            _extract_journal(child, fields)
+        elif tag == "ArticleTitle":
+            _set_first(fields, "article_title", _text(child))
+        elif tag == "Abstract":
+            _extract_abstract(child, fields)
+        elif tag == "AuthorList":
+            _extract_authors(child, fields)
+        elif tag == "Language":
+            _set_first(fields, "language", _text(child))
+
+
+def _extract_chemicals(node: ET.Element, fields: dict):
+    """Extract <NameOfSubstance> of each <Chemical>."""
+    for chemical in node:
+        substance = chemical.find("NameOfSubstance")
+        if substance is not None:
+            fields["chemicals"].append(_text(substance))
+
+
+def _extract_mesh_list(node: ET.Element, fields: dict):
+    """Extract <DescriptorName> of each <MeshHeading>."""
+    for mesh in node:
+        descriptor = mesh.find("DescriptorName")
+        if descriptor is not None:
+            fields["mesh_list"].append(_text(descriptor))
+
+
+def _extract_pmid(node: ET.Element, fields: dict):
+    """Extract <PMID>."""
+    _set_first(fields, "pmid", _text(node))
+
+
+def _extract_comments_corrections(node: ET.Element, fields: dict):
+    """Extract <PMID> of each <CommentsCorrections> citing another article."""
+    for comment in node:
+        if comment.get("RefType") == "Cites":
+            pmid = comment.findtext("PMID")
+            if pmid and pmid.strip().isdigit():
+                fields["references"].append(int(pmid))
+
+
+def _extract_reference_list(node: ET.Element, fields: dict):
+    """Extract pubmed <ArticleId> of each <Reference>, nested lists included."""
+    for article_id in node.iterfind(".//Reference/ArticleIdList/ArticleId"):
+        pmid = article_id.text
+        if article_id.get("IdType") == "pubmed" and pmid and pmid.strip().isdigit():
+            fields["references"].append(int(pmid))
+
+
+_MEDLINE_HANDLERS = {
+    "PMID": _extract_pmid,
+    "DateCompleted": _extract_date_completed,
+    "Article": _extract_article,
+    "ChemicalList": _extract_chemicals,
+    "MeshHeadingList": _extract_mesh_list,
+    "CommentsCorrectionsList": _extract_comments_corrections,
+}
+"""Field extractors of <MedlineCitation> children, keyed by tag."""
+
+
 class ArticleSetParser:
     """
     Parsing utility for PubMed Article sets.
@@ -204,6 +560,36 @@ class ArticleSetParser:
     An article set is an xml file with an array of <PubMedArticles>.
     """
 
+    ARTICLE_TAG = "PubmedArticle"
+
+    @staticmethod
+    def iter_articles(source) -> Generator[ArticleRecord, None, None]:
+        """
+        Incrementally parse article set and yield article records as they close.
+
+        Each article is converted to a compact ArticleRecord and its xml element
+        tree is released right away, so memory usage doesn't grow with the size
+        of the article set.
+
+        Arguments:
+            source -- path or binary file object (i.e. gzip stream) of article set
+
+        Returns:
+            Generator[ArticleRecord] -- Generator yielding pubmed article records
+        """
+        root = None
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if root is None:
+                # First event is always the start of the document root
+                root = element
+                continue
+            if event == "end" and element.tag == ArticleSetParser.ARTICLE_TAG:
+                record = ArticleRecord.from_element(element)
+                # Release processed articles (and any siblings) from root
+                element.clear()
+                root.clear()
+                yield record
+
     @staticmethod
     def extract_articles(xml_file_path: str) -> [PubMedArticle]:
         """
@@ -231,25 +617,54 @@ class ArticleSetParser:
         return dict_list
 
     @staticmethod
-    def articles_to_json(articles: [PubMedArticle], target_file_path: str):
-        """Serialize pubmedarticle objects to json file."""
-        dict_list = ArticleSetParser.articles_to_dict(articles)
-        articles_json = json.dumps({"articles": dict_list})
-        with open(target_file_path, "w") as target_file:
-            target_file.write(articles_json)
+    def articles_to_json(articles: Iterable[PubMedArticle], target_file_path: str):
+        """
+        Serialize pubmedarticle objects to json file as they are generated.
+
+        Target files ending in .gz or .zst are compressed while written.
+
+        Returns:
+            int -- number of articles written
+        """
+        articles_cnt = 0
+        with _open_output(target_file_path) as target_file:
+            target_file.write('{"articles": [')
+            for article in articles:
+                if articles_cnt:
+                    target_file.write(", ")
+                target_file.write(json.dumps(article.to_dict))
+                articles_cnt += 1
+            target_file.write("]}")
+        return articles_cnt
 
     @staticmethod
-    def articles_to_jsonl(articles: [PubMedArticle], target_file_path: str):
-        """Serialize pubmedarticle objects to jsonl file."""
-        dict_list = ArticleSetParser.articles_to_dict(articles)
-        with jsonlines.open(target_file_path, "w") as writer:
-            # pylint: disable=E1101
-            writer.write_all(dict_list)
+    def articles_to_jsonl(articles: Iterable[PubMedArticle], target_file_path: str):
+        """
+        Serialize pubmedarticle objects to jsonl file as they are generated.
+
+        Target files ending in .gz or .zst are compressed while written.
+
+        Returns:
+            int -- number of articles written
+        """
+        articles_cnt = 0
+        with _open_output(target_file_path) as target_file:
+            with jsonlines.Writer(target_file) as writer:
+                for article in articles:
+                    writer.write(article.to_dict)
+                    articles_cnt += 1
+        return articles_cnt
 
     @staticmethod
-    def articles_to_pipe(articles: [PubMedArticle], target_file_path: str):
-        """Serialize pubmedarticle objects to csv file."""
-        dict_list = ArticleSetParser.articles_to_dict(articles)
+    def articles_to_pipe(articles: Iterable[PubMedArticle], target_file_path: str):
+        """
+        Serialize pubmedarticle objects to csv file as they are generated.
+
+        Target files ending in .gz or .zst are compressed while written.
+
+        Returns:
+            int -- number of articles written
+        """
         csv_columns = [
             "pmid",
             "date_completed",
@@ -268,11 +683,131 @@ class ArticleSetParser:
             "citation_pmid",
         ]
 
+        articles_cnt = 0
         try:
-            with open(target_file_path, "w", encoding="utf-8") as csv_file:
+            with _open_output(target_file_path) as csv_file:
                 writer = csv.DictWriter(csv_file, delimiter="|", fieldnames=csv_columns)
                 writer.writeheader()
-                for article in dict_list:
-                    writer.writerow(article)
+                for article in articles:
+                    writer.writerow(article.to_dict)
+                    articles_cnt += 1
         except IOError:  # pragma: no cover
             print("Unable to write csv file")
+        return articles_cnt
+
+    @staticmethod
+    def articles_to_parquet(
+        articles: Iterable[PubMedArticle],
+        target_dir_path: str,
+        basename: str = "part",
+        batch_size: int = PARQUET_BATCH_SIZE,
+        compression: str = "zstd",
+    ):
+        """
+        Serialize pubmedarticle objects to parquet dataset partitioned by year.
+
+        Articles are written in batches as they are generated to one file per
+        completion year: <target_dir>/year=<YYYY>/<basename>.parquet. Articles
+        without completion year go to the hive default partition. Authors,
+        chemicals and mesh_list are stored as native list columns. Requires the
+        optional pyarrow dependency, install with: pip install geniepy[parquet]
+
+        Arguments:
+            articles {Iterable[PubMedArticle]} -- pubmed articles or records
+            target_dir_path {str} -- root directory of the partitioned dataset
+
+        Keyword Arguments:
+            basename {str} -- name of the files written in each partition
+            batch_size {int} -- number of articles buffered per write
+            compression {str} -- parquet compression codec
+
+        Returns:
+            int -- number of articles written
+        """
+        # pylint: disable=import-outside-toplevel
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                ("pmid", pa.int64()),
+                ("date_completed", pa.date32()),
+                ("pub_model", pa.string()),
+                ("title", pa.string()),
+                ("iso_abbreviation", pa.string()),
+                ("article_title", pa.string()),
+                ("abstract", pa.string()),
+                ("authors", pa.list_(pa.string())),
+                ("language", pa.string()),
+                ("chemicals", pa.list_(pa.string())),
+                ("mesh_list", pa.list_(pa.string())),
+                ("issn", pa.string()),
+                ("issn_type", pa.string()),
+                ("citation_count", pa.int64()),
+                ("citation_pmid", pa.string()),
+            ]
+        )
+        writers = {}  # year partition -> (parquet writer, partial file, file)
+        batches = {}  # year partition -> buffered article dicts
+
+        def flush(year: str):
+            """Write buffered articles of year partition."""
+            if year not in writers:
+                partition_dir = os.path.join(target_dir_path, f"year={year}")
+                os.makedirs(partition_dir, exist_ok=True)
+                file_path = os.path.join(partition_dir, basename + ".parquet")
+                # Hidden until complete, so readers never see truncated files
+                partial_path = os.path.join(partition_dir, "." + basename + ".parquet")
+                writer = pq.ParquetWriter(partial_path, schema, compression=compression)
+                writers[year] = (writer, partial_path, file_path)
+            batch = batches.pop(year)
+            table = pa.Table.from_pylist(batch, schema=schema)
+            writers[year][0].write_table(table)
+
+        articles_cnt = 0
+        try:
+            for article in articles:
+                record = article.to_dict
+                date_completed = record["date_completed"]
+                year = _completion_year(date_completed)
+                record["pmid"] = int(record["pmid"]) if record["pmid"] else None
+                record["date_completed"] = _completion_date(date_completed)
+                record["citation_count"] = int(record["citation_count"] or 0)
+                batches.setdefault(year, []).append(record)
+                if len(batches[year]) >= batch_size:
+                    flush(year)
+                articles_cnt += 1
+            for year in list(batches):
+                flush(year)
+        finally:
+            for writer, _, _ in writers.values():
+                writer.close()
+        for _, partial_path, file_path in writers.values():
+            os.replace(partial_path, file_path)
+        return articles_cnt
+
+
+def _completion_year(date_completed: str) -> str:
+    """Partition of completion date formatted as YYYY-MM-DD."""
+    year = date_completed.split("-")[0]
+    return year if year.isdigit() else PARQUET_NULL_PARTITION
+
+
+def _completion_date(date_completed: str) -> date:
+    """Parse completion date formatted as YYYY-MM-DD, None if incomplete."""
+    try:
+        return date.fromisoformat(date_completed)
+    except ValueError:
+        return None
+
+
+def _open_output(target_file_path: str) -> TextIO:
+    """Open text file for writing, compressed according to its extension."""
+    if target_file_path.endswith(".gz"):
+        return gzip.open(target_file_path, "wt", encoding="utf-8")
+    if target_file_path.endswith(".zst"):
+        # Optional dependency, install with: pip install geniepy[zstd]
+        import zstandard  # pylint: disable=import-outside-toplevel
+
+        return zstandard.open(target_file_path, "wt", encoding="utf-8")
+    return open(target_file_path, "w", encoding="utf-8")
@@ -0,0 +1,599 @@
+"""
+Article ranking.
+
+PageRank of PubMed articles over the citation graph, computed by power
+iteration as sparse matrix-vector products. The transition matrix is built on
+the cited-by CSR arrays of the citation graph store: row i holds the articles
+citing i, and scores are divided by the number of articles each of them cites
+before each product, so each iteration is a single SpMV without transposing the
+graph. Rows are split in blocks multiplied by a thread pool, scipy releases the
+GIL while multiplying.
+
+Rankings are kept up to date incrementally: citations added or removed since
+the graph store was built are applied as a small delta matrix, and power
+iteration restarts from the previous scores, which only takes a few iterations
+when the graph barely changed. Only the rows whose score changed materially
+need to be written back.
+
+Papers are ranked per gene and disease with personalized PageRank, teleporting
+to the papers Pubtator annotates with the entity instead of any paper. Entities
+are ranked in batches, as one power iteration over a (nodes, batch) matrix of
+scores, so each pass over the citation matrix serves the whole batch.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, Iterable
+import os
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from geniepy.datamgmt.citegraph import CITES, CitationGraph
+
+DEFAULT_DAMPING = 0.85
+"""Probability of following a citation instead of jumping to a random article."""
+DEFAULT_TOLERANCE = 1e-6
+"""L1 norm of the change of the score vector between iterations at convergence."""
+DEFAULT_MAX_ITER = 100
+DEFAULT_RTOL = 0.01
+"""Relative change of an article's score worth writing back."""
+SCORES_FILE = "pagerank.npy"
+"""Scores of the last ranking, saved in the citation graph store directory."""
+DELTA_FILE = "pagerank.delta.npy"
+"""Citations added to the ranking since the citation graph store was built."""
+DEFAULT_TOP_K = 50
+"""Papers stored per entity, paper links shown for a gene or disease."""
+DEFAULT_BATCH_SIZE = 16
+"""
+Entities ranked per power iteration. Each takes a column in the 3 dense score
+matrices of nodes x batch (scores, next scores and scores divided by out
+degrees), and in the products of the SpMV row blocks running at once.
+"""
+MESH_PREFIX = "MESH:"
+"""Prefix of Pubtator disease IDs, stored without it in CTD relationships."""
+
+PageRankResult = namedtuple("PageRankResult", "scores iterations residual converged")
+"""Scores of power iteration, with number of iterations and last L1 residual."""
+
+
+class PageRank:
+    """
+    Power iteration PageRank over a CSR citation graph.
+
+    Only articles with at least one citation in either direction take part in
+    the ranking, all other rows (i.e. unused PMIDs) keep a score of 0 unless
+    the personalization (teleport) vector favors them. The mass of dangling
+    articles, which cite nothing, is redistributed following teleport.
+    """
+
+    # pylint: disable=bad-continuation, too-many-arguments
+    def __init__(
+        self,
+        offsets: np.ndarray,
+        indices: np.ndarray,
+        out_degrees: np.ndarray = None,
+        damping: float = DEFAULT_DAMPING,
+        tol: float = DEFAULT_TOLERANCE,
+        max_iter: int = DEFAULT_MAX_ITER,
+        dtype=np.float32,
+        threads: int = None,
+    ):
+        """
+        Build transition matrix of graph.
+
+        Arguments:
+            offsets {np.ndarray} -- cited-by CSR offsets, length nodes + 1
+            indices {np.ndarray} -- cited-by CSR indices, the citing PMIDs
+
+        Keyword Arguments:
+            out_degrees {np.ndarray} -- number of articles cited by each node,
+                                        counted from indices if None
+            damping {float} -- probability of following a citation
+            tol {float} -- L1 convergence tolerance
+            max_iter {int} -- maximum number of iterations
+            dtype -- np.float32 or np.float64 scores and weights
+            threads {int} -- SpMV threads, number of CPUs if None
+        """
+        num_nodes = len(offsets) - 1
+        if out_degrees is None:
+            out_degrees = np.bincount(indices, minlength=num_nodes)
+        self._damping = damping
+        self._tol = tol
+        self._max_iter = max_iter
+        self._dtype = np.dtype(dtype)
+        self._threads = max(threads or os.cpu_count() or 1, 1)
+        self._in_degrees = np.diff(offsets).astype(np.int64)
+        self._out_degrees = np.zeros(num_nodes, dtype=np.int64)
+        self._out_degrees[:] = out_degrees[:num_nodes]
+        # Citation matrix, scores are divided by the out degrees before each
+        # product, so citation deltas don't change the weights of the matrix
+        self._matrix = sp.csr_matrix(
+            (np.ones(len(indices), dtype=self._dtype), indices, offsets),
+            shape=(num_nodes, num_nodes),
+        )
+        self._delta = None
+        self._blocks = self._split_rows(self._matrix, self._threads)
+        self._executor = None
+        self._scaled = None
+        self._update_degrees()
+
+    @classmethod
+    def from_graph(cls, graph: CitationGraph, **kwargs) -> "PageRank":
+        """Build PageRank of citation graph store, see constructor for kwargs."""
+        offsets, indices = graph.csr()
+        return cls(offsets, indices, graph.degrees(CITES), **kwargs)
+
+    @staticmethod
+    def _split_rows(matrix: sp.csr_matrix, parts: int) -> [tuple]:
+        """Split matrix in row blocks of about the same number of edges."""
+        indptr = matrix.indptr
+        targets = np.linspace(0, matrix.nnz, parts + 1)[1:-1]
+        bounds = np.unique(np.r_[0, np.searchsorted(indptr, targets), matrix.shape[0]])
+        blocks = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            start, end = indptr[first], indptr[last]
+            # Slices of indices and data are views, only indptr is rebased
+            block = sp.csr_matrix(
+                (
+                    matrix.data[start:end],
+                    matrix.indices[start:end],
+                    indptr[first : last + 1] - start,
+                ),
+                shape=(last - first, matrix.shape[1]),
+            )
+            blocks.append((first, last, block))
+        return blocks
+
+    def _update_degrees(self):
+        """Derive ranked, dangling and inverse out degrees from degrees."""
+        self._active = (self._in_degrees > 0) | (self._out_degrees > 0)
+        self._dangling = (self._out_degrees == 0).astype(self._dtype)
+        self._inverse = np.zeros(len(self._out_degrees), dtype=self._dtype)
+        np.divide(1, self._out_degrees, out=self._inverse, where=self._out_degrees > 0)
+
+    def _resize(self, num_nodes: int):
+        """Grow graph to num_nodes rows, i.e. new PMIDs of citation deltas."""
+        grow = num_nodes - self.num_nodes
+        if grow <= 0:
+            return
+        indptr = self._matrix.indptr
+        indptr = np.concatenate((indptr, np.full(grow, indptr[-1], indptr.dtype)))
+        self._matrix = sp.csr_matrix(
+            (self._matrix.data, self._matrix.indices, indptr),
+            shape=(num_nodes, num_nodes),
+        )
+        self._blocks = self._split_rows(self._matrix, self._threads)
+        if self._delta is not None:
+            self._delta.resize((num_nodes, num_nodes))
+        padding = np.zeros(grow, dtype=np.int64)
+        self._in_degrees = np.concatenate((self._in_degrees, padding))
+        self._out_degrees = np.concatenate((self._out_degrees, padding))
+
+    def apply_delta(self, added: np.ndarray = (), removed: np.ndarray = ()):
+        """
+        Add and remove citations, without rebuilding the citation matrix.
+
+        Citation deltas are kept in a small sparse matrix added to each
+        product, and the out degrees of the citing articles are updated.
+
+        Keyword Arguments:
+            added {np.ndarray} -- (cited, citing) PMID pairs of new citations
+            removed {np.ndarray} -- (cited, citing) PMID pairs of citations
+                                    in the graph that were withdrawn
+        """
+        added = np.asarray(added, dtype=np.int64).reshape(-1, 2)
+        removed = np.asarray(removed, dtype=np.int64).reshape(-1, 2)
+        edges = np.concatenate((added, removed))
+        if not len(edges):
+            return
+        self._resize(int(edges.max()) + 1)
+        signs = np.concatenate((np.ones(len(added)), -np.ones(len(removed))))
+        num_nodes = self.num_nodes
+        self._in_degrees += np.bincount(
+            edges[:, 0], weights=signs, minlength=num_nodes
+        ).astype(np.int64)
+        self._out_degrees += np.bincount(
+            edges[:, 1], weights=signs, minlength=num_nodes
+        ).astype(np.int64)
+        delta = sp.csr_matrix(
+            (signs.astype(self._dtype), (edges[:, 0], edges[:, 1])),
+            shape=(num_nodes, num_nodes),
+        )
+        self._delta = delta if self._delta is None else self._delta + delta
+        self._update_degrees()
+
+    @property
+    def num_nodes(self) -> int:
+        """Number of rows of the graph, including unused PMIDs."""
+        return self._matrix.shape[0]
+
+    @property
+    def active(self) -> np.ndarray:
+        """Mask of ranked articles."""
+        return self._active
+
+    @property
+    def in_degrees(self) -> np.ndarray:
+        """Citation counts, deltas included."""
+        return self._in_degrees
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Dtype of scores."""
+        return self._dtype
+
+    def uniform(self) -> np.ndarray:
+        """Uniform distribution over ranked articles."""
+        vector = self._active.astype(self._dtype)
+        return vector / max(vector.sum(), 1)
+
+    def warm_start(self, scores: np.ndarray) -> np.ndarray:
+        """
+        Starting scores from the scores of a previous ranking.
+
+        Articles new to the ranking start from the uniform score, articles no
+        longer ranked from 0, and scores are normalized to sum to 1.
+        """
+        x = np.zeros(self.num_nodes, dtype=np.float64)
+        size = min(len(scores), self.num_nodes)
+        x[:size] = scores[:size]
+        x[~self._active] = 0
+        new = self._active & (x == 0)
+        x[new] = 1 / max(np.count_nonzero(self._active), 1)
+        return (x / max(x.sum(), np.finfo(np.float64).tiny)).astype(self._dtype)
+
+    def spmv(self, x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Multiply transition matrix by x, one row block per thread.
+
+        Arguments:
+            x {np.ndarray} -- vector of length nodes, or (nodes, k) matrix
+
+        Keyword Arguments:
+            out {np.ndarray} -- output array, allocated if None
+
+        Returns:
+            np.ndarray -- matrix product
+        """
+        if out is None:
+            out = np.empty(x.shape, dtype=self._dtype)
+        inverse = self._inverse if x.ndim == 1 else self._inverse[:, None]
+        # Scaled scores reuse the buffer of the previous product
+        if self._scaled is None or self._scaled.shape != x.shape:
+            self._scaled = np.empty(x.shape, dtype=self._dtype)
+        x = np.multiply(x, inverse, out=self._scaled)
+        if len(self._blocks) <= 1:
+            out[...] = self._matrix @ x
+        else:
+
+            def multiply(block: tuple):
+                first, last, matrix = block
+                out[first:last] = matrix @ x
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(len(self._blocks))
+            list(self._executor.map(multiply, self._blocks))
+        if self._delta is not None:
+            out += self._delta @ x
+        return out
+
+    def iterate(self, x: np.ndarray, teleport: np.ndarray, out: np.ndarray = None):
+        """
+        Compute one power iteration step.
+
+        Citations are followed with probability damping, otherwise (and from
+        dangling articles) scores jump following the teleport distribution.
+
+        Arguments:
+            x {np.ndarray} -- current scores, vector or (nodes, k) matrix
+            teleport {np.ndarray} -- teleport distribution(s), same shape as x,
+                                     or sparse (nodes, k) matrix
+
+        Keyword Arguments:
+            out {np.ndarray} -- output array, allocated if None
+
+        Returns:
+            np.ndarray -- next scores
+        """
+        dangling_mass = self._dangling @ x
+        out = self.spmv(x, out)
+        out *= self._damping
+        jump = (self._damping * dangling_mass + (1 - self._damping)).astype(
+            self._dtype
+        )
+        if sp.issparse(teleport):
+            # Only seed papers jump, without a dense teleport matrix
+            teleport = teleport.tocoo()
+            out[teleport.row, teleport.col] += teleport.data * jump[teleport.col]
+        else:
+            out += teleport * jump
+        return out
+
+    def run(self, teleport: np.ndarray = None, x0: np.ndarray = None) -> PageRankResult:
+        """
+        Iterate until the L1 change of scores falls below tolerance.
+
+        Keyword Arguments:
+            teleport {np.ndarray} -- teleport distribution, uniform over ranked
+                                     articles if None, or sparse (nodes, k)
+                                     matrix of k distributions
+            x0 {np.ndarray} -- starting scores (warm start), teleport if None
+
+        Returns:
+            PageRankResult -- scores summing to 1, iterations and residual
+        """
+        if teleport is None:
+            teleport = self.uniform()
+        if sp.issparse(teleport):
+            teleport = sp.coo_matrix(teleport, dtype=self._dtype)
+            teleport.sum_duplicates()
+        else:
+            teleport = np.asarray(teleport, dtype=self._dtype)
+        if x0 is not None:
+            x = np.array(x0, dtype=self._dtype)
+        elif sp.issparse(teleport):
+            x = np.zeros(teleport.shape, dtype=self._dtype)
+            x[teleport.row, teleport.col] = teleport.data
+        else:
+            x = teleport.copy()
+        y = np.empty_like(x)
+        residual = np.inf
+        iterations = 0
+        try:
+            while iterations < self._max_iter:
+                self.iterate(x, teleport, out=y)
+                iterations += 1
+                # Previous scores are overwritten by the next iteration
+                np.subtract(y, x, out=x)
+                residual = np.abs(x, out=x).sum(axis=0, dtype=np.float64).max()
+                x, y = y, x
+                if residual < self._tol:
+                    break
+        finally:
+            self.close()
+            self._scaled = None
+        return PageRankResult(x, iterations, float(residual), residual < self._tol)
+
+    def close(self):
+        """Stop SpMV threads, restarted by the next product."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def pagerank(graph: CitationGraph, **kwargs) -> PageRankResult:
+    """
+    Rank articles of citation graph store.
+
+    Arguments:
+        graph {CitationGraph} -- citation graph store
+
+    Keyword Arguments:
+        see PageRank constructor
+
+    Returns:
+        PageRankResult -- scores indexed by PMID, summing to 1
+    """
+    return PageRank.from_graph(graph, **kwargs).run()
+
+
+# pylint: disable=bad-continuation
+def rerank(
+    graph: CitationGraph,
+    previous: np.ndarray,
+    added: np.ndarray = (),
+    removed: np.ndarray = (),
+    **kwargs,
+) -> PageRankResult:
+    """
+    Update ranking of citation graph store with citations changed since.
+
+    Arguments:
+        graph {CitationGraph} -- citation graph store
+        previous {np.ndarray} -- scores of the previous ranking
+
+    Keyword Arguments:
+        added {np.ndarray} -- (cited, citing) PMID pairs not in the store
+        removed {np.ndarray} -- (cited, citing) PMID pairs removed from store
+        see PageRank constructor for other kwargs
+
+    Returns:
+        PageRankResult -- scores of the updated graph, summing to 1
+    """
+    ranker = PageRank.from_graph(graph, **kwargs)
+    ranker.apply_delta(added, removed)
+    return ranker.run(x0=ranker.warm_start(previous))
+
+
+def seed_matrix(
+    chunks: Iterable[pd.DataFrame], column: str, num_nodes: int, prefix: str = ""
+) -> (np.ndarray, sp.csr_matrix):
+    """
+    Incidence matrix of the papers annotated with each entity.
+
+    Entities with several IDs separated by ';' (e.g. Pubtator genes) seed
+    each of their IDs, PMIDs outside the graph are ignored.
+
+    Arguments:
+        chunks {Iterable[pd.DataFrame]} -- Pubtator chunks with a PMID column
+        column {str} -- entity column, e.g. GeneID or DiseaseID
+        num_nodes {int} -- number of rows of the citation graph
+
+    Keyword Arguments:
+        prefix {str} -- prefix removed from IDs, e.g. MESH_PREFIX for diseases
+
+    Returns:
+        (np.ndarray, sp.csr_matrix) -- entity IDs, and (entities, nodes) matrix
+                                       of ones where entities annotate papers
+    """
+    entities = []
+    pmids = []
+    for chunk in chunks:
+        chunk = chunk[["PMID", column]].dropna()
+        chunk = chunk.assign(**{column: chunk[column].astype(str).str.split(";")})
+        chunk = chunk.explode(column)
+        if prefix:
+            ids = chunk[column]
+            prefixed = ids.str.startswith(prefix)
+            chunk[column] = ids.where(~prefixed, ids.str[len(prefix) :])
+        chunk_pmids = pd.to_numeric(chunk["PMID"], errors="coerce")
+        in_graph = ((chunk_pmids >= 0) & (chunk_pmids < num_nodes)).to_numpy()
+        entities.append(chunk[column].to_numpy()[in_graph])
+        pmids.append(chunk_pmids.to_numpy()[in_graph].astype(np.int64))
+    if not entities:
+        return np.array([], dtype=object), sp.csr_matrix((0, num_nodes))
+    codes, uniques = pd.factorize(np.concatenate(entities))
+    pmids = np.concatenate(pmids)
+    seeds = sp.csr_matrix(
+        (np.ones(len(codes), dtype=np.float32), (codes, pmids)),
+        shape=(len(uniques), num_nodes),
+    )
+    # Papers annotated several times with an entity are seeded once
+    seeds.sum_duplicates()
+    seeds.data[:] = 1
+    return np.asarray(uniques, dtype=object), seeds
+
+
+# pylint: disable=bad-continuation
+def top_papers(
+    ranker: PageRank,
+    entities: np.ndarray,
+    seeds: sp.csr_matrix,
+    top_k: int = DEFAULT_TOP_K,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Generator[tuple, None, None]:
+    """
+    Rank papers of each entity with personalized PageRank.
+
+    Each entity teleports uniformly to its seed papers, batches of entities
+    are ranked together by multi-vector power iteration.
+
+    Arguments:
+        ranker {PageRank} -- PageRank of the citation graph
+        entities {np.ndarray} -- entity IDs, see seed_matrix
+        seeds {sp.csr_matrix} -- (entities, nodes) seed papers of entities
+
+    Keyword Arguments:
+        top_k {int} -- number of papers kept per entity
+        batch_size {int} -- number of entities per power iteration
+
+    Returns:
+        Generator[tuple] -- (entity, PMIDs, scores) of each entity with seeds,
+                            by descending score
+    """
+    sizes = np.asarray(seeds.sum(axis=1)).ravel()
+    seeded = np.flatnonzero(sizes)
+    for first in range(0, len(seeded), max(batch_size, 1)):
+        batch = seeded[first : first + batch_size]
+        # Teleport stays sparse, only seed papers have a jump probability
+        teleport = seeds[batch].multiply(1 / sizes[batch][:, None]).T
+        scores = ranker.run(teleport=teleport).scores
+        size = min(top_k, len(scores))
+        for column, entity in enumerate(entities[batch]):
+            column_scores = scores[:, column]
+            top = np.argpartition(column_scores, len(column_scores) - size)[-size:]
+            top = top[np.argsort(-column_scores[top], kind="stable")]
+            top_scores = column_scores[top]
+            ranked = top_scores > 0
+            yield entity, top[ranked], top_scores[ranked]
+
+
+def write_top_papers(path: str, ranked: Iterable[tuple]) -> int:
+    """
+    Write ranked papers of entities as csv rows entity,pmid,score.
+
+    Arguments:
+        path {str} -- top papers file
+        ranked {Iterable[tuple]} -- (entity, PMIDs, scores), see top_papers
+
+    Returns:
+        int -- number of entities written
+    """
+    count = 0
+    tmp_path = os.path.join(os.path.dirname(path) or ".", "." + os.path.basename(path))
+    with open(tmp_path, "w") as top_file:
+        for entity, pmids, scores in ranked:
+            for pmid, score in zip(pmids, scores):
+                top_file.write(f"{entity},{pmid},{score:.6e}\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def changed_rows(
+    previous: np.ndarray, scores: np.ndarray, rtol: float = DEFAULT_RTOL
+) -> np.ndarray:
+    """
+    PMIDs whose score changed materially between two rankings.
+
+    Scores are compared scaled by their number of ranked articles, like the
+    written rankings, so new articles alone don't change every row.
+
+    Arguments:
+        previous {np.ndarray} -- scores of the previous ranking
+        scores {np.ndarray} -- scores of the new ranking
+
+    Keyword Arguments:
+        rtol {float} -- relative change of scaled scores
+
+    Returns:
+        np.ndarray -- sorted PMIDs, including articles ranked or unranked since
+    """
+    before = np.zeros(max(len(previous), len(scores)), dtype=np.float64)
+    after = np.zeros(len(before), dtype=np.float64)
+    before[: len(previous)] = previous
+    after[: len(scores)] = scores
+    before *= np.count_nonzero(before)
+    after *= np.count_nonzero(after)
+    changed = np.abs(after - before) > rtol * np.maximum(before, after)
+    changed |= (before > 0) != (after > 0)
+    return np.flatnonzero(changed)
+
+
+def save_scores(path: str, scores: np.ndarray):
+    """Save scores as .npy, to warm start the next ranking."""
+    tmp_path = os.path.join(os.path.dirname(path) or ".", "." + os.path.basename(path))
+    with open(tmp_path, "wb") as scores_file:
+        np.save(scores_file, scores)
+    os.replace(tmp_path, path)
+
+
+def load_scores(path: str) -> np.ndarray:
+    """Load scores saved by save_scores."""
+    return np.load(path)
+
+
+# pylint: disable=bad-continuation
+def write_rankings(
+    path: str, scores: np.ndarray, citations: np.ndarray, pmids: np.ndarray = None
+) -> int:
+    """
+    Write ranked articles as csv, by descending score.
+
+    Rows are pmid,score,citation count like article_rank/ranker rankings, with
+    scores scaled so the average ranked article scores 1.
+
+    Arguments:
+        path {str} -- rankings file
+        scores {np.ndarray} -- scores indexed by PMID
+        citations {np.ndarray} -- citation counts indexed by PMID, see
+                                  CitationGraph.degrees or PageRank.in_degrees
+
+    Keyword Arguments:
+        pmids {np.ndarray} -- only write these rows (e.g. changed_rows), all
+                              ranked articles if None
+
+    Returns:
+        int -- number of rows written
+    """
+    ranked = np.count_nonzero(scores > 0)
+    if pmids is None:
+        pmids = np.flatnonzero(scores > 0)
+    pmids = np.asarray(pmids, dtype=np.int64)
+    pmids = pmids[np.argsort(-scores[pmids], kind="stable")]
+    scaled = scores[pmids].astype(np.float64) * ranked
+    tmp_path = os.path.join(os.path.dirname(path) or ".", "." + os.path.basename(path))
+    with open(tmp_path, "w") as rankings:
+        for pmid, score, count in zip(pmids, scaled, citations[pmids]):
+            rankings.write(f"{pmid},{score:.6f},{count}\n")
+    os.replace(tmp_path, path)
+    return len(pmids)
@@ -0,0 +1,71 @@
+"""
+Module to rank PubMed articles with PageRank over the citation graph store.
+
+Replaces front-end/article_rank/ranker: the rankings file has the same
+pmid,score,citation count rows, sorted by descending score, and can be loaded
+with front-end/article_rank/load_pubmed_ranks.py. Scores are saved in the graph
+directory, to update the rankings with scripts/article_rerank.py.
+"""
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
+from datetime import datetime
+import os
+import sys
+import numpy as np
+from geniepy.datamgmt.citegraph import CitationGraph
+from geniepy.ranking import (
+    PageRank,
+    save_scores,
+    write_rankings,
+    DEFAULT_DAMPING,
+    SCORES_FILE,
+)
+
+
+def main(GraphDir, OutputFile, Damping):
+    graph = CitationGraph(GraphDir)
+    print(f"Graph: {graph.num_edges} citations, max PMID {graph.num_nodes - 1}")
+    result = PageRank.from_graph(graph, damping=Damping, dtype=np.float64).run()
+    print(
+        f"PageRank: {result.iterations} iterations, residual {result.residual:.1e}, "
+        f"converged: {result.converged}"
+    )
+    ranked = write_rankings(OutputFile, result.scores, graph.degrees())
+    save_scores(os.path.join(GraphDir, SCORES_FILE), result.scores)
+    print(f"Output: {ranked} ranked articles saved in file: {OutputFile}")
+
+
+if __name__ == "__main__":  # noqa
+    ERROR_MSG = """Command line arguments expected:
+    <Citation graph store directory (ex: ./data/graph)>,
+    <Output rankings file (ex: ./data/rankings)>,
+    [Damping factor (ex: 0.85)]"""
+
+    if not sys.argv or len(sys.argv) < 3:
+        raise ValueError(ERROR_MSG)
+
+    # check command line argument for graph store directory
+    _graph_dir = sys.argv[1]
+    if not os.path.isdir(_graph_dir):
+        raise ValueError(f"Citation graph directory is not valid. {ERROR_MSG}")
+
+    # check command line argument for output file directory
+    _out_file = sys.argv[2]
+    if not os.path.isdir(os.path.dirname(os.path.abspath(_out_file))):
+        raise ValueError(f"Output directory is not valid. {ERROR_MSG}")
+
+    # check optional command line argument for damping factor
+    _damping = DEFAULT_DAMPING
+    if len(sys.argv) > 3:
+        try:
+            _damping = float(sys.argv[3])
+        except Exception:
+            raise ValueError(f"Damping factor is not valid. {ERROR_MSG}")
+        if not 0 < _damping < 1:
+            raise ValueError(f"Damping factor should be between 0 and 1. {ERROR_MSG}")
+
+    start_time = datetime.now()
+    main(_graph_dir, _out_file, _damping)
+
+    tot_time = datetime.now() - start_time
+    print(f"Ranked articles in {round(tot_time.total_seconds()/60,2)} minutes")
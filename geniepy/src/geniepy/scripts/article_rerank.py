@@ -0,0 +1,83 @@
+"""
+Module to update PubMed article rankings with new citations.
+
+Citations of the csv missing from the citation graph store are added to the
+store's delta file, PageRank is warm started from the scores saved by
+scripts/article_rank.py (or the last update) and only rows whose score or
+citation count changed are written, to be loaded with
+front-end/article_rank/load_pubmed_ranks.py --update. Rebuild the store and
+rerun article_rank.py once the delta grows large.
+"""
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
+from datetime import datetime
+import os
+import sys
+import numpy as np
+from geniepy.datamgmt.citegraph import CitationGraph, iter_citations_csv
+from geniepy.ranking import (
+    PageRank,
+    changed_rows,
+    load_scores,
+    save_scores,
+    write_rankings,
+    DELTA_FILE,
+    SCORES_FILE,
+)
+
+
+def main(GraphDir, CitationsFile, OutputFile):
+    graph = CitationGraph(GraphDir)
+    scores_path = os.path.join(GraphDir, SCORES_FILE)
+    delta_path = os.path.join(GraphDir, DELTA_FILE)
+    previous = load_scores(scores_path)
+    delta = np.zeros((0, 2), dtype=np.int64)
+    if os.path.isfile(delta_path):
+        delta = np.load(delta_path)
+    added = graph.new_citations(iter_citations_csv(CitationsFile))
+    delta = np.unique(np.concatenate((delta, added)), axis=0)
+    print(f"Delta: {len(delta)} citations not in graph, {len(added)} in csv")
+    ranker = PageRank.from_graph(graph, dtype=np.float64)
+    ranker.apply_delta(delta)
+    result = ranker.run(x0=ranker.warm_start(previous))
+    print(
+        f"PageRank: {result.iterations} iterations, residual {result.residual:.1e}, "
+        f"converged: {result.converged}"
+    )
+    # Rows of changed scores, and of citation counts changed by the csv
+    pmids = np.union1d(changed_rows(previous, result.scores), added[:, 0])
+    written = write_rankings(OutputFile, result.scores, ranker.in_degrees, pmids)
+    np.save(delta_path, delta)
+    save_scores(scores_path, result.scores)
+    print(f"Output: {written} changed articles saved in file: {OutputFile}")
+
+
+if __name__ == "__main__":  # noqa
+    ERROR_MSG = """Command line arguments expected:
+    <Citation graph store directory (ex: ./data/graph)>,
+    <Citations csv file (ex: ./data/citations.csv)>,
+    <Output changed rankings file (ex: ./data/rankings)>"""
+
+    if not sys.argv or len(sys.argv) < 4:
+        raise ValueError(ERROR_MSG)
+
+    # check command line argument for graph store directory
+    _graph_dir = sys.argv[1]
+    if not os.path.isfile(os.path.join(_graph_dir, SCORES_FILE)):
+        raise ValueError(f"Graph directory has no scores to update. {ERROR_MSG}")
+
+    # check command line argument for citations file
+    _citations_file = sys.argv[2]
+    if not os.path.isfile(_citations_file):
+        raise ValueError(f"Citations file is not valid. {ERROR_MSG}")
+
+    # check command line argument for output file directory
+    _out_file = sys.argv[3]
+    if not os.path.isdir(os.path.dirname(os.path.abspath(_out_file))):
+        raise ValueError(f"Output directory is not valid. {ERROR_MSG}")
+
+    start_time = datetime.now()
+    main(_graph_dir, _citations_file, _out_file)
+
+    tot_time = datetime.now() - start_time
+    print(f"Updated rankings in {round(tot_time.total_seconds()/60,2)} minutes")
@@ -1,170 +1,52 @@
 """
 Module to extract citation metadata for a given range of PubMed articles.
 
-This script depends upon Google cloud function to scale-up the extraction process.
-Make sure the Google cloud functions are deployed and available before running
-this script. (See: citation_cloud_function.py)
+Citations are requested straight from the E-utilities elink endpoint by an
+asyncio client, which keeps many batched requests in flight over one
+keep-alive session from a single process. Each window of PMIDs is written to
+its own CSV file in the output directory as soon as it completes, and is
+checkpointed, so running the script again resumes where it stopped.
 """
-from concurrent.futures import ProcessPoolExecutor
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
 from datetime import datetime
-from random import randint
-import json
 import os
 import sys
-import time
-import requests
+from geniepy.datamgmt.backfill import BackfillCheckpoint, CitationBackfill
+from geniepy.datamgmt.citations import AsyncCitationClient
+from geniepy.datamgmt.scrapers import PubMedScraper
 
 # Constants
 _MIN_PUBMED_ID = 1
 _MAX_PUBMED_ID = 40000000
-_CHUNK_SIZE = 10
-_CSV_SEPRATOR = "|"
-
-
-# Google Cloud Functions - to scale-up data extraction
-CLOUD_FN_1 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_1"
-)
-CLOUD_FN_2 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_2"
-)
-CLOUD_FN_3 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_3"
-)
-CLOUD_FN_4 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_4"
-)
-CLOUD_FN_5 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_5"
-)
-CLOUD_FN_6 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_6"
-)
-CLOUD_FN_7 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_7"
-)
-CLOUD_FN_8 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_8"
-)
-CLOUD_FN_9 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_9"
-)
-CLOUD_FN_10 = (
-    "https://us-central1-csci-e-599-trend-detection.cloudfunctions.net/get_citation_10"
-)
-
-citation_dict = {}
-
-
-def generate_ID_List(StartID, EndID):
-    id_list = list(range(StartID, EndID + 1))
-    chucked_id_list = [
-        id_list[i * _CHUNK_SIZE : (i + 1) * _CHUNK_SIZE]  # noqa
-        for i in range((len(id_list) + _CHUNK_SIZE - 1) // _CHUNK_SIZE)
-    ]
-    return chucked_id_list
-
-
-def get_random_fn():
-    # pick a random number between 1 and 5
-    num = randint(1, 10)
-
-    # return a randomly selected cloud function
-    if num == 1:
-        return CLOUD_FN_1
-    elif num == 2:
-        return CLOUD_FN_2
-    elif num == 3:
-        return CLOUD_FN_3
-    elif num == 4:
-        return CLOUD_FN_4
-    elif num == 5:
-        return CLOUD_FN_5
-    elif num == 6:
-        return CLOUD_FN_6
-    elif num == 7:
-        return CLOUD_FN_7
-    elif num == 8:
-        return CLOUD_FN_8
-    elif num == 9:
-        return CLOUD_FN_9
-    else:
-        return CLOUD_FN_10
-
-
-def get_citation(IDList):
-    ids_str = ",".join([str(elem) for elem in IDList])
-    print(f"PID {os.getpid()}: Process Articles: {ids_str}")
-
-    # construct api
-    api_headers = {"content-type": "application/json"}
-    api_body = {"pubmed_ids": ids_str}
-
-    # call api - loop untill sucessful
-    success = False
-    while not success:
-        cloud_fn = get_random_fn()
-        try:
-            req = requests.post(
-                url=cloud_fn,
-                data=json.dumps(api_body),
-                headers=api_headers,
-                timeout=(2, 5),
-            )
-            if req.status_code == 200:
-                return req.text
-        except Exception:
-            """ if request fails or timeout, wait sometime and try again
-            with another randomly selected cloud function """
-            time.sleep(2)
-
-
-def check_zero_citations(citationList):
-    if not citationList or len(citationList) <= 0 or citationList == ["0"]:
-        return True
-
-    return False
-
-
-def write_output(citation_dict, OutputDir):
-    out_file = f"output-{datetime.now().microsecond}.csv"
-    out_path = os.path.join(OutputDir, out_file)
-    with open(out_path, "w") as file:
-        file.write(
-            "article_id"
-            + _CSV_SEPRATOR
-            + "cited_count"
-            + _CSV_SEPRATOR
-            + "cited_by_id"
-            + "\n"
-        )
-        for key in citation_dict:
-            if not check_zero_citations(citation_dict[key]):
-                file.write(
-                    key
-                    + _CSV_SEPRATOR
-                    + str(len(citation_dict[key]))
-                    + _CSV_SEPRATOR
-                    + ",".join(citation_dict[key])
-                    + "\n"
-                )
-        print(
-            f"Output: Citation data for {len(citation_dict)} \
-PubMed Articles saved in file: {out_path}"
-        )
-
-
-def main(IDList, MaxWorkers, OutputDir):
-    # start parallel processing
-    with ProcessPoolExecutor(max_workers=MaxWorkers) as executor:
-        result = executor.map(get_citation, IDList)
-
-    # join parallel processing results
-    for value in result:
-        citation_dict.update(json.loads(value))
-
-    # write json output
-    write_output(citation_dict, OutputDir)
+_CHUNK_SIZE = 200
+_WINDOW_SIZE = 10000
+_MIN_IN_FLIGHT = 1
+_MAX_IN_FLIGHT = 256
+_CHECKPOINT_FILE = "backfill.db"
+
+
+def main(StartID, EndID, MaxInFlight, OutputDir):
+    client = AsyncCitationClient(
+        api_keys=PubMedScraper.API_KEYS,
+        batch_size=_CHUNK_SIZE,
+        max_in_flight=MaxInFlight,
+    )
+    checkpoint = BackfillCheckpoint(os.path.join(OutputDir, _CHECKPOINT_FILE))
+    backfill = CitationBackfill(
+        client, checkpoint, output_dir=OutputDir, window_size=_WINDOW_SIZE
+    )
+    try:
+        # fetch citations concurrently, writing each window when it completes
+        completed = backfill.run(StartID, EndID)
+        left = len(backfill.pending(StartID, EndID))
+    finally:
+        checkpoint.close()
+    print(f"Requests: {client.scheduler.report()}")
+    print(
+        f"Output: {completed} windows of citation data saved in: {OutputDir}, "
+        f"{left} windows left"
+    )
 
 
 if __name__ == "__main__":  # noqa
@@ -172,13 +54,13 @@ if __name__ == "__main__":  # noqa
     # command line arguments
     _start_id = 0
     _end_id = 0
-    _max_workers = 0
+    _max_in_flight = 0
     _out_dir = ""
 
     ERROR_MSG = """Command line arguments expected:
     <Start PubMed ID (ex: 1001)>,
     <End PubMed ID (ex: 1999)>,
-    <Number of Parallel Processes (ex: 2-16)>
+    <Number of Concurrent Requests (ex: 1-256)>
     <Output Directory (ex: ./data/)"""
 
     # check number if command line arguments
@@ -216,16 +98,17 @@ and {_MAX_PUBMED_ID-1}.  {ERROR_MSG}"
             f"End PubMed ID should be greater than Start PubMed ID. {ERROR_MSG}"
         )
 
-    # check command line argument for Parallel Workers
+    # check command line argument for Concurrent Requests
     try:
-        _max_workers = int(sys.argv[3])
+        _max_in_flight = int(sys.argv[3])
     except Exception:
-        raise ValueError(f"Number of parallel workers is not valid. {ERROR_MSG}")
+        raise ValueError(f"Number of concurrent requests is not valid. {ERROR_MSG}")
 
-    # check command line argument for Parallel Workers is between 2 and 16
-    if _max_workers < 2 or _max_workers > 16:
+    # check command line argument for Concurrent Requests is within limits
+    if _max_in_flight < _MIN_IN_FLIGHT or _max_in_flight > _MAX_IN_FLIGHT:
         raise ValueError(
-            f"Number of parallel workers should be between 2 and 16. {ERROR_MSG}"
+            f"Number of concurrent requests should be between {_MIN_IN_FLIGHT} \
+and {_MAX_IN_FLIGHT}. {ERROR_MSG}"
         )
 
     # check command line argument for Output Directory is valid
@@ -234,7 +117,7 @@ and {_MAX_PUBMED_ID-1}.  {ERROR_MSG}"
         raise ValueError(f"Output data directory is not valid. {ERROR_MSG}")
 
     start_time = datetime.now()
-    main(generate_ID_List(_start_id, _end_id), _max_workers, _out_dir)
+    main(_start_id, _end_id, _max_in_flight, _out_dir)
 
     tot_time = datetime.now() - start_time
     print(
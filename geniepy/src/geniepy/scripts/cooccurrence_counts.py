@@ -0,0 +1,117 @@
+"""
+Module to count gene-disease co-occurrences per year from local files.
+
+Pubtator gene and disease annotations are read from the downloaded Pubtator
+files and publication years from the PubMed parquet dataset written by
+pubmed_historical.py, so the counts are computed out of core without reading
+the tables back from the warehouse. Disease IDs are counted without their
+'MESH:' prefix, like the mesh_id of CTD relationships. Counts are saved as
+gene_id,disease_id,year,pub_count,pub_cum_count csv rows.
+"""
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
+from datetime import datetime
+from pathlib import Path
+import os
+import sys
+import pandas as pd
+import geniepy.config as config
+from geniepy.datamgmt.cooccurrence import CooccurrenceEngine, COUNTS_COLUMNS
+from geniepy.datamgmt.scrapers import PubtatorDiseaseScraper, PubtatorGeneScraper
+from geniepy.ranking import MESH_PREFIX
+
+CHUNKSIZE = 1000000
+DEFAULT_WORK_DIR = "~/.geniepy.d/cooccurrence"
+
+
+def read_pubtator(PubtatorFile, Scraper):
+    return pd.read_csv(PubtatorFile, chunksize=CHUNKSIZE, **Scraper.read_options())
+
+
+def read_years(PubmedDir):
+    """pmid and date_completed chunks of the parquet dataset's row groups."""
+    # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet as pq
+
+    for path in sorted(Path(PubmedDir).glob("**/*.parquet")):
+        if path.name.startswith("."):
+            # Partial file of an unfinished conversion
+            continue
+        parquet_file = pq.ParquetFile(path)
+        for group in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(
+                group, columns=["pmid", "date_completed"]
+            )
+            yield table.to_pandas()
+
+
+def get_work_dir():
+    try:
+        return config.get_cooccurrence_dir()
+    except Exception as e:
+        print(f"Work directory not configured ({e}), using {DEFAULT_WORK_DIR}")
+        return DEFAULT_WORK_DIR
+
+
+def main(GeneFile, DiseaseFile, PubmedDir, OutputFile):
+    engine = CooccurrenceEngine(get_work_dir())
+    tmp_path = os.path.join(
+        os.path.dirname(OutputFile) or ".", "." + os.path.basename(OutputFile)
+    )
+    try:
+        genes = engine.add_genes(
+            read_pubtator(GeneFile, PubtatorGeneScraper),
+            PubtatorGeneScraper.ENTITY_COLUMN,
+        )
+        print(f"Genes: {genes} annotations of {engine.num_genes} genes")
+        diseases = engine.add_diseases(
+            read_pubtator(DiseaseFile, PubtatorDiseaseScraper),
+            PubtatorDiseaseScraper.ENTITY_COLUMN,
+            prefix=MESH_PREFIX,
+        )
+        print(f"Diseases: {diseases} annotations of {engine.num_diseases} diseases")
+        papers = engine.add_years(read_years(PubmedDir))
+        print(f"PubMed: {papers} papers with a completion year")
+        count = 0
+        with open(tmp_path, "w") as out_file:
+            out_file.write(",".join(COUNTS_COLUMNS) + "\n")
+            for counts in engine.iter_counts():
+                counts.to_csv(out_file, header=False, index=False)
+                count += len(counts)
+        os.replace(tmp_path, OutputFile)
+    finally:
+        engine.close()
+    print(f"Output: {count} gene-disease-year counts saved in file: {OutputFile}")
+
+
+if __name__ == "__main__":  # noqa
+    ERROR_MSG = """Command line arguments expected:
+    <Pubtator genes file (ex: ./gene2pubtatorcentral)>,
+    <Pubtator diseases file (ex: ./disease2pubtatorcentral)>,
+    <PubMed parquet dataset directory (ex: ./data/pubmed)>,
+    <Output counts file (ex: ./data/cooccurrences.csv)>"""
+
+    if not sys.argv or len(sys.argv) < 5:
+        raise ValueError(ERROR_MSG)
+
+    # check command line arguments for pubtator files
+    _gene_file = sys.argv[1]
+    _disease_file = sys.argv[2]
+    if not os.path.isfile(_gene_file) or not os.path.isfile(_disease_file):
+        raise ValueError(f"Pubtator file is not valid. {ERROR_MSG}")
+
+    # check command line argument for pubmed dataset directory
+    _pubmed_dir = sys.argv[3]
+    if not os.path.isdir(_pubmed_dir):
+        raise ValueError(f"PubMed dataset directory is not valid. {ERROR_MSG}")
+
+    # check command line argument for output file directory
+    _out_file = sys.argv[4]
+    if not os.path.isdir(os.path.dirname(os.path.abspath(_out_file))):
+        raise ValueError(f"Output directory is not valid. {ERROR_MSG}")
+
+    start_time = datetime.now()
+    main(_gene_file, _disease_file, _pubmed_dir, _out_file)
+
+    tot_time = datetime.now() - start_time
+    print(f"Counted co-occurrences in {round(tot_time.total_seconds()/60,2)} minutes")
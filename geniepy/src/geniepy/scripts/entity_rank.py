@@ -0,0 +1,93 @@
+"""
+Module to rank the papers of each gene and disease with personalized PageRank.
+
+Seeds are the papers Pubtator annotates with each gene and disease, papers are
+ranked over the citation graph store and the top papers of every entity are
+saved as entity,pmid,score rows, to be loaded with
+front-end/article_rank/load_paper_ranks.py.
+"""
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
+from datetime import datetime
+import os
+import sys
+import pandas as pd
+from geniepy.datamgmt.citegraph import CitationGraph
+from geniepy.datamgmt.scrapers import PubtatorDiseaseScraper, PubtatorGeneScraper
+from geniepy.ranking import (
+    PageRank,
+    seed_matrix,
+    MESH_PREFIX,
+    top_papers,
+    write_top_papers,
+    DEFAULT_TOP_K,
+)
+
+CHUNKSIZE = 1000000
+
+
+def read_pubtator(PubtatorFile, Scraper):
+    chunks = pd.read_csv(PubtatorFile, chunksize=CHUNKSIZE, **Scraper.read_options())
+    return chunks, Scraper.ENTITY_COLUMN
+
+
+def main(GraphDir, GeneFile, DiseaseFile, OutputFile, TopK):
+    graph = CitationGraph(GraphDir)
+    ranker = PageRank.from_graph(graph)
+    print(f"Graph: {graph.num_edges} citations, max PMID {graph.num_nodes - 1}")
+
+    def ranked():
+        # Disease IDs are keyed like CTD relationships, i.e. mesh_id
+        for pubtator_file, scraper, prefix in (
+            (GeneFile, PubtatorGeneScraper, ""),
+            (DiseaseFile, PubtatorDiseaseScraper, MESH_PREFIX),
+        ):
+            chunks, column = read_pubtator(pubtator_file, scraper)
+            entities, seeds = seed_matrix(chunks, column, graph.num_nodes, prefix)
+            print(f"{scraper.SOURCE_NAME}: {len(entities)} entities")
+            yield from top_papers(ranker, entities, seeds, TopK)
+
+    count = write_top_papers(OutputFile, ranked())
+    print(f"Output: top papers of {count} entities saved in file: {OutputFile}")
+
+
+if __name__ == "__main__":  # noqa
+    ERROR_MSG = """Command line arguments expected:
+    <Citation graph store directory (ex: ./data/graph)>,
+    <Pubtator genes file (ex: ./gene2pubtatorcentral)>,
+    <Pubtator diseases file (ex: ./disease2pubtatorcentral)>,
+    <Output top papers file (ex: ./data/paper_ranks)>,
+    [Papers per entity (ex: 50)]"""
+
+    if not sys.argv or len(sys.argv) < 5:
+        raise ValueError(ERROR_MSG)
+
+    # check command line argument for graph store directory
+    _graph_dir = sys.argv[1]
+    if not os.path.isdir(_graph_dir):
+        raise ValueError(f"Citation graph directory is not valid. {ERROR_MSG}")
+
+    # check command line arguments for pubtator files
+    _gene_file = sys.argv[2]
+    _disease_file = sys.argv[3]
+    if not os.path.isfile(_gene_file) or not os.path.isfile(_disease_file):
+        raise ValueError(f"Pubtator file is not valid. {ERROR_MSG}")
+
+    # check command line argument for output file directory
+    _out_file = sys.argv[4]
+    if not os.path.isdir(os.path.dirname(os.path.abspath(_out_file))):
+        raise ValueError(f"Output directory is not valid. {ERROR_MSG}")
+
+    # check optional command line argument for papers per entity
+    _top_k = DEFAULT_TOP_K
+    if len(sys.argv) > 5:
+        try:
+            _top_k = int(sys.argv[5])
+        except Exception:
+            raise ValueError(f"Papers per entity is not valid. {ERROR_MSG}")
+
+    start_time = datetime.now()
+    main(_graph_dir, _gene_file, _disease_file, _out_file, _top_k)
+
+    tot_time = datetime.now() - start_time
+    print(f"Ranked entity papers in {round(tot_time.total_seconds()/60,2)} minutes")
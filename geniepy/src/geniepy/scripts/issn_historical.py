@@ -1,95 +1,81 @@
 """
 Module to extract ISSN metadata for
 all available PubMed articles.
+
+Each PubMed data file is written to its own csv shard in the output
+directory, named after the data file: out-issn-<data file name>.csv
 """
 
-from concurrent.futures import ProcessPoolExecutor
+# pylint: disable=wrong-import-order, unused-import
+import geniebootsrap  # noqa: F401
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+import csv
 import glob
 import gzip
 import os
 import sys
-import xml.etree.ElementTree as ET
+from geniepy.pubmed import ArticleSetParser
 
 # Constants
-EXTENSION = "gz"
-TAG_Article = "PubmedArticle"
-TAG_PMID = "./MedlineCitation/PMID"
-TAG_ISSN = "./MedlineCitation/Article/Journal/ISSN"
-ATT_ISSN_TYPE = "IssnType"
+EXTENSION = "xml.gz"
+OUT_PREFIX = "out-issn-"
+OUT_HEADER = ["article_id", "issn_id", "issn_type"]
 _CSV_SEPRATOR = ","
 
 
-def decompress_archive(file):
-    with gzip.open(file, "rb") as f:
-        return f.read()
-
-
-def task(file):
-    file_content = decompress_archive(file)
-    xmlDoc = ET.fromstring(file_content)
-
-    # get all articles
-    articles = xmlDoc.findall(TAG_Article)
-    if articles is None:
-        return None
-
-    # extract PMID & ISSN data
-    data = []
-    for article in articles:
-        pmid = ""
-        issn = ""
-        issn_type = ""
-
-        if not article.find(TAG_PMID) is None:
-            pmid = article.find(TAG_PMID).text
-
-        if not article.find(TAG_ISSN) is None:
-            issn = article.find(TAG_ISSN).text.replace("-", "")
-            issn_type = article.find(TAG_ISSN).get(ATT_ISSN_TYPE)
-
-        if len(pmid) > 0 and len(issn) > 0:
-            data.append([pmid, issn, issn_type])
-
-    print(f"Processed data file: {os.path.basename(file)}, articles: {len(data)}")
-    return data
+def shard_path(file, outDir):
+    """Output shard of pubmed data file, named after it."""
+    name = os.path.basename(file).replace(f".{EXTENSION}", "")
+    return os.path.join(outDir, f"{OUT_PREFIX}{name}.csv")
+
+
+def task(file, outDir):
+    """
+    Stream PMID & ISSN of all articles of pubmed data file into its shard.
+
+    The data file is parsed once, straight from the compressed stream, and
+    rows are written as articles are parsed. The shard is written under a
+    hidden name and renamed when complete.
+    """
+    out_path = shard_path(file, outDir)
+    part_path = os.path.join(outDir, "." + os.path.basename(out_path))
+    count = 0
+    with gzip.open(file, "rb") as xml_stream:
+        with open(part_path, "w", newline="") as out_file:
+            writer = csv.writer(out_file, delimiter=_CSV_SEPRATOR, lineterminator="\n")
+            writer.writerow(OUT_HEADER)
+            for article in ArticleSetParser.iter_articles(xml_stream):
+                pmid = article.pmid
+                issn = article.issn.replace("-", "")
+                if len(pmid) > 0 and len(issn) > 0:
+                    writer.writerow([pmid, issn, article.issn_type])
+                    count += 1
+    os.replace(part_path, out_path)
+    return out_path, count
 
 
 def main(inDir, outDir, maxWorkers):
     # get list of pubmed data files
     file_path = os.path.join(inDir, f"*.{EXTENSION}")
-    files = glob.glob(file_path)
+    files = sorted(glob.glob(file_path))
 
     if not files or len(files) <= 0:
         return
 
-    # start parallel processing
+    # start parallel processing, each worker writes the shard of its file
     start_time = datetime.now()
     with ProcessPoolExecutor(max_workers=maxWorkers) as executor:
-        result = executor.map(task, files)
-
-    # write results to csv file
-    for value in result:
-        out_file = f"out-issn-{datetime.now().microsecond}.csv"
-        out_path = os.path.join(outDir, out_file)
-        with open(out_path, "w") as file:
-            file.write(
-                "article_id"
-                + _CSV_SEPRATOR
-                + "issn_id"
-                + _CSV_SEPRATOR
-                + "issn_type"
-                + "\n"
-            )
-            for article in value:
-                file.write(
-                    str(article[0])
-                    + _CSV_SEPRATOR
-                    + str(article[1])
-                    + _CSV_SEPRATOR
-                    + str(article[2])
-                    + "\n"
+        futures = {executor.submit(task, file, outDir): file for file in files}
+        for future in as_completed(futures):
+            try:
+                out_path, count = future.result()
+                print(
+                    f"Processed data file: {os.path.basename(futures[future])}, "
+                    f"articles: {count}, output: {os.path.basename(out_path)}"
                 )
+            except Exception as exp:  # pylint: disable=broad-except
+                print(f"Failed data file: {os.path.basename(futures[future])}: {exp}")
 
     tot_time = datetime.now() - start_time
     print(
@@ -6,7 +6,9 @@ used by classifier.
 
 The script expects path to folder containing pubmed baseline .xml.gz files,
 the path to output directory where generated files should be stored, and
-number of concurrent processes to be used [1, 16].
+number of concurrent processes to be used [1, 16]. An optional output format
+can be given: jsonl (default) for compressed jsonl files, or parquet for a
+parquet dataset partitioned by completion year.
 """
 # pylint: disable=wrong-import-order, unused-import
 import geniebootsrap  # noqa: F401
@@ -17,8 +19,9 @@ import gzip
 from datetime import datetime
 from itertools import repeat
 from concurrent.futures import ProcessPoolExecutor
-from geniepy.scripts.genieutils import decompress_gz
-from geniepy.pubmed import PubMedArticle, ArticleSetParser
+from geniepy.pubmed import ArticleSetParser
+
+OUTPUT_FORMATS = ["jsonl", "parquet"]
 
 
 def is_xml_article_set(filename: str) -> bool:
@@ -36,56 +39,78 @@ def is_xml_article_set(filename: str) -> bool:
     return False
 
 
-def parse_pubmed_article_set(in_path: str, out_path: str):
+def parse_pubmed_article_set(in_path: str, out_path: str, output_format="jsonl"):
     """
     Convert xml to json articles.
 
-    Crawls through all files in a directory and create equivalent parsed jsonl file
-    in output_path
+    Crawls through all files in a directory and create equivalent parsed and
+    compressed jsonl file in output_path. Articles are parsed straight from the
+    compressed article set and written as soon as they are parsed, so neither
+    the decompressed xml nor the uncompressed jsonl ever touch the disk.
 
     Arguments:
         in_path {str} -- absolute path to directory containing compressed article sets
         out_path {str} -- absolute path to desired directory to save output jsonl files
+
+    Keyword Arguments:
+        output_format {str} -- jsonl, or parquet to write to partitioned dataset
     """
     filename = os.path.basename(in_path)
     if not is_xml_article_set(filename):
         return
-    xml_file = in_path.replace(".gz", "")
-    if not os.path.exists(xml_file):
-        logging.info("Extracting %s to %s", in_path, xml_file)
-        decompress_gz(in_path, xml_file)
+    if output_format == "parquet":
+        parse_pubmed_article_set_parquet(in_path, out_path)
+        return
+    output_name = filename.replace(".xml.gz", ".jsonl.gz")
+    output_file = os.path.join(out_path, output_name)
+    # Write to hidden name, so interrupted runs don't leave truncated output
+    partial_file = os.path.join(out_path, "." + output_name)
 
-    logging.info("Parsing %s", xml_file)
-    article_list: PubMedArticle = ArticleSetParser.extract_articles(xml_file)
+    logging.info("Parsing %s to %s", in_path, output_file)
+    with gzip.open(in_path, "rb") as xml_stream:
+        articles = ArticleSetParser.iter_articles(xml_stream)
+        articles_cnt = ArticleSetParser.articles_to_jsonl(articles, partial_file)
+    os.replace(partial_file, output_file)
 
-    # Done with xml - delete to free up space
-    os.remove(xml_file)
+    logging.info(
+        "PID: %s. File Processed: %s. Articles Processed %s",
+        os.getpid(),
+        output_file,
+        articles_cnt,
+    )
+    return
 
-    output_file = os.path.join(out_path, filename.replace(".xml.gz", ".jsonl"))
-    logging.info("Generating %s", output_file)
-    ArticleSetParser.articles_to_jsonl(article_list, output_file)
 
-    logging.info("Compressing file: %s", output_file)
-    with open(output_file, "rb") as jsonl_data:
-        data_jsonl = jsonl_data.read()
-    compressed_data = gzip.compress(data_jsonl)
-    output_file_compressed = output_file + ".gz"
-    with open(output_file_compressed, "wb") as out_compressed:
-        out_compressed.write(compressed_data)
+def parse_pubmed_article_set_parquet(in_path: str, out_path: str):
+    """
+    Convert xml to parquet articles.
 
-    # Done with parsed file - delete to free up space
-    os.remove(output_file)
+    Articles are streamed from the compressed article set into the parquet
+    dataset in out_path, one file per completion year named after in_path.
+
+    Arguments:
+        in_path {str} -- absolute path to compressed article set
+        out_path {str} -- absolute path to root directory of parquet dataset
+    """
+    basename = os.path.basename(in_path).replace(".xml.gz", "")
+    logging.info("Parsing %s to %s", in_path, out_path)
+    with gzip.open(in_path, "rb") as xml_stream:
+        articles = ArticleSetParser.iter_articles(xml_stream)
+        articles_cnt = ArticleSetParser.articles_to_parquet(
+            articles, out_path, basename=basename
+        )
 
     logging.info(
         "PID: %s. File Processed: %s. Articles Processed %s",
         os.getpid(),
-        output_file,
-        len(article_list),
+        basename,
+        articles_cnt,
     )
-    return
 
 
-def spawn_processes(data_in_dir: str, data_out_dir: str, max_workers: int):
+def spawn_processes(
+    data_in_dir: str, data_out_dir: str, max_workers: int, output_format="jsonl"
+):
     """
     Spawns processes to processes article sets in parallel.
 
@@ -96,6 +121,9 @@ def spawn_processes(data_in_dir: str, data_out_dir: str, max_workers: int):
         data_in_dir {str} -- absolute path to input directory containing all articles
         data_out_dir {str} -- absolute path to output directory
         max_workers {int} -- max number of parallel processes to be created
+
+    Keyword Arguments:
+        output_format {str} -- jsonl or parquet
     """
     start_time = datetime.now()
     xml_files: [str] = []
@@ -106,7 +134,12 @@ def spawn_processes(data_in_dir: str, data_out_dir: str, max_workers: int):
     logging.info("Found %s PubMed article sets", len(xml_files))
 
     with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        executor.map(parse_pubmed_article_set, xml_files, repeat(data_out_dir))
+        executor.map(
+            parse_pubmed_article_set,
+            xml_files,
+            repeat(data_out_dir),
+            repeat(output_format),
+        )
 
     end_time = datetime.now()
     total_time = end_time - start_time
@@ -123,7 +156,8 @@ if __name__ == "__main__":
     logging.getLogger().setLevel(logging.INFO)
 
     ERROR_MSG = "Command line arguments expected: <path to data dir>, \
-        <path to output dir>, <number of parallel processes (2-16)>"
+        <path to output dir>, <number of parallel processes (2-16)>, \
+        [output format (jsonl, parquet)]"
 
     if not sys.argv or len(sys.argv) < 4:
         raise ValueError(ERROR_MSG)
@@ -140,6 +174,11 @@ if __name__ == "__main__":
     else:
         raise ValueError("Output data directory is not valid. " + ERROR_MSG)
 
+    # check optional argument for output format
+    OUTPUT_FORMAT = sys.argv[4] if len(sys.argv) > 4 else "jsonl"
+    if OUTPUT_FORMAT not in OUTPUT_FORMATS:
+        raise ValueError("Output format is not valid. " + ERROR_MSG)
+
     # check argument for number of parallel processes
     try:
         MAX_WORKERS = int(sys.argv[3])
@@ -151,7 +190,7 @@ if __name__ == "__main__":
             MAX_WORKERS = 1
 
         logging.info("Initializing parallel processing . . .")
-        spawn_processes(DATA_IN_DIR, DATA_OUT_DIR, MAX_WORKERS)
+        spawn_processes(DATA_IN_DIR, DATA_OUT_DIR, MAX_WORKERS, OUTPUT_FORMAT)
     except ValueError:
         logging.error(
             "Max number of processes should be a valid integer. %s", ERROR_MSG
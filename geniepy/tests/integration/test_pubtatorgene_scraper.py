@@ -1,6 +1,6 @@
 """Integration tests of Pubtator - Gene data."""
 import pytest
-from pathlib import Path
+from geniepy.datamgmt.downloads import open_url
 from geniepy.datamgmt.scrapers import PubtatorGeneScraper
 from tests.resources.mock import TEST_CHUNKSIZE
 
@@ -14,25 +14,15 @@ FTP_URL_SAMPLE = (
 class TestPubtatorGeneScraper:
     """Test pubtator gene scraper."""
 
-    def test_download():
-        """Test downloding data."""
+    def test_stream():
+        """Test streaming data without writing it to disk."""
         pbs = PubtatorGeneScraper()
-        pbs.clean_up()
-        pbs.download()
-        assert Path.exists(pbs.PUBTATOR_CSV_NAME)
-        assert Path.exists(pbs.PUBTATOR_GZIP_NAME)
-
-    def test_cleanup():
-        """Test deleting generated files."""
-        pbs = PubtatorGeneScraper()
-        if not Path.exists(pbs.PUBTATOR_CSV_NAME):
-            Path(pbs.PUBTATOR_CSV_NAME).touch()
-        pbs.clean_up()
-        assert not Path.exists(pbs.PUBTATOR_CSV_NAME)
+        with open_url(pbs.SAMPLE_FTP_URL) as stream:
+            assert stream.read(4)
 
     def test_scrape():
         """Test scraping data from pubtator-gene."""
         pbs = PubtatorGeneScraper()
-        gen = pbs.scrape(TEST_CHUNKSIZE)
+        gen = pbs.scrape(TEST_CHUNKSIZE, baseline=True, is_sample=True)
         df = next(gen)
         assert df.shape[0] == TEST_CHUNKSIZE
@@ -1,5 +1,9 @@
 """Module to test online sources parsers."""
+import os
+import numpy as np
 import pytest
+from tests import get_resources_path
+from geniepy.pubmed import ArticleSetParser
 from geniepy.datamgmt.scrapers import PubMedScraper
 from geniepy.datamgmt.parsers import BaseParser, PubMedParser
 from geniepy.errors import ParserError
@@ -33,6 +37,36 @@ class TestPubMedParser:
         # Should return empty list
         assert not self.parser.validate(payload)
 
+    articles = list(
+        ArticleSetParser.iter_articles(
+            os.path.join(get_resources_path(), "sample_articleset2.xml")
+        )
+    )
+
+    def test_parse_records(self):
+        """Parse article records into typed dataframe."""
+        parsed_df = self.parser.parse(self.articles)
+        assert parsed_df.shape[0] == len(self.articles)
+        assert parsed_df.pmid.dtype == np.int64
+        assert parsed_df.citation_count.dtype == np.int64
+        assert np.issubdtype(parsed_df.date_completed.dtype, np.datetime64)
+        assert parsed_df.language.dtype.name == "category"
+        assert list(parsed_df.mesh_list[0]) == list(self.articles[0].mesh_list)
+
+    def test_parse_empty(self):
+        """Parse empty chunk into empty typed dataframe."""
+        parsed_df = self.parser.parse([])
+        assert parsed_df.empty
+        assert parsed_df.pmid.dtype == np.int64
+
+    def test_to_table(self):
+        """Typed dataframe is formatted into schema conforming table rows."""
+        table_df = self.parser.to_table(self.parser.parse(self.articles))
+        assert not self.parser.validate(table_df)
+        assert table_df.authors[0] == str(list(self.articles[0].authors)).strip("[]")
+        assert table_df.date_completed[0] == self.articles[0].date_completed
+        assert table_df.language[0] == self.articles[0].language
+
     @pytest.mark.slow_integration_test
     @pytest.mark.parametrize("chunksize", [1, 10, 100])
     def test_parse_valid(self, chunksize):
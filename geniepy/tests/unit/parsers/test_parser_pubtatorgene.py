@@ -1,3 +1,4 @@
+import pandas as pd
 import tests.resources.mock as mock
 from geniepy.datamgmt.parsers import PubtatorGeneParser
 
@@ -9,3 +10,10 @@ def test_parse():
     gen_df = scraper.scrape(mock.TEST_CHUNKSIZE)
     parsed_df = parser.parse(next(gen_df))
     assert parsed_df.shape[0] == 1
+
+
+def test_parse_projected():
+    """Test scraped chunks of PMID and GeneID are parsed without copies."""
+    parser = PubtatorGeneParser()
+    chunk = pd.DataFrame({"PMID": [10001], "GeneID": ["112331;5"]})
+    assert parser.parse(chunk) is chunk
@@ -1,10 +1,13 @@
 """Test pub med article model class."""
 import os
+import gzip
+import json
+import csv
 import collections
 import xml.etree.ElementTree as ET
 import pytest
 from tests import get_resources_path, get_test_output_path
-from geniepy.pubmed import PubMedArticle, ArticleSetParser
+from geniepy.pubmed import PubMedArticle, ArticleRecord, ArticleSetParser
 
 
 def create_article(article_name: str) -> PubMedArticle:
@@ -206,6 +209,85 @@ class TestPubMedArticle:
         assert data.article.to_dict is not None
 
 
+ARTICLE_NAMES = [
+    "sample_empty_article.xml",
+    "sample_article1.xml",
+    "sample_article2.xml",
+]
+
+
+class TestArticleRecord:
+    """Test single pass extracted article records."""
+
+    @pytest.mark.parametrize("article_name", ARTICLE_NAMES)
+    def test_matches_article(self, article_name):
+        """Record fields should match the property based article model."""
+        article_path = os.path.join(get_resources_path(), article_name)
+        xml_element = ET.parse(article_path).getroot()
+        record = ArticleRecord.from_element(xml_element)
+        assert record.to_dict == PubMedArticle(xml_element).to_dict
+
+    def test_article_set(self):
+        """All records in article set should match the article model."""
+        article_path = os.path.join(get_resources_path(), "sample_articleset2.xml")
+        for xml_element in ET.parse(article_path).getroot().findall("PubmedArticle"):
+            record = ArticleRecord.from_element(xml_element)
+            assert record.to_dict == PubMedArticle(xml_element).to_dict
+
+    def test_typed_fields(self):
+        """Record stores pmid as int and list fields as tuples."""
+        article_path = os.path.join(get_resources_path(), "sample_article1.xml")
+        record = ArticleRecord.from_element(ET.parse(article_path).getroot())
+        # pylint: disable=protected-access
+        assert record._pmid == 1
+        assert isinstance(record._authors, tuple)
+        assert record.authors == ["A B Makar", "K E McMartin", "M Palese", "T R Tephly"]
+
+    def test_citations(self):
+        """Citation fields should be settable."""
+        record = ArticleRecord()
+        record.set_citationCount(2)
+        record.set_citationPmid("3,4")
+        assert record.to_dict["citation_count"] == 2
+        assert record.to_dict["citation_pmid"] == "3,4"
+
+    def test_references(self):
+        """Cited PMIDs are extracted from reference lists and 'Cites' comments."""
+        xml_element = ET.fromstring(
+            """<PubmedArticle>
+              <MedlineCitation>
+                <PMID Version="1">100</PMID>
+                <CommentsCorrectionsList>
+                  <CommentsCorrections RefType="Cites"><PMID>7</PMID>
+                  </CommentsCorrections>
+                  <CommentsCorrections RefType="ErratumIn"><PMID>8</PMID>
+                  </CommentsCorrections>
+                </CommentsCorrectionsList>
+              </MedlineCitation>
+              <PubmedData>
+                <ReferenceList>
+                  <Reference><Citation>A</Citation><ArticleIdList>
+                    <ArticleId IdType="doi">10.1/a</ArticleId>
+                    <ArticleId IdType="pubmed">5</ArticleId>
+                  </ArticleIdList></Reference>
+                  <Reference><Citation>B</Citation><ArticleIdList>
+                    <ArticleId IdType="pubmed">7</ArticleId>
+                  </ArticleIdList></Reference>
+                  <Reference><Citation>C</Citation></Reference>
+                </ReferenceList>
+                <ReferenceList>
+                  <Reference><Citation>D</Citation><ArticleIdList>
+                    <ArticleId IdType="pubmed">9</ArticleId>
+                  </ArticleIdList></Reference>
+                </ReferenceList>
+              </PubmedData>
+            </PubmedArticle>"""
+        )
+        record = ArticleRecord.from_element(xml_element)
+        assert record.references == [7, 5, 9]
+        assert "references" not in record.to_dict
+
+
 class TestArticlesSetParser:
     """Test ArticleSetParser. i.e. xml files with array of PubMedArticles."""
 
@@ -213,6 +295,9 @@ class TestArticlesSetParser:
     SAMPLE_ARTICLE_SET1_PATH = os.path.join(
         get_resources_path(), SAMPLE_ARTICLE_SET1_NAME
     )
+    SAMPLE_ARTICLE_SET2_PATH = os.path.join(
+        get_resources_path(), "sample_articleset2.xml"
+    )
 
     def test_extract_articles(self):
         """Extract pubmed articles from article set."""
@@ -223,6 +308,29 @@ class TestArticlesSetParser:
         assert len(articles) == 2
         assert isinstance(articles[0], PubMedArticle)
 
+    def test_iter_articles(self):
+        """Stream pubmed articles from article set."""
+        articles = list(ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET1_PATH))
+        expected = ArticleSetParser.extract_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        assert [article.pmid for article in articles] == [
+            article.pmid for article in expected
+        ]
+        assert articles[0].to_dict == expected[0].to_dict
+        # Streamed articles are compact records that don't hold the xml tree
+        assert isinstance(articles[0], ArticleRecord)
+        assert not hasattr(articles[0], "__dict__")
+
+    def test_iter_articles_gzip(self):
+        """Stream pubmed articles straight from compressed article set."""
+        target_path = os.path.join(get_test_output_path(), "test_articleset.xml.gz")
+        with open(self.SAMPLE_ARTICLE_SET1_PATH, "rb") as f_in:
+            with gzip.open(target_path, "wb") as f_out:
+                f_out.write(f_in.read())
+        with gzip.open(target_path, "rb") as f_in:
+            articles = list(ArticleSetParser.iter_articles(f_in))
+        assert len(articles) == 2
+        assert articles[0].title != ""
+
     def test_articles_to_json(self):
         """Serialize pubmedarticle object into json file."""
         articles: [PubMedArticle] = ArticleSetParser.extract_articles(
@@ -249,3 +357,73 @@ class TestArticlesSetParser:
         target_file_name = "test_articles.csv"
         target_path = os.path.join(get_test_output_path(), target_file_name)
         ArticleSetParser.articles_to_pipe(articles, target_path)
+
+    def test_articles_to_jsonl_stream(self):
+        """Stream parsed articles into compressed jsonl file."""
+        target_path = os.path.join(get_test_output_path(), "test_articles.jsonl.gz")
+        articles = ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        assert ArticleSetParser.articles_to_jsonl(articles, target_path) == 2
+        with gzip.open(target_path, "rt", encoding="utf-8") as target_file:
+            records = [json.loads(line) for line in target_file]
+        expected = ArticleSetParser.articles_to_dict(
+            ArticleSetParser.extract_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        )
+        assert records == expected
+
+    def test_articles_to_json_stream(self):
+        """Stream parsed articles into compressed json file."""
+        target_path = os.path.join(get_test_output_path(), "test_articles.json.gz")
+        articles = ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        ArticleSetParser.articles_to_json(articles, target_path)
+        with gzip.open(target_path, "rt", encoding="utf-8") as target_file:
+            records = json.load(target_file)["articles"]
+        assert [record["pmid"] for record in records] == ["2", "30969"]
+
+    def test_articles_to_json_empty(self):
+        """Empty article stream generates valid json."""
+        target_path = os.path.join(get_test_output_path(), "test_empty.json")
+        assert ArticleSetParser.articles_to_json(iter([]), target_path) == 0
+        with open(target_path) as target_file:
+            assert json.load(target_file) == {"articles": []}
+
+    def test_articles_to_pipe_stream(self):
+        """Stream parsed articles into compressed pipe delimited file."""
+        target_path = os.path.join(get_test_output_path(), "test_articles.csv.gz")
+        articles = ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        assert ArticleSetParser.articles_to_pipe(articles, target_path) == 2
+        with gzip.open(target_path, "rt", encoding="utf-8") as target_file:
+            rows = list(csv.DictReader(target_file, delimiter="|"))
+        assert [row["pmid"] for row in rows] == ["2", "30969"]
+
+    def test_articles_to_jsonl_zstd(self):
+        """Stream parsed articles into zstd compressed jsonl file."""
+        zstandard = pytest.importorskip("zstandard")
+        target_path = os.path.join(get_test_output_path(), "test_articles.jsonl.zst")
+        articles = ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET1_PATH)
+        ArticleSetParser.articles_to_jsonl(articles, target_path)
+        with zstandard.open(target_path, "rt", encoding="utf-8") as target_file:
+            assert len(target_file.readlines()) == 2
+
+    def test_articles_to_parquet(self, tmp_path):
+        """Stream parsed articles into parquet dataset partitioned by year."""
+        pq = pytest.importorskip("pyarrow.parquet")
+        articles = ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET2_PATH)
+        count = ArticleSetParser.articles_to_parquet(
+            articles, str(tmp_path), basename="set2", batch_size=3
+        )
+        expected = list(ArticleSetParser.iter_articles(self.SAMPLE_ARTICLE_SET2_PATH))
+        assert count == len(expected)
+        table = pq.read_table(str(tmp_path))
+        assert table.num_rows == count
+        assert sorted(table.column("pmid").to_pylist()) == sorted(
+            int(article.pmid) for article in expected
+        )
+        # Partitions are pruned by completion year
+        year = expected[0].date_completed[:4]
+        partition = tmp_path.joinpath(f"year={year}", "set2.parquet")
+        rows = pq.read_table(str(partition)).to_pylist()
+        assert int(expected[0].pmid) in [row["pmid"] for row in rows]
+        row = next(row for row in rows if row["pmid"] == int(expected[0].pmid))
+        assert row["authors"] == expected[0].authors
+        assert row["mesh_list"] == expected[0].mesh_list
+        assert not list(tmp_path.glob("*/.*"))
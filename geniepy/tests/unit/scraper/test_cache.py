@@ -0,0 +1,74 @@
+"""Module to test SQLite citation cache."""
+from concurrent.futures import ProcessPoolExecutor
+import pickle
+import pytest
+from geniepy.datamgmt.cache import CitationCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Citation cache in temporary database file."""
+    cache = CitationCache(str(tmp_path.joinpath("cache", "citations.db")))
+    yield cache
+    cache.close()
+
+
+def put_range(cache: CitationCache, start: int):
+    """Cache citations of 100 PMIDs from worker process."""
+    cache.put_many({pmid: [str(pmid + 1)] for pmid in range(start, start + 100)})
+    return len(cache.get_many(range(start, start + 100)))
+
+
+def test_bulk_get_put(cache):
+    """Cached citations are returned, missing PMIDs left out."""
+    cache.put_many({1: ["10", "11"], 2: []})
+    assert cache.get_many([1, 2, 3]) == {1: ["10", "11"], 2: []}
+    cache.put_many({1: ["10"]})
+    assert cache.get_many([1]) == {1: ["10"]}
+    # More PMIDs than sqlite variables per statement
+    assert cache.get_many(range(2000)) == {1: ["10"], 2: []}
+
+
+def test_ttl(tmp_path):
+    """Expired entries are missing until refreshed, and can be purged."""
+    path = str(tmp_path.joinpath("citations.db"))
+    cache = CitationCache(path, ttl=-1)
+    cache.put_many({1: ["10"]})
+    assert cache.get_many([1]) == {}
+    assert cache.size()["expired"] == 1
+    assert cache.purge_expired() == 1
+    assert len(cache) == 0
+    cache.close()
+    cache = CitationCache(path, ttl=None)
+    cache.put_many({1: ["10"]})
+    assert cache.get_many([1]) == {1: ["10"]}
+    cache.close()
+
+
+def test_size_and_compact(cache):
+    """Size reports entries and bytes, compaction frees expired entries."""
+    cache.put_many({pmid: ["1"] * 20 for pmid in range(5000)})
+    size = cache.size()
+    assert size["entries"] == 5000
+    assert size["expired"] == 0
+    assert size["bytes"] > 0
+    cache._ttl = -1  # pylint: disable=protected-access
+    assert cache.compact() == 5000
+    assert cache.size()["bytes"] < size["bytes"]
+
+
+def test_shared_across_processes(cache):
+    """Worker processes write to the same cache concurrently."""
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        counts = list(executor.map(put_range, [cache] * 8, range(0, 800, 100)))
+    assert counts == [100] * 8
+    assert len(cache.get_many(range(800))) == 800
+
+
+def test_pickle(cache):
+    """Pickled cache opens its own connection."""
+    cache.put_many({1: ["10"]})
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.path == cache.path
+    assert copy.get_many([1]) == {1: ["10"]}
+    copy.close()
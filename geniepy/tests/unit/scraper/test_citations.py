@@ -0,0 +1,261 @@
+"""Module to test batched citation fetching against local elink stand-in."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import asyncio
+import threading
+import time
+import pytest
+from geniepy.datamgmt.citations import (
+    AsyncCitationClient,
+    CitationFetcher,
+    parse_elink,
+)
+from geniepy.datamgmt.backfill import (
+    BackfillCheckpoint,
+    CitationBackfill,
+    pmid_windows,
+)
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.scrapers import PubMedScraper
+from geniepy.errors import CitationError
+from geniepy.pubmed import ArticleRecord
+
+CITED_BY = {1: ["10", "11"], 2: [], 3: ["12"]}
+"""Citing articles served by the stand-in, keyed by cited PMID."""
+
+
+def elink_response(pmids: [int]) -> str:
+    """Build elink result with one LinkSet per requested PMID."""
+    link_sets = []
+    for pmid in pmids:
+        links = "".join(
+            f"<Link><Id>{cite}</Id></Link>" for cite in CITED_BY.get(pmid, [])
+        )
+        link_set_db = ""
+        if links:
+            link_set_db = (
+                "<LinkSetDb><DbTo>pubmed</DbTo>"
+                "<LinkName>pubmed_pubmed_citedin</LinkName>"
+                f"{links}</LinkSetDb>"
+            )
+        link_sets.append(
+            "<LinkSet><DbFrom>pubmed</DbFrom>"
+            f"<IdList><Id>{pmid}</Id></IdList>{link_set_db}</LinkSet>"
+        )
+    return "<eLinkResult>" + "".join(link_sets) + "</eLinkResult>"
+
+
+class ElinkHandler(BaseHTTPRequestHandler):
+    """Minimal eutils elink stand-in recording requested PMIDs."""
+
+    requests = []
+    fail_next = 0
+    throttled_keys = set()
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Answer elink POST request."""
+        length = int(self.headers["Content-Length"])
+        params = parse_qs(self.rfile.read(length).decode())
+        if ElinkHandler.fail_next:
+            ElinkHandler.fail_next -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        api_key = params.get("api_key", [None])[0]
+        if api_key in ElinkHandler.throttled_keys:
+            ElinkHandler.throttled_keys.discard(api_key)
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.end_headers()
+            return
+        pmids = [int(pmid) for pmid in params["id"]]
+        ElinkHandler.requests.append(pmids)
+        body = elink_response(pmids).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep test output quiet."""
+
+
+@pytest.fixture
+def elink_url():
+    """Start local elink stand-in, return its url."""
+    ElinkHandler.requests = []
+    ElinkHandler.fail_next = 0
+    ElinkHandler.throttled_keys = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ElinkHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.1}
+    )
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/elink.fcgi"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_parse_elink():
+    """One entry per LinkSet, empty list for articles without citations."""
+    assert parse_elink(elink_response([1, 2])) == {1: ["10", "11"], 2: []}
+
+
+def test_parse_elink_error():
+    """Error responses are rejected."""
+    with pytest.raises(CitationError):
+        parse_elink("<eLinkResult><ERROR>Invalid id</ERROR></eLinkResult>")
+    with pytest.raises(CitationError):
+        parse_elink("<html>")
+
+
+def test_fetch_batched(elink_url):
+    """PMIDs are resolved batch_size at a time."""
+    fetcher = CitationFetcher(url=elink_url, batch_size=2)
+    citations = fetcher.fetch([1, 2, 3, 4])
+    fetcher.close()
+    assert citations == {1: ["10", "11"], 2: [], 3: ["12"], 4: []}
+    assert sorted(ElinkHandler.requests) == [[1, 2], [3, 4]]
+
+
+def test_fetch_retries(elink_url):
+    """Failed requests are retried, then reported."""
+    ElinkHandler.fail_next = 1
+    fetcher = CitationFetcher(url=elink_url, retries=1, backoff=0)
+    assert fetcher.fetch([3]) == {3: ["12"]}
+    ElinkHandler.fail_next = 2
+    with pytest.raises(CitationError):
+        fetcher.fetch([3])
+    fetcher.close()
+
+
+def test_fetch_cached(elink_url, tmp_path):
+    """Only PMIDs missing from the cache are requested."""
+    cache = CitationCache(str(tmp_path.joinpath("citations.db")))
+    cache.put_many({1: ["99"]})
+    fetcher = CitationFetcher(cache=cache, url=elink_url)
+    assert fetcher.fetch([1, 3]) == {1: ["99"], 3: ["12"]}
+    assert fetcher.fetch([1, 3]) == {1: ["99"], 3: ["12"]}
+    fetcher.close()
+    assert ElinkHandler.requests == [[3]]
+
+
+def test_scraper_sets_chunk_citations(elink_url):
+    """Scraper fills citations of a whole chunk with one request."""
+    articles = [ArticleRecord(pmid=str(pmid)) for pmid in (1, 2, 3)]
+    fetcher = CitationFetcher(url=elink_url)
+    PubMedScraper()._set_citations(fetcher, articles)
+    fetcher.close()
+    assert [article.citationCount for article in articles] == [2, 0, 1]
+    assert articles[0].citationPmid == "10,11"
+    assert len(ElinkHandler.requests) == 1
+
+
+def test_async_iter_fetch(elink_url):
+    """Streamed pmids are fetched with capped concurrency, failures reported."""
+
+    async def fetch_all():
+        results = {}
+        failed = []
+        client = AsyncCitationClient(
+            url=elink_url, batch_size=1, max_in_flight=2, retries=0
+        )
+        async with client:
+            async for batch, citations in client.iter_fetch(iter(range(1, 6))):
+                if citations is None:
+                    failed.extend(batch)
+                else:
+                    results.update(citations)
+        return results, failed
+
+    ElinkHandler.fail_next = 1
+    results, failed = asyncio.run(fetch_all())
+    assert len(failed) == 1
+    assert sorted(list(results) + failed) == [1, 2, 3, 4, 5]
+    assert len(ElinkHandler.requests) == 4
+
+
+def test_fetch_failure_cancels_batches():
+    """Batches still running are cancelled when one batch fails."""
+    cancelled = []
+
+    async def fetch_batch(pmids):
+        if pmids == [1]:
+            raise CitationError("Unable to fetch citations")
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.extend(pmids)
+            raise
+        return {}
+
+    async def fetch(client):
+        with pytest.raises(CitationError):
+            await client.fetch([1, 2, 3])
+
+    client = AsyncCitationClient(batch_size=1)
+    client.fetch_batch = fetch_batch
+    start = time.monotonic()
+    asyncio.run(fetch(client))
+    assert time.monotonic() - start < 5
+    assert sorted(cancelled) == [2, 3]
+
+
+def test_throttled_key_rescheduled(elink_url):
+    """Throttled requests are retried right away with another API key."""
+
+    async def fetch(client):
+        async with client:
+            return await client.fetch([1, 3])
+
+    ElinkHandler.throttled_keys = {"a", "b"}
+    client = AsyncCitationClient(
+        api_keys=["a", "b", "c"], url=elink_url, batch_size=1, retries=1
+    )
+    start = time.monotonic()
+    assert asyncio.run(fetch(client)) == {1: ["10", "11"], 3: ["12"]}
+    # No backoff sleep, throttled keys held back by the scheduler
+    assert time.monotonic() - start < 1
+    assert client.scheduler.requests >= 3
+
+
+def test_pmid_windows():
+    """Windows are aligned, only clipped at the edges of the range."""
+    assert pmid_windows(0, 25, 10) == [(1, 9), (10, 19), (20, 25)]
+    assert pmid_windows(12, 15, 10) == [(12, 15)]
+
+
+def test_backfill_resumes(elink_url, tmp_path):
+    """Completed windows are written and checkpointed, failed ones retried."""
+    checkpoint = BackfillCheckpoint(str(tmp_path.joinpath("backfill.db")))
+    cache = CitationCache(str(tmp_path.joinpath("citations.db")))
+
+    def backfill():
+        client = AsyncCitationClient(
+            url=elink_url, batch_size=3, max_in_flight=1, retries=0
+        )
+        return CitationBackfill(
+            client, checkpoint, cache=cache, output_dir=str(tmp_path), window_size=4
+        )
+
+    # Batch 1-3 fails, windows 4-7 and 8-9 complete
+    ElinkHandler.fail_next = 1
+    assert backfill().run(1, 9) == 2
+    assert backfill().pending(1, 9) == [(1, 3)]
+    assert backfill().run(1, 9) == 1
+    assert backfill().pending(1, 9) == []
+    with open(backfill().shard_path(1, 3)) as shard:
+        assert shard.read().splitlines() == [
+            "article_id|cited_count|cited_by_id",
+            "1|2|10,11",
+            "3|1|12",
+        ]
+    requested = sorted(pmid for batch in ElinkHandler.requests for pmid in batch)
+    assert requested == list(range(1, 10))
+    # Starting over only reads the cache
+    checkpoint.reset()
+    assert backfill().run(1, 9) == 3
+    assert len(ElinkHandler.requests) == 3
+    checkpoint.close()
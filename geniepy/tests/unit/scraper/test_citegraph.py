@@ -0,0 +1,67 @@
+"""Module to test memory mapped CSR citation graph store."""
+import numpy as np
+import pytest
+from geniepy.datamgmt.citegraph import (
+    CITES,
+    CitationGraph,
+    CitationGraphBuilder,
+    iter_article_citations,
+    iter_citations_csv,
+)
+from geniepy.pubmed import ArticleRecord
+
+CITED_BY = {5: [7, 9], 9: [5], 2: [5, 7, 9]}
+
+
+@pytest.fixture
+def graph(tmp_path) -> CitationGraph:
+    """Graph built from csv, spooling every 2 citations."""
+    csv_path = tmp_path.joinpath("citations.csv")
+    csv_path.write_text(
+        "".join(
+            ",".join(map(str, [cited] + citing)) + "\n"
+            for cited, citing in CITED_BY.items()
+        )
+    )
+    builder = CitationGraphBuilder(str(tmp_path.joinpath("graph")), chunk_size=2)
+    assert builder.add_cited_by(iter_citations_csv(str(csv_path))) == 6
+    return builder.build()
+
+
+def test_lookups(graph):
+    """Both directions are O(1) slices, unknown PMIDs have no citations."""
+    assert graph.num_nodes == 10
+    assert graph.num_edges == 6
+    for cited, citing in CITED_BY.items():
+        assert graph.cited_by(cited).tolist() == citing
+        assert graph.citation_count(cited) == len(citing)
+    assert graph.cites(5).tolist() == [9, 2]
+    assert graph.reference_count(7) == 2
+    assert graph.citation_count(7) == 0
+    assert graph.citation_count(1000) == 0
+    assert graph.degrees(CITES).sum() == 6
+
+
+def test_memory_mapped(graph, tmp_path):
+    """Lookups are read only views of the memory mapped arrays."""
+    offsets, indices = graph.csr()
+    assert isinstance(offsets, np.memmap)
+    assert offsets.dtype == np.int32 and indices.dtype == np.int32
+    citing = graph.cited_by(2)
+    assert np.shares_memory(citing, indices)
+    assert not citing.flags.writeable
+    reopened = CitationGraph(str(tmp_path.joinpath("graph")))
+    assert reopened.cited_by(2).tolist() == [5, 7, 9]
+    assert not tmp_path.joinpath("graph", CitationGraphBuilder.SPOOL_NAME).exists()
+
+
+def test_build_from_scraped_articles(tmp_path):
+    """Scraped chunks with citation metadata stream into the builder."""
+    articles = [ArticleRecord(pmid=str(pmid)) for pmid in (1, 2, 3)]
+    articles[0].set_citationPmid("2,3")
+    articles[2].set_citationPmid("2")
+    builder = CitationGraphBuilder(str(tmp_path))
+    builder.add_cited_by(iter_article_citations([articles[:2], articles[2:]]))
+    graph = builder.build()
+    assert graph.cited_by(1).tolist() == [2, 3]
+    assert graph.cites(2).tolist() == [1, 3]
@@ -0,0 +1,107 @@
+"""Module to test gene-disease co-occurrence counts over Pubtator tables."""
+import numpy as np
+import pandas as pd
+from geniepy.datamgmt.cooccurrence import CooccurrenceEngine, COUNTS_COLUMNS
+
+
+def naive_counts(genes, diseases, years) -> pd.DataFrame:
+    """Co-occurrence counts with a pandas merge."""
+    genes = genes.assign(GeneID=genes.GeneID.str.split(";")).explode("GeneID")
+    pairs = genes.merge(diseases, on="PMID").drop_duplicates()
+    pairs["year"] = pairs.PMID.map(years)
+    pairs = pairs.dropna(subset=["year"])
+    counts = (
+        pairs.groupby(["GeneID", "DiseaseID", "year"]).size().reset_index(name="n")
+    )
+    counts["cum"] = counts.groupby(["GeneID", "DiseaseID"]).n.cumsum()
+    return counts
+
+
+def count_rows(engine) -> list:
+    """Sorted rows of all count chunks."""
+    counts = pd.concat(engine.iter_counts(), ignore_index=True)
+    assert list(counts.columns) == COUNTS_COLUMNS
+    return sorted(counts.values.tolist())
+
+
+def test_counts(tmp_path):
+    """Papers are counted once per pair and year, up to year cumulatively."""
+    genes = pd.DataFrame(
+        [(1, "10"), (1, "10"), (2, "10;11"), (3, "11"), (4, "10"), (5, "10")],
+        columns=["PMID", "GeneID"],
+    )
+    diseases = pd.DataFrame(
+        [(1, "D1"), (2, "D1"), (2, "D2"), (3, "D2"), (4, "D1"), (5, "D1")],
+        columns=["PMID", "DiseaseID"],
+    )
+    pubmed = pd.DataFrame(
+        {
+            "pmid": [1, 2, 3, 4, 5],
+            "date_completed": ["2001-01-01", "2001-05-02", "2003-01-01", None, "2004"],
+        }
+    )
+    tmp_path.joinpath("work").mkdir()
+    tmp_path.joinpath("work", "keep.txt").write_text("not the engine's")
+    engine = CooccurrenceEngine(str(tmp_path / "work"), pmid_span=2)
+    assert engine.add_genes([genes[:3], genes[3:]]) == 7
+    assert engine.add_diseases([diseases]) == 6
+    assert engine.add_years([pubmed]) == 4
+    assert count_rows(engine) == [
+        ["10", "D1", 2001, 2, 2],
+        ["10", "D1", 2004, 1, 3],
+        ["10", "D2", 2001, 1, 1],
+        ["11", "D1", 2001, 1, 1],
+        ["11", "D2", 2001, 1, 1],
+        ["11", "D2", 2003, 1, 2],
+    ]
+    engine.close()
+    assert [path.name for path in (tmp_path / "work").iterdir()] == ["keep.txt"]
+
+
+def test_counts_out_of_core(tmp_path):
+    """Counts don't depend on partitions and buffering."""
+    rng = np.random.default_rng(0)
+    genes = pd.DataFrame(
+        {
+            "PMID": rng.integers(0, 500, 2000),
+            "GeneID": rng.integers(0, 30, 2000).astype(str),
+        }
+    )
+    diseases = pd.DataFrame(
+        {
+            "PMID": rng.integers(0, 500, 2000),
+            "DiseaseID": [f"MESH:D{i}" for i in rng.integers(0, 20, 2000)],
+        }
+    )
+    years = pd.Series(rng.integers(1990, 2020, 450), index=rng.permutation(500)[:450])
+    pubmed = pd.DataFrame(
+        {"pmid": years.index, "date_completed": years.astype(str) + "-01-01"}
+    )
+    expected = naive_counts(genes, diseases, years).values.tolist()
+    engine = CooccurrenceEngine(
+        str(tmp_path), pmid_span=64, count_partitions=5, buffer_size=100
+    )
+    engine.add_genes(np.array_split(genes, 7))
+    engine.add_diseases(np.array_split(diseases, 3))
+    engine.add_years(np.array_split(pubmed, 4))
+    assert count_rows(engine) == sorted(expected)
+    engine.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_disease_prefix(tmp_path):
+    """Disease IDs can be counted without their MESH: prefix."""
+    genes = pd.DataFrame([(1, "10"), (2, "10")], columns=["PMID", "GeneID"])
+    diseases = pd.DataFrame(
+        [(1, "MESH:D1"), (2, "D1;OMIM:5")], columns=["PMID", "DiseaseID"]
+    )
+    pubmed = pd.DataFrame({"pmid": [1, 2], "date_completed": ["2001", "2001"]})
+    engine = CooccurrenceEngine(str(tmp_path))
+    engine.add_genes([genes])
+    engine.add_diseases([diseases], prefix="MESH:")
+    engine.add_years([pubmed])
+    assert count_rows(engine) == [
+        ["10", "D1", 2001, 2, 2],
+        ["10", "OMIM:5", 2001, 1, 1],
+    ]
+    engine.close()
@@ -0,0 +1,118 @@
+"""Module to test ftp download manager against local ftp server."""
+import gzip
+import hashlib
+import os
+import threading
+import pytest
+from tests import get_resources_path
+from geniepy.datamgmt.downloads import FtpDownloader, FtpSessionPool
+from geniepy.errors import DownloadError
+
+pyftpdlib = pytest.importorskip("pyftpdlib")
+# pylint: disable=wrong-import-position, wrong-import-order
+from pyftpdlib.authorizers import DummyAuthorizer  # noqa: E402
+from pyftpdlib.handlers import FTPHandler  # noqa: E402
+from pyftpdlib.servers import ThreadedFTPServer  # noqa: E402
+
+SAMPLE_NAME = "pubmed20n0002.xml.gz"
+
+
+@pytest.fixture
+def ftp_root(tmp_path):
+    """Serve compressed sample article set with its md5 sidecar."""
+    root = tmp_path.joinpath("ftp")
+    root.mkdir()
+    xml_path = os.path.join(get_resources_path(), "sample_articleset2.xml")
+    with open(xml_path, "rb") as xml_file:
+        data = gzip.compress(xml_file.read())
+    root.joinpath(SAMPLE_NAME).write_bytes(data)
+    digest = hashlib.md5(data).hexdigest()
+    root.joinpath(SAMPLE_NAME + ".md5").write_text(f"MD5({SAMPLE_NAME})= {digest}\n")
+    return root
+
+
+@pytest.fixture
+def ftp_port(ftp_root):
+    """Start local anonymous ftp server, return its port."""
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(str(ftp_root))
+    handler = type("Handler", (FTPHandler,), {"authorizer": authorizer})
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"timeout": 0.1})
+    thread.start()
+    yield server.address[1]
+    server.close_all()
+    thread.join()
+
+
+def create_downloader(ftp_port, download_dir, size=1) -> FtpDownloader:
+    """Create downloader to local ftp server."""
+    pool = FtpSessionPool("127.0.0.1", "/", size=size, port=ftp_port)
+    return FtpDownloader(pool, str(download_dir), retries=1)
+
+
+def test_download_verified(ftp_root, ftp_port, tmp_path):
+    """Downloaded file matches remote file."""
+    downloader = create_downloader(ftp_port, tmp_path.joinpath("download"))
+    assert downloader.list_files("*.xml.gz") == [SAMPLE_NAME]
+    file_path, md5 = downloader.download(SAMPLE_NAME)
+    downloader.close()
+    data = ftp_root.joinpath(SAMPLE_NAME).read_bytes()
+    with open(file_path, "rb") as local_file:
+        assert local_file.read() == data
+    assert md5 == hashlib.md5(data).hexdigest()
+    assert not os.path.exists(file_path + FtpDownloader.PART_EXTN)
+
+
+def test_list_remote(ftp_root, ftp_port, tmp_path):
+    """Remote listing includes file size and modification time."""
+    downloader = create_downloader(ftp_port, tmp_path.joinpath("download"))
+    remote_files = downloader.list_remote("*.xml.gz")
+    downloader.close()
+    assert [remote.name for remote in remote_files] == [SAMPLE_NAME]
+    assert remote_files[0].size == ftp_root.joinpath(SAMPLE_NAME).stat().st_size
+    assert len(remote_files[0].mtime) == 14
+
+
+def test_download_resumes(ftp_root, ftp_port, tmp_path):
+    """Partial downloads are resumed from their current size."""
+    download_dir = tmp_path.joinpath("download")
+    download_dir.mkdir()
+    data = ftp_root.joinpath(SAMPLE_NAME).read_bytes()
+    part_path = download_dir.joinpath(SAMPLE_NAME + FtpDownloader.PART_EXTN)
+    part_path.write_bytes(data[:1000])
+    downloader = create_downloader(ftp_port, download_dir)
+    file_path = downloader.download(SAMPLE_NAME).path
+    downloader.close()
+    with open(file_path, "rb") as local_file:
+        assert local_file.read() == data
+
+
+def test_download_md5_mismatch(ftp_root, ftp_port, tmp_path):
+    """Files not matching their md5 sidecar are rejected."""
+    ftp_root.joinpath(SAMPLE_NAME + ".md5").write_text(
+        f"MD5({SAMPLE_NAME})= {'0' * 32}\n"
+    )
+    download_dir = tmp_path.joinpath("download")
+    pool = FtpSessionPool("127.0.0.1", "/", size=1, port=ftp_port)
+    connect = pool._connect
+    sessions = []
+    pool._connect = lambda: sessions.append(connect()) or sessions[-1]
+    downloader = FtpDownloader(pool, str(download_dir), retries=1)
+    with pytest.raises(DownloadError):
+        downloader.download(SAMPLE_NAME)
+    downloader.close()
+    assert not download_dir.joinpath(SAMPLE_NAME).exists()
+    # Retried on the same session, a corrupt file isn't a broken connection
+    assert len(sessions) == 1
+
+
+def test_sessions_reused(ftp_port, tmp_path):
+    """Sessions are returned to the pool and reused by the next download."""
+    pool = FtpSessionPool("127.0.0.1", "/", size=1, port=ftp_port)
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        pass
+    assert first is second
+    pool.close()
@@ -0,0 +1,67 @@
+"""Module to test incremental sync manifest."""
+import pytest
+from geniepy.datamgmt.downloads import RemoteFile
+from geniepy.datamgmt.manifest import SyncManifest, PENDING, DOWNLOADED, INGESTED
+
+DIRECTORY = "/pubmed/updatefiles/"
+FILES = [
+    RemoteFile("pubmed20n0001.xml.gz", 100, "20200101000000"),
+    RemoteFile("pubmed20n0002.xml.gz", 200, "20200102000000"),
+]
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Manifest in temporary database file."""
+    manifest = SyncManifest(str(tmp_path.joinpath("sync", "manifest.db")))
+    yield manifest
+    manifest.close()
+
+
+def test_new_files_pending(manifest):
+    """New remote files need to be fetched."""
+    assert manifest.sync(DIRECTORY, FILES) == [remote.name for remote in FILES]
+    assert manifest.status(DIRECTORY, FILES[0].name) == PENDING
+    assert manifest.status("/pubmed/baseline/", FILES[0].name) is None
+
+
+def test_ingested_files_skipped(manifest):
+    """Ingested files aren't fetched again, partially ingested files are."""
+    manifest.sync(DIRECTORY, FILES)
+    manifest.set_status(DIRECTORY, FILES[0].name, DOWNLOADED, "abc")
+    manifest.set_status(DIRECTORY, FILES[0].name, INGESTED)
+    manifest.set_status(DIRECTORY, FILES[1].name, DOWNLOADED, "def")
+    assert manifest.sync(DIRECTORY, FILES) == [FILES[1].name]
+    entry = manifest.get(DIRECTORY, FILES[0].name)
+    assert entry["md5"] == "abc"
+    assert entry["size"] == 100
+
+
+def test_changed_files_pending(manifest):
+    """Files changed on the server are fetched again."""
+    manifest.sync(DIRECTORY, FILES)
+    for remote in FILES:
+        manifest.set_status(DIRECTORY, remote.name, INGESTED, "abc")
+    changed = [FILES[0], FILES[1]._replace(mtime="20200201000000")]
+    assert manifest.sync(DIRECTORY, changed) == [FILES[1].name]
+    assert manifest.get(DIRECTORY, FILES[1].name)["md5"] is None
+
+
+def test_persisted(tmp_path):
+    """Status survives reopening the manifest."""
+    path = str(tmp_path.joinpath("manifest.db"))
+    manifest = SyncManifest(path)
+    manifest.sync(DIRECTORY, FILES)
+    manifest.set_status(DIRECTORY, FILES[0].name, INGESTED)
+    manifest.close()
+    manifest = SyncManifest(path)
+    assert manifest.pending(DIRECTORY) == [FILES[1].name]
+    manifest.close()
+
+
+def test_import_ingested(manifest):
+    """Imported files are ingested, and filled in by the next listing."""
+    assert manifest.import_ingested(DIRECTORY, [FILES[0].name]) == 1
+    assert manifest.import_ingested(DIRECTORY, [FILES[0].name]) == 0
+    assert manifest.sync(DIRECTORY, FILES) == [FILES[1].name]
+    assert manifest.get(DIRECTORY, FILES[0].name)["size"] == 100
@@ -0,0 +1,79 @@
+"""Module to test per API key rate limiting."""
+import asyncio
+import time
+from geniepy.datamgmt.ratelimit import ApiKeyScheduler, TokenBucket
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket():
+    """Tokens refill at rate up to capacity."""
+    bucket = TokenBucket(rate=10, capacity=2, now=0)
+    bucket.take(0)
+    bucket.take(0)
+    assert bucket.delay(0) == 0.1
+    assert bucket.delay(1) == 0
+    assert bucket.tokens == 2
+
+
+def test_keys_share_load():
+    """Requests go to the key with capacity left."""
+    clock = FakeClock()
+    scheduler = ApiKeyScheduler(["a", "b"], rate=10, clock=clock)
+    assert {scheduler.next_key()[0], scheduler.next_key()[0]} == {"a", "b"}
+    key, delay = scheduler.next_key()
+    assert key is None and delay == 0.1
+    clock.now = 0.1
+    assert scheduler.next_key()[0] is not None
+    assert scheduler.capacity == 20
+
+
+def test_throttled_key_backs_off():
+    """Throttled keys are held back with exponential backoff."""
+    clock = FakeClock()
+    scheduler = ApiKeyScheduler(["a", "b"], rate=10, clock=clock)
+    scheduler.throttled("a")
+    clock.now = 0.5
+    assert [scheduler.next_key()[0] for _ in range(2)] == ["b", None]
+    clock.now = 1.0
+    assert scheduler.next_key()[0] == "a"
+    scheduler.throttled("a")
+    clock.now = 2.5
+    # Second consecutive throttle holds key for 2 seconds
+    assert scheduler.next_key()[0] == "b"
+    assert scheduler.next_key()[0] is None
+    scheduler.succeeded("a")
+    scheduler.throttled("a", retry_after=0.1)
+    clock.now = 3.0
+    assert scheduler.next_key()[0] == "a"
+
+
+def test_anonymous_rate():
+    """Without API keys requests are limited to the anonymous rate."""
+    scheduler = ApiKeyScheduler()
+    assert scheduler.capacity == ApiKeyScheduler.ANONYMOUS_RATE
+
+
+def test_acquire_rate():
+    """Acquiring keys doesn't exceed the sum of the key quotas."""
+    scheduler = ApiKeyScheduler(["a", "b", "c"], rate=100)
+
+    async def acquire_all():
+        return await asyncio.gather(*(scheduler.acquire() for _ in range(33)))
+
+    start = time.monotonic()
+    keys = asyncio.run(acquire_all())
+    elapsed = time.monotonic() - start
+    assert elapsed >= 0.09
+    assert sorted(set(keys)) == ["a", "b", "c"]
+    assert scheduler.requests == 33
+    assert scheduler.requests_per_second() <= 330
+    assert "33 requests on 3 keys" in scheduler.report()
@@ -0,0 +1,103 @@
+"""Module to test local citation graph from parsed reference lists."""
+import numpy as np
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.references import ReferenceIndex, is_updated
+from geniepy.pubmed import ArticleRecord
+
+
+def create_index(tmp_path) -> ReferenceIndex:
+    """Index spilling every 3 edges into partitions of 10 PMIDs."""
+    index = ReferenceIndex(
+        str(tmp_path.joinpath("references")), buffer_size=3, partition_span=10
+    )
+    articles = [
+        ArticleRecord(pmid="30", references=[1, 12]),
+        ArticleRecord(pmid="31", references=[12, 1, 25]),
+        ArticleRecord(pmid="32"),
+        # Revised article parsed again
+        ArticleRecord(pmid="30", references=[1, 12]),
+    ]
+    assert index.add_articles(articles) == 7
+    return index
+
+
+def test_iter_cited_by(tmp_path):
+    """Edges are inverted in cited PMID order, without duplicates."""
+    index = create_index(tmp_path)
+    cited_by = [(cited, citing.tolist()) for cited, citing in index.iter_cited_by()]
+    assert cited_by == [(1, [30, 31]), (12, [30, 31]), (25, [31])]
+    assert index.partitions() == [0, 1, 2]
+    assert index.dirty == {0, 1, 2}
+    counts = [
+        (pmids.tolist(), cnts.tolist()) for pmids, cnts in index.iter_counts([1])
+    ]
+    assert counts == [([12], [2])]
+
+
+def test_persisted(tmp_path):
+    """Edges are kept on disk across index instances."""
+    create_index(tmp_path).flush()
+    index = ReferenceIndex(str(tmp_path.joinpath("references")), partition_span=10)
+    cited, citing = next(index.iter_cited_by())
+    assert cited == 1
+    assert np.array_equal(citing, [30, 31])
+    index.clear()
+    assert index.partitions() == []
+
+
+def test_write_cache(tmp_path):
+    """Local cited-by lists are merged with cached ones, gaps left out."""
+    cache = CitationCache(str(tmp_path.joinpath("citations.db")))
+    cache.put_many({1: ["40"], 2: ["41"]})
+    index = create_index(tmp_path)
+    assert index.write_cache(cache, batch_size=2) == 3
+    assert cache.get_many([1, 2, 12, 25, 30]) == {
+        1: ["30", "31", "40"],
+        2: ["41"],
+        12: ["30", "31"],
+        25: ["31"],
+    }
+
+
+def test_iter_updates(tmp_path):
+    """Dirty partitions are backfilled once, resuming after interruptions."""
+    cache = CitationCache(str(tmp_path.joinpath("citations.db")))
+    cache.put_many({1: ["40"]})
+    create_index(tmp_path).flush()
+    # Dirty partitions are kept on disk
+    index = ReferenceIndex(str(tmp_path.joinpath("references")), partition_span=10)
+    assert index.dirty == {0, 1, 2}
+    updates = index.iter_updates(cache, chunksize=1)
+    first = next(updates)
+    assert is_updated(first)
+    assert first.values.tolist() == [[1, 3, "30,31,40"]]
+    updates.close()
+    # Partition 0 wasn't consumed past its last chunk
+    index = ReferenceIndex(str(tmp_path.joinpath("references")), partition_span=10)
+    updates = list(index.iter_updates(cache))
+    assert [chunk.values.tolist() for chunk in updates] == [
+        [[1, 3, "30,31,40"]],
+        [[12, 2, "30,31"]],
+        [[25, 1, "31"]],
+    ]
+    assert index.dirty == set()
+    index = ReferenceIndex(str(tmp_path.joinpath("references")), partition_span=10)
+    assert not list(index.iter_updates(cache))
+
+
+def test_iter_updates_changed(tmp_path):
+    """Only PMIDs whose cited-by list changed are updated."""
+    cache = CitationCache(str(tmp_path.joinpath("citations.db")))
+    index = create_index(tmp_path)
+    assert len(list(index.iter_updates(cache))) == 3
+    # Revised article citing the same PMIDs, and a new citation of 12
+    index.add_articles(
+        [
+            ArticleRecord(pmid="31", references=[1, 25]),
+            ArticleRecord(pmid="33", references=[12]),
+        ]
+    )
+    assert index.dirty == {0, 1, 2}
+    updates = list(index.iter_updates(cache))
+    assert [chunk.values.tolist() for chunk in updates] == [[[12, 3, "30,31,33"]]]
+    assert index.dirty == set()
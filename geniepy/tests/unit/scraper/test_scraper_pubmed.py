@@ -1,6 +1,108 @@
 """Module to test PubMed scraper."""
+import os
+import gzip
 import pytest
-from geniepy.datamgmt.scrapers import PubMedScraper
+from tests import get_resources_path
+from geniepy.pubmed import ArticleRecord, ArticleSetParser
+import geniepy.config as config
+from geniepy.datamgmt.cache import CitationCache
+from geniepy.datamgmt.daos import PubMedDao
+from geniepy.datamgmt.references import ReferenceIndex
+from geniepy.datamgmt.repositories import SqlRepository
+from geniepy.datamgmt.tables import PUBMED_PROPTY
+from geniepy.datamgmt.downloads import DownloadedFile, RemoteFile
+from geniepy.datamgmt.manifest import SyncManifest, DOWNLOADED, INGESTED
+from geniepy.datamgmt.scrapers import (
+    PubMedScraper,
+    parse_pubmed_file,
+    read_parsed_file,
+)
+
+SAMPLE_FILES = {
+    "pubmed20n0001.xml.gz": "sample_articleset1.xml",
+    "pubmed20n0002.xml.gz": "sample_articleset2.xml",
+}
+"""Fake ftp data files, mapped to sample article sets."""
+
+
+class MockDownloader:
+    """Mock ftp downloader 'downloading' sample article sets."""
+
+    sessions = 2
+
+    def __init__(self, download_dir):
+        self.download_dir = download_dir
+
+    def list_remote(self, pattern: str = "*") -> [RemoteFile]:
+        """List fake ftp data files."""
+        return [RemoteFile(name, 1000, "20200101000000") for name in SAMPLE_FILES]
+
+    def download(self, ftp_file: str) -> DownloadedFile:
+        """Compress sample article set into download dir."""
+        self.download_dir.mkdir(exist_ok=True)
+        xml_path = os.path.join(get_resources_path(), SAMPLE_FILES[ftp_file])
+        file_path = self.download_dir.joinpath(ftp_file)
+        with open(xml_path, "rb") as f_in:
+            with gzip.open(file_path, "wb") as f_out:
+                f_out.write(f_in.read())
+        return DownloadedFile(str(file_path), ftp_file + ".md5")
+
+    def close(self):
+        """Nothing to close."""
+
+
+class TruncatingDownloader(MockDownloader):
+    """Mock ftp downloader truncating the last data file."""
+
+    def download(self, ftp_file: str) -> DownloadedFile:
+        """Truncate compressed sample article set of last data file."""
+        downloaded = super().download(ftp_file)
+        if ftp_file == max(SAMPLE_FILES):
+            with gzip.open(downloaded.path, "rb") as f_in:
+                data = f_in.read()
+            with gzip.open(downloaded.path, "wb") as f_out:
+                f_out.write(data[: len(data) // 2])
+        return downloaded
+
+
+class FailingDownloader(MockDownloader):
+    """Mock ftp downloader failing on the first data file."""
+
+    def download(self, ftp_file: str) -> DownloadedFile:
+        """Fail with an error other than DownloadError."""
+        if ftp_file == min(SAMPLE_FILES):
+            raise OSError("No space left on device")
+        return super().download(ftp_file)
+
+
+class MockCitationFetcher:
+    """Mock citation fetcher, every article is cited by PMID 1."""
+
+    def fetch(self, pmids: [int]) -> {int: [str]}:
+        """All pmids are cited once."""
+        return {pmid: ["1"] for pmid in pmids}
+
+    def close(self):
+        """Nothing to close."""
+
+
+def mock_ftp(scraper: PubMedScraper, monkeypatch, tmp_path, max_workers: int):
+    """Patch scraper to 'download' sample article sets into tmp_path."""
+    download_dir = tmp_path.joinpath("download")
+    downloader = MockDownloader(download_dir)
+    monkeypatch.setattr(scraper, "_create_downloader", lambda *args: downloader)
+    monkeypatch.setattr(scraper, "_create_citation_fetcher", MockCitationFetcher)
+    monkeypatch.setattr(scraper, "_get_download_dir", lambda: str(download_dir))
+    monkeypatch.setattr(
+        scraper, "_get_history_filepath", lambda: str(tmp_path.joinpath("pubmed.dat"))
+    )
+    monkeypatch.setattr(
+        scraper, "_citation_cache", CitationCache(str(tmp_path.joinpath("cite.db")))
+    )
+    manifest_path = str(tmp_path.joinpath("manifest.db"))
+    monkeypatch.setattr(scraper, "_open_manifest", lambda: SyncManifest(manifest_path))
+    monkeypatch.setattr(config, "get_max_workers", lambda: max_workers)
+    monkeypatch.setattr(config, "get_pubmed_prefetch_files", lambda: 1)
 
 
 class TestPubMedScraper:
@@ -12,6 +114,184 @@ class TestPubMedScraper:
         """Ensure scraper obj constructed successfully."""
         assert self.scraper is not None
 
+    def test_pubmed_scrape_streams(self, tmp_path, monkeypatch):
+        """Articles are streamed from compressed pubmed data file."""
+        xml_path = os.path.join(get_resources_path(), "sample_articleset2.xml")
+        with open(xml_path, "rb") as f_in:
+            with gzip.open(tmp_path.joinpath("pubmed.xml.gz"), "wb") as f_out:
+                f_out.write(f_in.read())
+        monkeypatch.setattr(self.scraper, "_get_download_dir", lambda: str(tmp_path))
+        articles = self.scraper._pubmedScrape("pubmed.xml.gz")
+        first = next(articles)
+        assert first.pmid != ""
+        assert len(list(articles)) == 16
+
+    def test_parse_pubmed_file(self, tmp_path):
+        """Worker spills parsed articles in chunks, streamed back from disk."""
+        xml_path = os.path.join(get_resources_path(), "sample_articleset2.xml")
+        file_path = str(tmp_path.joinpath("pubmed.xml.gz"))
+        with open(xml_path, "rb") as f_in:
+            data = f_in.read()
+        with gzip.open(file_path, "wb") as f_out:
+            f_out.write(data)
+        spill_path = parse_pubmed_file(file_path, 5)
+        assert not os.path.exists(file_path)
+        articles = list(read_parsed_file(spill_path))
+        assert [article.pmid for article in articles] == [
+            article.pmid for article in ArticleSetParser.iter_articles(xml_path)
+        ]
+        assert not os.path.exists(spill_path)
+        # Truncated file fails, leaving no spill file behind
+        with gzip.open(file_path, "wb") as f_out:
+            f_out.write(data[: len(data) // 2])
+        with pytest.raises(Exception):
+            parse_pubmed_file(file_path, 5)
+        assert os.listdir(tmp_path) == ["pubmed.xml.gz"]
+
+    @pytest.mark.parametrize("max_workers", [0, 2])
+    def test_scrape_pipeline(self, tmp_path, monkeypatch, max_workers):
+        """Downloaded files are parsed in the background and yielded in order."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, max_workers)
+        chunks = list(scraper.scrape(chunksize=5))
+        expected = [
+            article.pmid
+            for name in sorted(SAMPLE_FILES.values())
+            for article in ArticleSetParser.iter_articles(
+                os.path.join(get_resources_path(), name)
+            )
+        ]
+        assert [article.pmid for chunk in chunks for article in chunk] == expected
+        assert max(len(chunk) for chunk in chunks) == 5
+        assert all(
+            article.citationCount == 1 and article.citationPmid == "1"
+            for chunk in chunks
+            for article in chunk
+        )
+        # Downloaded files cleaned up and manifest updated
+        assert not tmp_path.joinpath("download").exists()
+        manifest = SyncManifest(str(tmp_path.joinpath("manifest.db")))
+        for name in SAMPLE_FILES:
+            entry = manifest.get(PubMedScraper.DEFAULT_PUBMED_UPDATE_DIR, name)
+            assert entry["status"] == INGESTED
+            assert entry["md5"] == name + ".md5"
+        # Nothing new to fetch on the next run
+        assert not list(scraper.scrape(chunksize=5))
+
+    def test_scrape_pipeline_close(self, tmp_path, monkeypatch):
+        """Closing scrape generator early stops the pipeline."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 1)
+        scrape_gen = scraper.scrape(chunksize=1)
+        assert len(next(scrape_gen)) == 1
+        scrape_gen.close()
+        assert not tmp_path.joinpath("download").exists()
+
+    def test_scrape_resumes_file(self, tmp_path, monkeypatch):
+        """Interrupted scrape resumes at the file that wasn't fully ingested."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 0)
+        first_file, second_file = sorted(SAMPLE_FILES)
+        scrape_gen = scraper.scrape(chunksize=1000)
+        next(scrape_gen)  # all articles of first file
+        next(scrape_gen)  # all articles of second file
+        scrape_gen.close()
+        manifest = SyncManifest(str(tmp_path.joinpath("manifest.db")))
+        directory = PubMedScraper.DEFAULT_PUBMED_UPDATE_DIR
+        assert manifest.status(directory, first_file) == INGESTED
+        assert manifest.status(directory, second_file) == DOWNLOADED
+        chunks = list(scraper.scrape(chunksize=1000))
+        expected = ArticleSetParser.iter_articles(
+            os.path.join(get_resources_path(), SAMPLE_FILES[second_file])
+        )
+        assert [article.pmid for chunk in chunks for article in chunk] == [
+            article.pmid for article in expected
+        ]
+
+    @pytest.mark.parametrize("max_workers", [0, 2])
+    def test_scrape_corrupt_file(self, tmp_path, monkeypatch, max_workers):
+        """Files that fail to parse aren't marked ingested, and are retried."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, max_workers)
+        downloader = TruncatingDownloader(tmp_path.joinpath("download"))
+        monkeypatch.setattr(scraper, "_create_downloader", lambda *args: downloader)
+        list(scraper.scrape(chunksize=5))
+        manifest = SyncManifest(str(tmp_path.joinpath("manifest.db")))
+        directory = PubMedScraper.DEFAULT_PUBMED_UPDATE_DIR
+        first_file, second_file = sorted(SAMPLE_FILES)
+        assert manifest.status(directory, first_file) == INGESTED
+        assert manifest.status(directory, second_file) != INGESTED
+        assert manifest.pending(directory) == [second_file]
+
+    def test_scrape_download_error(self, tmp_path, monkeypatch):
+        """Files failing to download with any error are skipped, not waited."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 0)
+        downloader = FailingDownloader(tmp_path.joinpath("download"))
+        monkeypatch.setattr(scraper, "_create_downloader", lambda *args: downloader)
+        chunks = list(scraper.scrape(chunksize=1000))
+        expected = ArticleSetParser.iter_articles(
+            os.path.join(get_resources_path(), SAMPLE_FILES[max(SAMPLE_FILES)])
+        )
+        assert [article.pmid for chunk in chunks for article in chunk] == [
+            article.pmid for article in expected
+        ]
+        manifest = SyncManifest(str(tmp_path.joinpath("manifest.db")))
+        directory = PubMedScraper.DEFAULT_PUBMED_UPDATE_DIR
+        assert manifest.pending(directory) == [min(SAMPLE_FILES)]
+
+    def test_scrape_download_stage_error(self, tmp_path, monkeypatch):
+        """Parse stage ends when the download stage fails."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 0)
+
+        def fail(*args):
+            raise ValueError("bad md5 file")
+
+        monkeypatch.setattr(scraper, "_ftp_download", fail)
+        assert not list(scraper.scrape(chunksize=1000))
+
+    def test_local_citations_backfilled(self, tmp_path, monkeypatch):
+        """Stored articles get the citations of articles parsed after them."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 0)
+        references_dir = str(tmp_path.joinpath("references"))
+        monkeypatch.setattr(
+            scraper, "_create_reference_index", lambda: ReferenceIndex(references_dir)
+        )
+        first_file, second_file = sorted(SAMPLE_FILES)
+        parsed = {
+            first_file: [ArticleRecord(pmid="1"), ArticleRecord(pmid="2")],
+            second_file: [
+                ArticleRecord(pmid="3", references=[1, 2]),
+                ArticleRecord(pmid="4", references=[1]),
+            ],
+        }
+        monkeypatch.setattr(
+            scraper,
+            "_parse_stage",
+            lambda *args: ((name, None, parsed[name]) for name in sorted(parsed)),
+        )
+        dao = PubMedDao(SqlRepository("sqlite://", PUBMED_PROPTY))
+        # pylint: disable=protected-access
+        monkeypatch.setattr(dao._parser, "scraper", scraper)
+        dao.download(2)
+        query = "SELECT pmid, citation_count, citation_pmid FROM pubmed ORDER BY pmid"
+        assert next(dao.query(query, 10)).values.tolist() == [
+            [1, 2, "3,4"],
+            [2, 1, "3"],
+            [3, 0, ""],
+            [4, 0, ""],
+        ]
+        assert ReferenceIndex(references_dir).dirty == set()
+
+    def test_scrape_imports_history(self, tmp_path, monkeypatch):
+        """Files in legacy history file aren't fetched again."""
+        scraper = PubMedScraper()
+        mock_ftp(scraper, monkeypatch, tmp_path, 0)
+        tmp_path.joinpath("pubmed.dat").write_text("\n".join(SAMPLE_FILES) + "\n")
+        assert not list(scraper.scrape(chunksize=5))
+
     @pytest.mark.slow_integration_test
     @pytest.mark.parametrize("chunksize", [1, 10, 100])
     def test_scrape_update(self, chunksize):
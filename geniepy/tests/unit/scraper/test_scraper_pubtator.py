@@ -0,0 +1,65 @@
+"""Test streaming Pubtator and SJR scrapers against local files."""
+import gzip
+import numpy as np
+import pytest
+from geniepy.datamgmt.downloads import open_url
+from geniepy.datamgmt.scrapers import PubtatorGeneScraper, SjrScraper
+from geniepy.datamgmt.snapshots import SnapshotDiff
+from geniepy.errors import DownloadError
+
+PUBTATOR_ROWS = "".join(
+    f"{pmid}\tGene\t{pmid % 7};{pmid % 5}\tmention\tGNormPlus\n"
+    for pmid in range(1000, 1100)
+)
+
+
+def test_open_url(tmp_path):
+    """Plain and gzip data are streamed as they are read."""
+    plain = tmp_path.joinpath("plain.tsv")
+    plain.write_text(PUBTATOR_ROWS)
+    gzipped = tmp_path.joinpath("pubtator.gz")
+    gzipped.write_bytes(gzip.compress(PUBTATOR_ROWS.encode()))
+    for path in (plain, gzipped):
+        with open_url(path.as_uri()) as stream:
+            assert stream.read().decode() == PUBTATOR_ROWS
+
+
+def test_open_url_missing(tmp_path):
+    """Missing source raises DownloadError."""
+    with pytest.raises(DownloadError):
+        with open_url(tmp_path.joinpath("missing.gz").as_uri()):
+            pass
+
+
+def create_scraper(scraper_class, url: str, tmp_path):
+    """Scraper of local url, with its snapshot in tmp_path."""
+    scraper = scraper_class()
+    scraper.FTP_URL = url
+    snapshot_dir = str(tmp_path.joinpath("snapshots"))
+    scraper.create_snapshot = lambda: SnapshotDiff(snapshot_dir, partitions=4)
+    return scraper
+
+
+def test_pubtator_chunks(tmp_path):
+    """Gzipped download is read in chunks without any file written."""
+    gzipped = tmp_path.joinpath("gene2pubtatorcentral.gz")
+    gzipped.write_bytes(gzip.compress(PUBTATOR_ROWS.encode()))
+    scraper = create_scraper(PubtatorGeneScraper, gzipped.as_uri(), tmp_path)
+    assert not list(scraper.scrape(30))
+    chunks = list(scraper.scrape(30, baseline=True))
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+    assert list(chunks[0].columns) == ["PMID", "GeneID"]
+    assert chunks[0]["PMID"].dtype == np.int32
+    assert chunks[0]["GeneID"].dtype == "category"
+    assert chunks[-1]["PMID"].iloc[-1] == 1099
+    assert chunks[-1]["GeneID"].iloc[-1] == "0;4"
+    assert not list(tmp_path.glob("*.csv"))
+
+
+def test_sjr_chunks(tmp_path):
+    """SJR csv is streamed in chunks."""
+    sjr = tmp_path.joinpath("sjr.csv")
+    sjr.write_text("Rank;Title;SJR;H index\n1;Nature;10,1;1000\n2;Cell;9,5;800\n")
+    scraper = create_scraper(SjrScraper, sjr.as_uri(), tmp_path)
+    chunks = list(scraper.scrape(1, baseline=True))
+    assert [chunk["Title"].iloc[0] for chunk in chunks] == ["Nature", "Cell"]
@@ -0,0 +1,161 @@
+"""Module to test snapshot diffs of Pubtator and SJR sources."""
+import gzip
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Integer, String
+from geniepy.datamgmt.daos import PubtatorGeneDao, SjrDao
+from geniepy.datamgmt.repositories import SqlRepository
+from geniepy.datamgmt.scrapers import PubtatorGeneScraper, SjrScraper
+from geniepy.datamgmt.snapshots import SnapshotDiff, diff_rows, is_removed
+from geniepy.datamgmt.tables import RepoProperties
+
+
+def gene_rows(pairs) -> pd.DataFrame:
+    """Pubtator gene chunk of (PMID, GeneID) pairs."""
+    return pd.DataFrame(pairs, columns=["PMID", "GeneID"])
+
+
+def test_diff_rows():
+    """Rows are diffed as multisets."""
+    previous = gene_rows([(1, "10"), (1, "10"), (2, "20"), (3, "30")])
+    current = gene_rows([(3, "30"), (1, "10"), (4, "40"), (4, "40")])
+    added, removed = diff_rows(previous, current)
+    assert added.values.tolist() == [[4, "40"], [4, "40"]]
+    assert removed.values.tolist() == [[1, "10"], [2, "20"]]
+
+
+def test_update(tmp_path):
+    """Only changed partitions are diffed, categorical or not."""
+    snapshot = SnapshotDiff(str(tmp_path), partitions=8, spool_rows=3)
+    assert not snapshot.exists
+    baseline = gene_rows([(pmid, str(pmid % 7)) for pmid in range(100)])
+    chunks = [baseline[:60], baseline[60:]]
+    assert [len(chunk) for chunk in snapshot.record(chunks)] == [60, 40]
+    assert snapshot.exists
+    fingerprints = snapshot.fingerprints()
+    assert fingerprints[:, 0].sum() == 100
+
+    # Same rows in another order and dtype don't change anything
+    shuffled = baseline.sample(frac=1, random_state=0).astype({"GeneID": "category"})
+    assert not list(snapshot.update([shuffled]))
+    assert (snapshot.fingerprints() == fingerprints).all()
+
+    updated = pd.concat([baseline[baseline.PMID != 5], gene_rows([(100, "2")])])
+    chunks = list(snapshot.update([updated[:50], updated[50:]]))
+    assert [chunk.values.tolist() for chunk in chunks if not is_removed(chunk)] == [
+        [[100, "2"]]
+    ]
+    assert [chunk.values.tolist() for chunk in chunks if is_removed(chunk)] == [
+        [[5, "5"]]
+    ]
+    changed = (snapshot.fingerprints() != fingerprints).any(axis=1)
+    assert 1 <= changed.sum() <= 2
+    assert not list(snapshot.update([updated]))
+
+
+def test_update_resumes(tmp_path):
+    """Partitions committed before an interruption aren't diffed again."""
+    snapshot = SnapshotDiff(str(tmp_path), partitions=8)
+    list(snapshot.record([gene_rows([(1, "1")])]))
+    updated = gene_rows([(pmid, "1") for pmid in range(1, 50)])
+    diffs = SnapshotDiff(str(tmp_path), partitions=8).update([updated])
+    first = next(diffs)
+    next(diffs)
+    diffs.close()
+    resumed = list(SnapshotDiff(str(tmp_path), partitions=8).update([updated]))
+    emitted = pd.concat([first] + resumed)
+    assert sorted(emitted.PMID) == list(range(2, 50))
+
+
+def test_update_resumes_deletes(tmp_path):
+    """Deletes applied before an interruption aren't repeated."""
+    snapshot = SnapshotDiff(str(tmp_path), partitions=1)
+    list(snapshot.record([gene_rows([(1, "1"), (1, "1"), (2, "2")])]))
+    updated = gene_rows([(1, "1"), (3, "3")])
+    diffs = SnapshotDiff(str(tmp_path), partitions=1).update([updated])
+    removed = next(diffs)
+    assert is_removed(removed)
+    assert removed.values.tolist() == [[1, "1"], [2, "2"]]
+    next(diffs)
+    diffs.close()
+    # Source changed again before the update was resumed
+    updated = gene_rows([(1, "1"), (1, "1"), (3, "3")])
+    resumed = list(SnapshotDiff(str(tmp_path), partitions=1).update([updated]))
+    assert [chunk.values.tolist() for chunk in resumed] == [[[1, "1"], [3, "3"]]]
+    assert not any(is_removed(chunk) for chunk in resumed)
+
+
+def test_dao_update(tmp_path, monkeypatch):
+    """Update adds and deletes rows of the DAO's table."""
+    table = Table(
+        "pubtator_gene", MetaData(), Column("PMID", Integer), Column("GeneID", String)
+    )
+    repo = SqlRepository("sqlite://", RepoProperties("pubtator_gene", "GeneID", table))
+    dao = PubtatorGeneDao(repo)
+    source = tmp_path.joinpath("gene2pubtatorcentral.gz")
+    scraper = PubtatorGeneScraper()
+    scraper.FTP_URL = source.as_uri()
+    snapshot_dir = str(tmp_path.joinpath("snapshots"))
+    scraper.create_snapshot = lambda: SnapshotDiff(snapshot_dir, partitions=4)
+    # pylint: disable=protected-access
+    monkeypatch.setattr(dao._parser, "scraper", scraper)
+
+    def publish(rows: str):
+        source.write_bytes(gzip.compress(rows.encode()))
+
+    def stored() -> list:
+        query = "SELECT PMID, GeneID FROM pubtator_gene ORDER BY PMID, GeneID"
+        return next(dao.query(query, 100)).values.tolist()
+
+    assert not list(scraper.scrape(10))
+    publish(
+        "1\tGene\t10\tm\tr\n1\tGene\t10\tm\tr\n"
+        "2\tGene\t20;21\tm\tr\n3\tGene\t30\tm\tr\n"
+    )
+    dao.download(2, baseline=True)
+    assert stored() == [[1, "10"], [1, "10"], [2, "20;21"], [3, "30"]]
+    # One copy of a duplicate row removed
+    publish("1\tGene\t10\tm\tr\n3\tGene\t30\tm\tr\n4\tGene\t40\tm\tr\n")
+    flushes = []
+    monkeypatch.setattr(SqlRepository, "flush", lambda self: flushes.append(self))
+    dao.download(2)
+    assert stored() == [[1, "10"], [3, "30"], [4, "40"]]
+    # Staged writes are flushed once per refresh, not per chunk
+    assert flushes == [repo]
+
+
+def test_sjr_dao_update(tmp_path, monkeypatch):
+    """SJR rows changing only in columns that aren't stored are kept."""
+    table = Table(
+        "sjr",
+        MetaData(),
+        Column("Title", String),
+        Column("SJR", String),
+        Column("h_index", Integer),
+    )
+    dao = SjrDao(SqlRepository("sqlite://", RepoProperties("sjr", "Rank", table)))
+    source = tmp_path.joinpath("journalrank.csv")
+    scraper = SjrScraper()
+    scraper.FTP_URL = source.as_uri()
+    snapshot_dir = str(tmp_path.joinpath("snapshots"))
+    scraper.create_snapshot = lambda: SnapshotDiff(snapshot_dir, partitions=1)
+    # pylint: disable=protected-access
+    monkeypatch.setattr(dao._parser, "scraper", scraper)
+
+    def publish(rows: [str]):
+        header = "Rank;Sourceid;Title;Type;SJR;H index\n"
+        source.write_text(header + "".join(row + "\n" for row in rows))
+
+    def stored() -> list:
+        query = "SELECT Title, SJR, h_index FROM sjr ORDER BY Title"
+        return next(dao.query(query, 100)).values.tolist()
+
+    publish(["1;10;Nature;journal;9,5;100", "2;20;Cell;journal;9,1;90"])
+    dao.download(10, baseline=True)
+    assert stored() == [["Cell", "9,1", 90], ["Nature", "9,5", 100]]
+    # Only Rank changes, then Cell's SJR changes
+    publish(["2;10;Nature;journal;9,5;100", "1;20;Cell;journal;9,1;90"])
+    dao.download(10)
+    assert stored() == [["Cell", "9,1", 90], ["Nature", "9,5", 100]]
+    publish(["2;10;Nature;journal;9,5;100", "1;20;Cell;journal;9,7;90"])
+    dao.download(10)
+    assert stored() == [["Cell", "9,7", 90], ["Nature", "9,5", 100]]
@@ -0,0 +1,172 @@
+"""Test sparse PageRank over the citation graph store."""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as sp
+from tests import get_resources_path
+from geniepy.datamgmt.citegraph import CitationGraphBuilder
+from geniepy.datamgmt.parsers import CtdParser
+from geniepy.ranking import (
+    PageRank,
+    changed_rows,
+    pagerank,
+    rerank,
+    seed_matrix,
+    top_papers,
+    MESH_PREFIX,
+    write_rankings,
+)
+
+CITED_BY = {1: [2, 3, 4], 2: [3], 3: [4, 6], 6: [1]}
+"""Article 5 unused, 4 cites but is never cited, 2 and 6 cite once."""
+
+
+@pytest.fixture
+def graph(tmp_path):
+    """Citation graph store of CITED_BY."""
+    builder = CitationGraphBuilder(str(tmp_path.joinpath("graph")))
+    builder.add_cited_by(CITED_BY.items())
+    return builder.build()
+
+
+def dense_pagerank(damping: float, teleport: np.ndarray) -> np.ndarray:
+    """Reference PageRank solving the linear system with dense matrices."""
+    size = len(teleport)
+    out_degrees = np.zeros(size)
+    for citing in CITED_BY.values():
+        for pmid in citing:
+            out_degrees[pmid] += 1
+    transition = np.zeros((size, size))
+    for cited, citing in CITED_BY.items():
+        for pmid in citing:
+            transition[cited, pmid] = 1 / out_degrees[pmid]
+    # Dangling articles jump following teleport
+    transition[:, out_degrees == 0] = teleport[:, None]
+    system = np.eye(size) - damping * transition
+    scores = np.linalg.solve(system, (1 - damping) * teleport)
+    return scores / scores.sum()
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("threads", [1, 3])
+def test_pagerank(graph, dtype, threads):
+    """Power iteration converges to the exact PageRank."""
+    result = pagerank(graph, damping=0.85, tol=1e-7, dtype=dtype, threads=threads)
+    assert result.converged
+    assert result.scores.dtype == dtype
+    teleport = np.array([0, 1, 1, 1, 1, 0, 1]) / 5
+    expected = dense_pagerank(0.85, teleport)
+    assert np.allclose(result.scores, expected, atol=1e-5)
+    assert result.scores[0] == result.scores[5] == 0
+    assert result.scores.sum() == pytest.approx(1, abs=1e-5)
+
+
+def test_max_iter(graph):
+    """Iteration stops at max_iter without convergence."""
+    result = pagerank(graph, tol=0, max_iter=3)
+    assert result.iterations == 3
+    assert not result.converged
+
+
+def test_spmv_threads(graph):
+    """Row blocks multiplied by threads match the single product."""
+    single = PageRank.from_graph(graph, threads=1, dtype=np.float64)
+    threaded = PageRank.from_graph(graph, threads=4, dtype=np.float64)
+    vectors = np.random.default_rng(0).random((single.num_nodes, 2))
+    assert np.allclose(single.spmv(vectors), threaded.spmv(vectors))
+    threaded.close()
+
+
+def test_sparse_teleport(graph):
+    """Sparse teleport matrix ranks like its dense columns."""
+    ranker = PageRank.from_graph(graph, tol=1e-9, dtype=np.float64)
+    teleport = sp.csc_matrix(([0.5, 0.5, 1.0], ([2, 4, 5], [0, 0, 1])), shape=(7, 2))
+    sparse = ranker.run(teleport=teleport).scores
+    for column in range(2):
+        dense = ranker.run(teleport=teleport[:, column].toarray().ravel()).scores
+        assert np.allclose(sparse[:, column], dense)
+
+
+def test_write_rankings(graph, tmp_path):
+    """Rankings are sorted by score with citation counts."""
+    result = pagerank(graph)
+    path = str(tmp_path.joinpath("rankings"))
+    assert write_rankings(path, result.scores, graph.degrees()) == 5
+    with open(path) as rankings:
+        rows = [line.strip().split(",") for line in rankings]
+    assert [row[0] for row in rows][0] == "1"
+    scores = [float(row[1]) for row in rows]
+    assert scores == sorted(scores, reverse=True)
+    assert sum(scores) == pytest.approx(5, rel=1e-4)
+    assert rows[0][2] == "3"
+
+
+def test_rerank(graph, tmp_path):
+    """Warm started ranking with citation deltas matches a full ranking."""
+    previous = pagerank(graph, tol=1e-9, dtype=np.float64).scores
+    added = graph.new_citations([(1, [2, 5]), (7, [4])])
+    assert added.tolist() == [[1, 5], [7, 4]]
+    removed = [(3, 6)]
+    result = rerank(graph, previous, added, removed, tol=1e-9, dtype=np.float64)
+    updated = {1: [2, 3, 4, 5], 2: [3], 3: [4], 6: [1], 7: [4]}
+    builder = CitationGraphBuilder(str(tmp_path.joinpath("updated")))
+    builder.add_cited_by(updated.items())
+    full = pagerank(builder.build(), tol=1e-9, dtype=np.float64)
+    assert result.converged
+    assert np.allclose(result.scores, full.scores, atol=1e-8)
+    assert result.iterations < full.iterations
+
+
+def test_changed_rows():
+    """Rows changed materially, ranked or unranked are changed."""
+    previous = np.array([0, 0.5, 0.3, 0.2])
+    scores = np.array([0, 0.504, 0.296, 0, 0.2])
+    assert changed_rows(previous, scores).tolist() == [2, 3, 4]
+    assert changed_rows(previous, previous).tolist() == []
+
+
+def test_seed_matrix():
+    """Entities seed their papers once, split IDs and PMIDs off graph ignored."""
+    chunks = [
+        pd.DataFrame({"PMID": ["4", "4", "2"], "GeneID": ["10", "10", "10;20"]}),
+        pd.DataFrame({"PMID": ["5", "99"], "GeneID": ["20", "30"]}),
+    ]
+    entities, seeds = seed_matrix(chunks, "GeneID", 7)
+    assert entities.tolist() == ["10", "20"]
+    assert seeds.toarray().tolist() == [
+        [0, 0, 1, 0, 1, 0, 0],
+        [0, 0, 1, 0, 0, 1, 0],
+    ]
+
+
+def test_seed_matrix_disease_ids():
+    """Disease seeds are keyed like the mesh_id of CTD relationships."""
+    with open(os.path.join(get_resources_path(), "sample_ctd_db.csv")) as ctd_file:
+        relationships = CtdParser().parse(ctd_file.read())
+    chunks = [
+        pd.DataFrame(
+            {
+                "PMID": ["1", "2", "3"],
+                "DiseaseID": ["MESH:D000014", "MESH:D000740", "OMIM:143100"],
+            }
+        )
+    ]
+    entities, _ = seed_matrix(chunks, "DiseaseID", 4, MESH_PREFIX)
+    assert entities.tolist() == ["D000014", "D000740", "OMIM:143100"]
+    assert set(entities[:2]) <= set(relationships.diseaseid)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2])
+def test_top_papers(graph, batch_size):
+    """Batched personalized PageRank matches each entity's exact PageRank."""
+    chunks = [pd.DataFrame({"PMID": ["4", "2", "5"], "DiseaseID": ["A", "B", "B"]})]
+    entities, seeds = seed_matrix(chunks, "DiseaseID", graph.num_nodes)
+    ranker = PageRank.from_graph(graph, tol=1e-9, dtype=np.float64)
+    ranked = list(top_papers(ranker, entities, seeds, 3, batch_size))
+    assert [entity for entity, _, _ in ranked] == ["A", "B"]
+    for (_, pmids, scores), seed in zip(ranked, seeds.toarray()):
+        expected = dense_pagerank(0.85, seed / seed.sum())
+        assert len(pmids) == 3
+        assert pmids.tolist() == np.argsort(-expected, kind="stable")[:3].tolist()
+        assert np.allclose(scores, expected[pmids], atol=1e-7)